@@ -0,0 +1,39 @@
+"""
+🚨 Campaign Alerts API
+Alert history, acknowledgement, and a live Server-Sent Events feed so analysts
+see a surging scam campaign while it is still spreading.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Query, HTTPException, Request, Header
+
+from app.services import alerts, event_bus
+
+router = APIRouter(tags=["Threat Hub – Alerts"])
+
+
+@router.get("/alerts")
+def list_alerts(
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = Query(None, description="Keyset cursor: `next_before_id` from the previous page"),
+    unacknowledged: bool = Query(False),
+):
+    """Most recent alerts first."""
+    return alerts.list_alerts(limit=limit, before_id=before_id, unacknowledged=unacknowledged)
+
+
+@router.get("/alerts/stream")
+async def stream_alerts(request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Live alert feed (text/event-stream). Browsers reconnect automatically and
+    resume from `Last-Event-ID`, so alerts fired during a disconnect are replayed.
+    """
+    return event_bus.sse_response(request, [alerts.CHANNEL], last_event_id)
+
+
+@router.post("/alerts/{alert_id}/ack")
+def acknowledge_alert(alert_id: int):
+    if not alerts.acknowledge(alert_id):
+        raise HTTPException(status_code=404, detail=f"Alert {alert_id} not found")
+    return {"id": alert_id, "acknowledged": True}
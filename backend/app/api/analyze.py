@@ -2,12 +2,17 @@ from fastapi import APIRouter, Form, HTTPException
 from app.pipelines.ocr import extract_text_from_image
 from app.pipelines.regex_extract import extract_entities
 from app.pipelines.ner import extract_named_entities
+from app.pipelines.entity_canonical import canonicalize_entities
 from app.pipelines.osint_engine import enrich_entity_osint
-from app.pipelines.risk_assessor import assess_risk
+from app.pipelines.risk_assessor import assess_risk, assess_risk_heuristic
 from app.pipelines.scam_classifier import classify_scam
-from app.pipelines.url_qr_scanner import scan_urls_and_qr
+from app.pipelines.url_qr_scanner import extract_urls, extract_qr_codes, scan_links
 from app.services.chainlog import chain_log
-import os, json, traceback, gc  # <--- Added gc here
+from app.services.case_store import save_case, load_case
+from app.services.image_index import get_hashes, image_hashes, index_image, find_visual_matches, verified
+from app.services.blob_store import evidence_path
+from app.services.analysis_cascade import decisive, record_run, cascade_stats, CASCADE_LOW, CASCADE_HIGH
+import os, json, time, traceback, gc  # <--- Added gc here
 from datetime import datetime
 from collections import Counter
 
@@ -18,24 +23,205 @@ CACHE_DIR = "app/data/analysis_cache"
 os.makedirs(CACHE_DIR, exist_ok=True)
 
 
+# off: always run the full pipeline
+# instant: a verified visual match returns the matched case's analysis straight away
+# reuse_ocr: a verified visual match skips OCR and re-runs everything else on its text
+VISUAL_MATCH_MODES = {"off", "instant", "reuse_ocr"}
+
+# Evidence read as-is instead of going through OCR
+PLAIN_TEXT_EXTS = {".txt"}
+
+
+def _verified_visual_match(file_id: str, file_path: str):
+    """Closest already-analyzed screenshot that passes the fine-hash check, with its cached case."""
+    hashes = get_hashes(file_id)
+    if not hashes:
+        hashes = image_hashes(file_path)
+        if not hashes:
+            return None
+        index_image(file_id, hashes)
+
+    for match in find_visual_matches(hashes, exclude=file_id):
+        if not verified(match):
+            continue
+        source = load_case(match["file_id"])
+        if source:
+            return match, source
+    return None
+
+
+def _instant_visual_result(file_id: str, match: dict, source: dict):
+    result = {
+        **source,
+        "file_id": file_id,
+        "analyzed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "visual_match": {**match, "mode": "instant"},
+    }
+    save_case(result)
+
+    chain_log(
+        action="ANALYZE_VISUAL_MATCH",
+        actor="system",
+        target=file_id,
+        meta={
+            "timestamp": datetime.now().isoformat(),
+            "matched_case": match["file_id"],
+            "distance": match["distance"],
+            "fine_distance": match["fine_distance"],
+        },
+    )
+
+    return {
+        "status": "success ✅",
+        "message": f"Visually matches case {match['file_id']}; its analysis was reused.",
+        **result
+    }
+
+
+def _plain_text(file_path: str):
+    """Contents of plain-text evidence; None for files that need OCR."""
+    if os.path.splitext(file_path)[1].lower() not in PLAIN_TEXT_EXTS:
+        return None
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _url_summary(url_qr_findings: list):
+    """Derive Summary from URL + QR results."""
+    risk_levels = [u["risk_level"] for u in url_qr_findings] if url_qr_findings else []
+    summary_counter = Counter(risk_levels)
+    high_risk_domains = [u["domain"] for u in url_qr_findings if u["risk_level"] == "High"]
+
+    return {
+        "total_urls_scanned": len(url_qr_findings),
+        "high_risk": summary_counter.get("High", 0),
+        "medium_risk": summary_counter.get("Medium", 0),
+        "low_risk": summary_counter.get("Low", 0),
+        "top_high_risk_domains": list(set(high_risk_domains))[:5],
+    }
+
+
+def _heuristic_pass(file_id: str, raw_text: str, qr_links: list):
+    """Regex entities, offline URL/QR heuristics and the cheap risk verdict over them."""
+    entities = canonicalize_entities(extract_entities(raw_text))
+    findings = scan_links(extract_urls(raw_text) + qr_links, with_osint=False)
+    return entities, findings, assess_risk_heuristic(raw_text, entities, findings, file_id)
+
+
+def _tiered_result(file_id: str, raw_text: str, tier: int, verdict: str, heuristic: tuple, match, ocr_skipped: bool):
+    entities, url_qr_findings, risk_result = heuristic
+    skipped = (["ocr"] if ocr_skipped else []) + ["ner", "scam_classifier", "osint"]
+    result = {
+        "file_id": file_id,
+        "raw_text": raw_text,
+        "entities": entities,
+        "scam_class": {"category": "Unclassified", "confidence": 0.0, "keywords": []},
+        "osint_hits": [],
+        "risk": risk_result,
+        "url_qr_findings": url_qr_findings,
+        "url_summary": _url_summary(url_qr_findings),
+        "analyzed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "tiered": True,
+        "cascade": {
+            "tier": tier,
+            "verdict": verdict,
+            "score": risk_result["score"],
+            "bounds": [CASCADE_LOW, CASCADE_HIGH],
+            "skipped": skipped,
+        },
+    }
+    if match:
+        result["visual_match"] = {**match, "mode": "reuse_ocr"}
+    save_case(result)
+
+    chain_log(
+        action="ANALYZE_TIERED",
+        actor="system",
+        target=file_id,
+        meta={
+            "timestamp": datetime.now().isoformat(),
+            "tier": tier,
+            "verdict": verdict,
+            "entities_found": len(entities),
+            "urls_scanned": len(url_qr_findings),
+            "risk_score": risk_result["score"],
+            "risk_level": risk_result["risk_level"],
+            "skipped": skipped,
+        },
+    )
+
+    return {
+        "status": "success ✅",
+        "message": f"Tier {tier} heuristic verdict ({verdict}); deep analysis skipped. Re-run without cascade to force it.",
+        **result
+    }
+
+
 @router.post("/analyze")
-def analyze(file_id: str = Form(...)):
-    file_path = os.path.join(UPLOAD_DIR, file_id)
+def analyze(file_id: str = Form(...), visual_match: str = Form("off"), cascade: bool = Form(False)):
+    file_path = evidence_path(file_id)
 
-    if not os.path.exists(file_path):
+    if not file_path:
         raise HTTPException(status_code=404, detail=f"File not found: {file_id}")
+    if visual_match not in VISUAL_MATCH_MODES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Invalid visual_match '{visual_match}'. Allowed: {', '.join(sorted(VISUAL_MATCH_MODES))}",
+        )
 
+    started = time.time()
     try:
+        # 0️⃣ Perceptual-hash shortcut for re-shared screenshots
+        match = None
+        if visual_match != "off":
+            found = _verified_visual_match(file_id, file_path)
+            if found:
+                match, source = found
+                if visual_match == "instant":
+                    return _instant_visual_result(file_id, match, source)
+
+        # Text that needs no OCR: plain-text evidence, or the visual match's earlier OCR
+        plain_text = _plain_text(file_path)
+        raw_text = source.get("raw_text", "") if match else plain_text
+        qr_links = extract_qr_codes(file_path) if plain_text is None else []
+        ocr_sec = None
+
+        # ⚡ Cascade: tier 0 scores what is free, tier 1 adds OCR; a decisive score ends here
+        if cascade:
+            for tier in (0, 1):
+                if tier == 1:
+                    if raw_text is not None:
+                        break
+                    ocr_started = time.time()
+                    raw_text = extract_text_from_image(file_path)
+                    ocr_sec = time.time() - ocr_started
+                    gc.collect()
+                text = raw_text or ""
+                heuristic = _heuristic_pass(file_id, text, qr_links)
+                risk_result = heuristic[2]
+                verdict = decisive(risk_result["score"], bool(text.strip()),
+                                   benign_evidence=bool(risk_result["factors"]["clean_history"]))
+                if verdict:
+                    ocr_skipped = tier == 0 and not match and plain_text is None
+                    response = _tiered_result(file_id, text, tier, verdict, heuristic, match, ocr_skipped)
+                    record_run(file_id, "cascade", tier, ocr_skipped=ocr_skipped, deep_skipped=True,
+                               ocr_sec=ocr_sec, deep_sec=None, total_sec=time.time() - started)
+                    return response
+
         # 1️⃣ OCR Extraction
         # Image processing is heavy on RAM. We clear it immediately after getting text.
-        raw_text = extract_text_from_image(file_path)
+        if raw_text is None:
+            ocr_started = time.time()
+            raw_text = extract_text_from_image(file_path)
+            ocr_sec = time.time() - ocr_started
         gc.collect() 
+        deep_started = time.time()
 
         # 2️⃣ Entity Recognition (Regex + NER)
         # NER models (like Spacy/BERT) can be large.
         regex_hits = extract_entities(raw_text)
         ner_hits = extract_named_entities(raw_text)
-        all_entities = regex_hits + ner_hits
+        all_entities = canonicalize_entities(regex_hits + ner_hits)
         
         # Clear intermediate lists and force garbage collection
         del regex_hits, ner_hits
@@ -57,26 +243,14 @@ def analyze(file_id: str = Form(...)):
         gc.collect()
 
         # 5️⃣ Risk Assessment (multi-factor AI risk fusion)
-        risk_result = assess_risk(raw_text, all_entities, scam_class, osint_hits)
+        risk_result = assess_risk(raw_text, all_entities, scam_class, osint_hits, file_id)
         risk_score = risk_result.get("score", 0.0)
 
-        # 6️⃣ URL + QR Analysis (Heuristic + OSINT-integrated)
-        url_qr_findings = scan_urls_and_qr(raw_text, file_path)
+        # 6️⃣ URL + QR Analysis (Heuristic + OSINT-integrated); QR codes were decoded above
+        url_qr_findings = scan_links(extract_urls(raw_text) + qr_links)
         gc.collect()
-
-        # ✅ Derive Summary from URL + QR results
-        risk_levels = [u["risk_level"] for u in url_qr_findings] if url_qr_findings else []
-        summary_counter = Counter(risk_levels)
-        total_urls = len(url_qr_findings)
-        high_risk_domains = [u["domain"] for u in url_qr_findings if u["risk_level"] == "High"]
-
-        url_summary = {
-            "total_urls_scanned": total_urls,
-            "high_risk": summary_counter.get("High", 0),
-            "medium_risk": summary_counter.get("Medium", 0),
-            "low_risk": summary_counter.get("Low", 0),
-            "top_high_risk_domains": list(set(high_risk_domains))[:5],
-        }
+        url_summary = _url_summary(url_qr_findings)
+        deep_sec = time.time() - deep_started
 
         # 7️⃣ Chain-of-Custody Logging
         chain_log(
@@ -86,7 +260,7 @@ def analyze(file_id: str = Form(...)):
             meta={
                 "timestamp": datetime.now().isoformat(),
                 "entities_found": len(all_entities),
-                "urls_scanned": total_urls,
+                "urls_scanned": url_summary["total_urls_scanned"],
                 "category": scam_class.get("category"),
                 "risk_score": risk_score,
                 "risk_level": risk_result.get("risk_level"),
@@ -106,10 +280,12 @@ def analyze(file_id: str = Form(...)):
             "url_summary": url_summary,
             "analyzed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         }
+        if match:
+            result["visual_match"] = {**match, "mode": "reuse_ocr"}
 
-        cache_path = os.path.join(CACHE_DIR, f"{file_id}.json")
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        save_case(result)
+        record_run(file_id, "cascade" if cascade else "full", 2, ocr_skipped=False, deep_skipped=False,
+                   ocr_sec=ocr_sec, deep_sec=deep_sec, total_sec=time.time() - started)
 
         return {
             "status": "success ✅",
@@ -131,4 +307,10 @@ def analyze(file_id: str = Form(...)):
             meta={"error": str(e), "trace": error_trace},
         )
 
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {e}")
+
+
+@router.get("/analyze/cascade-stats")
+def analyze_cascade_stats():
+    """How often the cascade settled a case early, and the estimated compute it saved."""
+    return cascade_stats()
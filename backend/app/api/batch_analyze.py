@@ -1,12 +1,14 @@
 # app/api/batch_analyze.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
-import os, shutil, json, traceback, uuid
+from fastapi import APIRouter, UploadFile, File, HTTPException, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+import os, json, traceback, uuid, asyncio
 from datetime import datetime
 
-from app.pipelines.batch_analyzer import analyze_batch
-from app.reports.unified_report_generator import generate_unified_report  # ✅ Correct import
 from app.services.chainlog import chain_log
+from app.services.blob_store import put_stream, link
+from app.services import batch_jobs, event_bus
+from app.services.archive_ingest import ArchiveIngest
 
 router = APIRouter()
 
@@ -20,76 +22,150 @@ for d in [UPLOAD_DIR, CACHE_DIR, REPORT_DIR, BATCH_DIR]:
     os.makedirs(d, exist_ok=True)
 
 
+def _store_batch_files(batch_path: str, files: list) -> tuple:
+    # Batch entries link to content-addressed blobs instead of holding copies
+    file_paths, hashes, used = [], [], set()
+    for f in files:
+        name = os.path.basename((f.filename or "").replace("\\", "/")) or "upload"
+        unique, n = name, 1
+        while unique in used:  # same filename twice in one upload
+            unique, n = f"{n}_{name}", n + 1
+        used.add(unique)
+        blob = put_stream(f.file)
+        file_paths.append(link(blob["sha256"], os.path.join(batch_path, unique)))
+        hashes.append(blob["sha256"])
+    return file_paths, hashes
+
+
 @router.post("/batch-analyze")
 async def batch_analyze(files: list[UploadFile] = File(...)):
     """
-    Handles multi-file evidence analysis and creates a unique batch directory.
-    Each file is analyzed through OCR + NER + OSINT + Risk pipeline.
-    Returns a batch_id and summary of analyzed cases.
+    Stores a multi-file evidence batch and starts its analysis in the background.
+    Each file goes through the OCR + NER + OSINT + Risk pipeline on a bounded
+    worker pool; follow progress at /batch-analyze/{batch_id}/events (SSE) or
+    /stream (NDJSON). The unified report is built when the last file finishes.
     """
-    try:
-        if not files:
-            raise HTTPException(status_code=400, detail="No files provided.")
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided.")
 
+    try:
         # ✅ Create batch folder
         batch_id = str(uuid.uuid4())[:8]
         batch_path = os.path.join(BATCH_DIR, batch_id)
         os.makedirs(batch_path, exist_ok=True)
 
-        file_paths = []
-        for f in files:
-            dest_path = os.path.join(batch_path, f.filename)
-            with open(dest_path, "wb") as out:
-                shutil.copyfileobj(f.file, out)
-            file_paths.append(dest_path)
+        file_paths, hashes = await run_in_threadpool(_store_batch_files, batch_path, files)
 
-        # 🧾 Log upload batch
-        chain_log(
+        # 🧾 Log upload batch (durable: waits for the fsync, so off the event loop)
+        await run_in_threadpool(
+            chain_log,
             action="BATCH_UPLOAD",
             actor="system",
             target=batch_id,
             meta={
                 "file_count": len(file_paths),
                 "files": [os.path.basename(p) for p in file_paths],
+                "sha256": hashes,
                 "timestamp": datetime.now().isoformat(),
             },
         )
 
-        # 🧠 Run batch analysis pipeline (your existing analyzer)
-        batch_results = analyze_batch(file_paths)
+        # 🧠 Analysis runs in the background; each file's result is cached by case_store.save_case
+        job = await run_in_threadpool(batch_jobs.start_batch, batch_id, file_paths, hashes)
 
-        # 🗂 Save each file’s analysis result to cache
-        for result in batch_results:
-            file_id = os.path.splitext(os.path.basename(result["file_id"]))[0]
-            cache_path = os.path.join(CACHE_DIR, f"{file_id}.json")
-            with open(cache_path, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2, ensure_ascii=False)
+    except Exception as e:
+        print("❌ Batch analyze error:", traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
 
-        # ✅ Optional: also generate unified PDF automatically
-        pdf_bytes, pdf_path = generate_unified_report(batch_results, batch_id=batch_id)
+    return {
+        "status": "accepted",
+        "batch_id": batch_id,
+        "total_files": job["total"],
+        "files_processed": [os.path.basename(p) for p in file_paths],
+        "events": f"/api/batch-analyze/{batch_id}/events",
+        "stream": f"/api/batch-analyze/{batch_id}/stream",
+        "message": f"Batch {batch_id} queued for analysis.",
+    }
 
-        # 🧾 Log completion
-        chain_log(
-            action="BATCH_ANALYSIS_COMPLETE",
-            actor="system",
-            target=batch_id,
-            meta={
-                "total_cases": len(batch_results),
-                "report_path": pdf_path,
-                "timestamp": datetime.now().isoformat(),
-            },
-        )
 
-        # ✅ Return structured response for frontend
-        return {
-            "status": "success",
-            "batch_id": batch_id,
-            "total_files": len(batch_results),
-            "files_processed": [os.path.basename(p) for p in file_paths],
-            "unified_report": pdf_path,
-            "message": f"Batch {batch_id} analyzed successfully.",
-        }
+@router.post("/batch-analyze/archive")
+async def batch_analyze_archive(
+    request: Request,
+    filename: str = Query("archive", description="Original archive name, recorded in the chain of custody"),
+    skip_known: bool = Query(True, description="Skip entries whose content is already in the evidence store"),
+):
+    """
+    Ingests a ZIP or TAR(.gz) evidence drop sent as the raw request body
+    (e.g. curl --data-binary @drop.zip). Entries are stored and queued for
+    analysis as they stream in; the response is returned once the archive
+    has been read, and progress follows on the usual batch event streams.
+    """
+    batch_id = str(uuid.uuid4())[:8]
+    ingest = await run_in_threadpool(ArchiveIngest, batch_id, os.path.basename(filename), skip_known)
+    parser = asyncio.ensure_future(run_in_threadpool(ingest.run))
+    try:
+        async for chunk in request.stream():
+            if chunk and not await run_in_threadpool(ingest.feed, chunk):
+                break  # parser stopped (end of archive or unreadable data)
+    finally:
+        await run_in_threadpool(ingest.feed, b"")
+    result = await parser
+
+    if result["error"] and not result["queued"]:
+        raise HTTPException(status_code=422, detail=f"Archive rejected: {result['error']}")
+    return {
+        "status": "accepted",
+        "batch_id": batch_id,
+        **result,
+        "events": f"/api/batch-analyze/{batch_id}/events",
+        "stream": f"/api/batch-analyze/{batch_id}/stream",
+        "message": f"Batch {batch_id}: {result['queued']} of {result['entries']} archive entries queued for analysis.",
+    }
 
-    except Exception as e:
-        print("❌ Batch analyze error:", traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
+
+def _job_or_404(batch_id: str) -> dict:
+    job = batch_jobs.job_status(batch_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Batch '{batch_id}' not found.")
+    return job
+
+
+@router.get("/batch-analyze/{batch_id}")
+def batch_status(batch_id: str):
+    return _job_or_404(batch_id)
+
+
+@router.post("/batches/{batch_id}/resume")
+def resume_batch(batch_id: str):
+    """Continue an interrupted batch from its manifest; finished files are not analyzed again."""
+    try:
+        job = batch_jobs.resume_batch(batch_id)
+    except batch_jobs.BatchBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Batch '{batch_id}' not found.")
+    return job
+
+
+@router.get("/batch-analyze/{batch_id}/events")
+def batch_events(
+    batch_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """Per-file results as Server-Sent Events (file_done, file_retry, file_failed, batch_complete). Replays from the start."""
+    _job_or_404(batch_id)
+    return event_bus.sse_response(
+        request, [batch_jobs.channel(batch_id)], last_event_id or "0",
+        stop_on=["batch_complete"], settled=lambda: batch_jobs.completion(batch_id),
+    )
+
+
+@router.get("/batch-analyze/{batch_id}/stream")
+def batch_stream(batch_id: str, request: Request, since: int = Query(0, description="Resume after this event id")):
+    """Per-file results as NDJSON, one line per event; the response ends with batch_complete."""
+    _job_or_404(batch_id)
+    return event_bus.ndjson_response(
+        request, [batch_jobs.channel(batch_id)], str(since),
+        stop_on=["batch_complete"], settled=lambda: batch_jobs.completion(batch_id),
+    )
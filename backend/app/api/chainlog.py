@@ -0,0 +1,82 @@
+"""
+🔗 Chain-of-Custody API
+Query and integrity verification for the hash-chained custody log, plus
+re-verification of stored evidence against its recorded hashes.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.services.chainlog import verify_chain, flush_chain_log, query_log, log_stats
+from app.services import integrity_audit
+
+router = APIRouter(tags=["Chain of Custody"])
+
+
+def _iso(value: Optional[str], name: str) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"'{name}' must be an ISO-8601 timestamp (UTC)")
+
+
+@router.get("/chainlog")
+def list_entries(
+    target: Optional[str] = Query(None, description="File id, batch id or report target"),
+    action: Optional[str] = Query(None, description="e.g. UPLOAD_EVIDENCE, ANALYZE_EVIDENCE"),
+    since: Optional[str] = Query(None, description="ISO timestamp (UTC), inclusive"),
+    until: Optional[str] = Query(None, description="ISO timestamp (UTC), inclusive"),
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = Query(None, description="Pagination cursor from next_before_id"),
+):
+    """Custody history, newest first, served from the sidecar index."""
+    flush_chain_log()
+    return query_log(
+        target=target,
+        action=action.upper() if action else None,
+        since=_iso(since, "since"),
+        until=_iso(until, "until"),
+        limit=limit,
+        before_id=before_id,
+    )
+
+
+@router.get("/chainlog/stats")
+def stats():
+    return log_stats()
+
+
+@router.get("/chainlog/verify")
+def verify(full: bool = Query(False, description="Rehash from genesis instead of the last verified checkpoint")):
+    """Validate hashes, sequence numbers and checkpoints of the custody log."""
+    flush_chain_log()
+    return verify_chain(full=full)
+
+
+# -------------------------------------------------------
+# 🛡️ Evidence Integrity Audit
+# -------------------------------------------------------
+@router.post("/integrity/audit")
+def start_integrity_audit(full: bool = Query(False, description="Re-hash everything, ignoring unchanged-file skips")):
+    """Start a background re-hash of stored evidence; poll GET /integrity/audit for the result."""
+    try:
+        return integrity_audit.start_audit(full=full)
+    except integrity_audit.AuditRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/integrity/audit")
+def integrity_audit_summary(limit: int = Query(10, ge=1, le=100)):
+    return integrity_audit.audit_summary(limit=limit)
+
+
+@router.get("/integrity/audit/{run_id}")
+def integrity_audit_run(run_id: int):
+    run = integrity_audit.audit_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail=f"Audit run not found: {run_id}")
+    return run
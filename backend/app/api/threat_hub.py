@@ -1,195 +1,313 @@
 # app/api/threat_hub.py
-from fastapi import APIRouter, Query, HTTPException, UploadFile, File, Form
-import os, json
-from collections import defaultdict, Counter
-from datetime import datetime
+from fastapi import APIRouter, Query, HTTPException, UploadFile, File, Request, Header
+from fastapi.responses import Response
+import os
 from urllib.parse import unquote
-import uuid
-import shutil
+from typing import Optional
+import time
+
+from app.pipelines.entity_canonical import canonical_keys, guess_entity
+from app.services import search_index, case_clusters, near_duplicates, entity_counters, event_bus, entity_graph, entity_reputation, ioc_snapshot, risk_rescore
+from app.services.case_store import parse_timestamp, load_case, INTEL_CHANNEL
+from app.services.case_table import case_table
 
 router = APIRouter()
 
-CACHE_DIR = "app/data/analysis_cache"
-DB_PATH = "app/data/knowledge_db.jsonl"
 os.makedirs("app/data", exist_ok=True)
 
 
-# -----------------------------------------------------------
-# 🧠 Utility: Load all analyzed cases (cached JSONs)
-# -----------------------------------------------------------
-def load_all_cases():
-    cases = []
-    for file in os.listdir(CACHE_DIR):
-        if file.endswith(".json"):
-            try:
-                with open(os.path.join(CACHE_DIR, file), "r", encoding="utf-8") as f:
-                    cases.append(json.load(f))
-            except Exception as e:
-                print(f"⚠️ Skipping {file}: {e}")
-    return cases
-
-
 # -----------------------------------------------------------
 # 🔍 1️⃣ Entity / Case Search
 # -----------------------------------------------------------
 @router.get("/cases/search")
-def search_cases(q: str = Query("", description="Optional search filter")):
-    """Return all analyzed cases (flattened summary for dashboard)."""
-    results = []
-    for case in load_all_cases():
-        if q.lower() in json.dumps(case).lower():
-            results.append({
-                "file_id": case.get("file_id"),
-                "scam_class": {
-                    "category": case.get("scam_class", {}).get("category", "Unknown")
-                },
-                "risk": {
-                    "score": case.get("risk", {}).get("score", 0.0),
-                    "risk_level": case.get("risk", {}).get("risk_level", "N/A")
-                },
-                "analyzed_at": case.get("analyzed_at"),
-            })
-    return results
-
+def search_cases(
+    q: str = Query("", description="Full-text query: words, \"exact phrases\" and prefix* terms"),
+    category: Optional[str] = Query(None, description="Exact scam category"),
+    min_risk: Optional[float] = Query(None, ge=0.0, le=1.0),
+    max_risk: Optional[float] = Query(None, ge=0.0, le=1.0),
+    date_from: Optional[str] = Query(None, description="ISO date/time, inclusive"),
+    date_to: Optional[str] = Query(None, description="ISO date/time, inclusive"),
+    limit: int = Query(50, ge=1, le=search_index.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """Ranked (BM25) search over OCR text and entity values, newest first when q is empty."""
+    bounds = {}
+    for name, raw in (("date_from", date_from), ("date_to", date_to)):
+        if raw:
+            ts = parse_timestamp(raw)
+            if not ts:
+                raise HTTPException(status_code=422, detail=f"Invalid {name}: {raw}")
+            bounds[name] = ts
+
+    try:
+        return search_index.search(
+            q=q,
+            category=category,
+            min_risk=min_risk,
+            max_risk=max_risk,
+            date_from=bounds.get("date_from"),
+            date_to=bounds.get("date_to"),
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 
 # -----------------------------------------------------------
 # 📊 2️⃣ Top Entities Across Cases
 # -----------------------------------------------------------
 @router.get("/cases/top-entities")
-def top_entities(limit: int = 10):
-    """List most common entities across all cached cases."""
-    freq = defaultdict(lambda: {"count": 0, "risk_sum": 0.0})
-    for case in load_all_cases():
-        for ent in case.get("entities", []):
-            key = ent["value"].lower()
-            freq[key]["count"] += 1
-            freq[key]["risk_sum"] += case.get("risk", {}).get("score", 0.0)
-
-    ranked = sorted(
-        [
-            {
-                "entity": k,
-                "count": v["count"],
-                "avg_risk": round(v["risk_sum"] / v["count"], 2),
-            }
-            for k, v in freq.items()
-        ],
-        key=lambda x: x["count"],
-        reverse=True,
-    )
+def top_entities(limit: int = Query(10, ge=1, le=1000)):
+    """List most common entities (by canonical key) across all analyzed cases."""
+    return entity_counters.top_entities(limit=limit)
 
-    return {"total_entities": len(freq), "top": ranked[:limit]}
+
+@router.get("/cases/trending-entities")
+def trending_entities(
+    window: str = Query("day", description="hour | day | week"),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Entities surging in a recent time window (sketch-based estimates)."""
+    if window not in entity_counters.WINDOWS:
+        raise HTTPException(status_code=422, detail=f"Invalid window '{window}'. Allowed: {', '.join(entity_counters.WINDOWS)}")
+    return entity_counters.trending_entities(window=window, limit=limit)
 
 
 # -----------------------------------------------------------
 # 🧩 3️⃣ Entity Intelligence Profile
 # -----------------------------------------------------------
-# at top of file
-from urllib.parse import unquote
-from fastapi import Query, HTTPException
-
-# replace existing endpoint with this
 @router.get("/entities/profile")
 def entity_profile(entity: str = Query(None), value: str = Query(None)):
-    # Accept either ?entity=... or ?value=...; decode and normalize
-    raw = entity or value or ""
-    query_value = unquote(raw).strip().lower()
-
-    if not query_value:
+    # Accept either ?entity=... or ?value=...; decode and canonicalize
+    raw = unquote(entity or value or "").strip()
+    if not raw:
         raise HTTPException(status_code=422, detail="Missing 'entity' or 'value' query parameter")
 
-    cases_found = []
-    categories, risk_scores = set(), []
-
-    for case in load_all_cases():
-        for ent in case.get("entities", []):
-            ent_val = (ent.get("value", "") or "").lower()
-            if query_value in ent_val:
-                cases_found.append({
-                    "case_id": case["file_id"],
-                    "category": case.get("scam_class", {}).get("category"),
-                    "risk_score": case.get("risk", {}).get("score"),
-                    "osint_hits": case.get("osint_hits", []),
-                    "timestamp": case.get("analyzed_at"),
-                })
-                categories.add(case.get("scam_class", {}).get("category"))
-                risk_scores.append(case.get("risk", {}).get("score", 0.0))
-
-    if not cases_found:
-        raise HTTPException(status_code=404, detail=f"Entity '{query_value}' not found in any case")
+    keys = canonical_keys(guess_entity(raw))
+    rows = case_clusters.find_cases_by_entity(keys, contains=raw.lower())
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Entity '{raw}' not found in any case")
 
+    cases_found = []
+    for row in rows:
+        case = load_case(row["file_id"]) or {}
+        cases_found.append({
+            "case_id": row["file_id"],
+            "category": row["category"],
+            "risk_score": row["risk_score"],
+            "osint_hits": case.get("osint_hits", []),
+            "timestamp": row["analyzed_at"],
+        })
+
+    categories = {r["category"] for r in rows if r["category"]}
+    risk_scores = [r["risk_score"] or 0.0 for r in rows]
     avg_risk = round(sum(risk_scores) / len(risk_scores), 2) if risk_scores else 0.0
     return {
-        "entity": query_value,
+        "entity": raw.lower(),
+        "canonical_keys": keys,
         "found_in": len(cases_found),
-        "linked_categories": [c for c in categories if c],
+        "linked_categories": list(categories),
         "avg_risk": avg_risk,
+        "reputation": entity_reputation.reputation(keys),
         "cases": cases_found,
     }
 
 
-
+@router.get("/entities/central")
+def central_entities(
+    method: str = Query("pagerank", description="pagerank | eigenvector"),
+    min_cases: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=500),
+):
+    """Entities ranked by centrality in the co-occurrence graph (who a campaign hinges on)."""
+    try:
+        return entity_graph.central_entities(limit=limit, method=method, min_cases=min_cases)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/entities/{value:path}/neighbors")
+def entity_neighbors(
+    value: str,
+    method: str = Query("pagerank", description="pagerank | eigenvector"),
+    limit: int = Query(20, ge=1, le=500),
+):
+    """Entities that appear in the same cases as `value`, most shared cases first."""
+    if method not in entity_graph.METHODS:
+        raise HTTPException(status_code=422, detail=f"Unsupported method '{method}'")
+    raw = unquote(value).strip()
+    result = entity_graph.neighbors(canonical_keys(guess_entity(raw)), limit=limit, method=method)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Entity '{raw}' not found in any case")
+    return result
 
 
 # -----------------------------------------------------------
 # 🔗 4️⃣ Scam Cluster Detection
 # -----------------------------------------------------------
 @router.get("/cases/clusters")
-def case_clusters():
-    """Detect scam clusters based on shared entities."""
-    cases = load_all_cases()
-    graph = defaultdict(set)
-    entity_to_cases = defaultdict(set)
-
-    # Build map: entity → cases
-    for case in cases:
-        cid = case["file_id"]
-        for ent in case.get("entities", []):
-            entity_to_cases[ent["value"].lower()].add(cid)
-
-    # Link cases sharing the same entity
-    for entity, linked_cases in entity_to_cases.items():
-        for c1 in linked_cases:
-            for c2 in linked_cases:
-                if c1 != c2:
-                    graph[c1].add(c2)
-
-    clusters = []
-    visited = set()
-
-    def dfs(case_id, cluster):
-        if case_id in visited:
-            return
-        visited.add(case_id)
-        cluster.add(case_id)
-        for neighbor in graph[case_id]:
-            dfs(neighbor, cluster)
-
-    for cid in graph.keys():
-        if cid not in visited:
-            cluster = set()
-            dfs(cid, cluster)
-            if len(cluster) > 1:
-                clusters.append(list(cluster))
-
-    return {"total_clusters": len(clusters), "clusters": clusters}
+def case_clusters_view(
+    min_size: int = Query(2, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """Scam clusters (cases linked through shared entities), largest first."""
+    return case_clusters.list_clusters(min_size=min_size, limit=limit, offset=offset)
+
+
+@router.get("/cases/clusters/{cluster_id}")
+def cluster_detail(cluster_id: str):
+    cluster = case_clusters.get_cluster(cluster_id)
+    if not cluster:
+        raise HTTPException(status_code=404, detail=f"Cluster '{cluster_id}' not found")
+    return cluster
+
+
+@router.get("/cases/{file_id}/near-duplicates")
+def case_near_duplicates(
+    file_id: str,
+    threshold: float = Query(
+        near_duplicates.DEFAULT_THRESHOLD, ge=near_duplicates.MIN_THRESHOLD, le=1.0,
+        description="Minimum estimated Jaccard similarity; the LSH index has little recall below 0.5",
+    ),
+    limit: int = Query(20, ge=1, le=200),
+):
+    """Cases whose OCR text is a near-copy of this one (same template, edited details)."""
+    matches = near_duplicates.near_duplicates(file_id, threshold=threshold, limit=limit)
+    if matches is None:
+        raise HTTPException(status_code=404, detail=f"No indexed text for case '{file_id}'")
+    return {"file_id": file_id, "threshold": threshold, "count": len(matches), "near_duplicates": matches}
 
 
 # -----------------------------------------------------------
-# 🧠 5️⃣ Persistent Threat Knowledge DB (Optional)
+# 🧮 Vectorized Filters & Aggregations
 # -----------------------------------------------------------
-def append_to_knowledge_db(case_data: dict):
-    """Persist summarized entity knowledge for global search."""
-    with open(DB_PATH, "a", encoding="utf-8") as f:
-        json.dump(
-            {
-                "timestamp": datetime.now().isoformat(),
-                "file_id": case_data.get("file_id"),
-                "entities": [e["value"] for e in case_data.get("entities", [])],
-                "risk_score": case_data.get("risk", {}).get("score"),
-                "category": case_data.get("scam_class", {}).get("category"),
-            },
-            f,
+def _table_filters(category, min_risk, max_risk, days):
+    return {
+        "category": category,
+        "min_risk": min_risk,
+        "max_risk": max_risk,
+        "since": time.time() - days * 86400 if days else None,
+    }
+
+
+@router.get("/cases/filter")
+def filter_cases(
+    category: Optional[str] = Query(None),
+    min_risk: Optional[float] = Query(None, ge=0.0, le=1.0),
+    max_risk: Optional[float] = Query(None, ge=0.0, le=1.0),
+    days: Optional[float] = Query(None, gt=0, description="Only cases analyzed in the last N days"),
+    limit: int = Query(100, ge=1, le=5000),
+):
+    """Case summaries matching every filter (newest first), scanned column-wise in memory."""
+    return case_table.filter(limit=limit, **_table_filters(category, min_risk, max_risk, days))
+
+
+@router.get("/cases/aggregate")
+def aggregate_cases(
+    by: str = Query("category", description="category | entity"),
+    category: Optional[str] = Query(None),
+    min_risk: Optional[float] = Query(None, ge=0.0, le=1.0),
+    max_risk: Optional[float] = Query(None, ge=0.0, le=1.0),
+    days: Optional[float] = Query(None, gt=0),
+    min_cases: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=1000),
+):
+    """Case count and average risk per category or per canonical entity over the filtered cases."""
+    try:
+        return case_table.aggregate(
+            by=by, limit=limit, min_cases=min_cases, **_table_filters(category, min_risk, max_risk, days)
         )
-        f.write("\n")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/cases/rescore")
+def rescore_cases(
+    apply: bool = Query(False, description="Write the new scores; by default only report what would change"),
+    top: int = Query(20, ge=0, le=500, description="Largest score changes to list"),
+):
+    """Re-run risk fusion over every stored case with the current reputation ledger, IOC snapshot and weights."""
+    try:
+        result = risk_rescore.rescore_corpus(apply=apply, top=top)
+    except risk_rescore.RescoreRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if apply:
+        case_table.refresh()
+    return result
+
+
+# -----------------------------------------------------------
+# 📡 Live Threat-Hub Feed
+# -----------------------------------------------------------
+@router.get("/intel/snapshot")
+def intel_snapshot(
+    cases: int = Query(50, ge=1, le=500),
+    entities: int = Query(20, ge=1, le=500),
+    clusters: int = Query(20, ge=1, le=200),
+):
+    """
+    Initial dashboard state plus the event id it is current as of. Open
+    /intel/stream with `Last-Event-ID: <last_event_id>` and apply its events on top.
+    """
+    # Read the event id first: anything after it is replayed, and events carry
+    # absolute values, so overlap with the snapshot is harmless.
+    last_event_id = event_bus.last_event_id()
+    return {
+        "last_event_id": last_event_id,
+        "recent_cases": search_index.search(limit=cases)["cases"],
+        "top_entities": entity_counters.top_entities(limit=entities),
+        "clusters": case_clusters.list_clusters(limit=clusters),
+    }
+
+
+@router.get("/intel/stream")
+async def intel_stream(
+    request: Request,
+    since: Optional[str] = Query(None, description="Snapshot `last_event_id` (EventSource can't set headers)"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events as analyses complete: `case_summary`, `entity_delta`
+    (absolute counts for the entities a case added) and `cluster_merge`.
+    """
+    # The header wins: browsers send it on automatic reconnects.
+    return event_bus.sse_response(request, [INTEL_CHANNEL], last_event_id or since)
+
+
+# -----------------------------------------------------------
+# 🛰️ IOC Snapshot Exchange (between deployments)
+# -----------------------------------------------------------
+@router.get("/intel/ioc/export")
+def export_ioc_snapshot(
+    since: Optional[float] = Query(None, description="Delta since this epoch time (previous snapshot's created_at)"),
+    min_risk: float = Query(ioc_snapshot.DEFAULT_MIN_RISK, ge=0.0, le=1.0),
+    min_cases: int = Query(1, ge=1),
+):
+    """Download this node's high-risk entities as a gzip-compressed snapshot (full, or delta with `since`)."""
+    try:
+        blob = ioc_snapshot.export_snapshot(since=since, min_risk=min_risk, min_cases=min_cases)
+    except ioc_snapshot.SnapshotError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    kind = "delta" if since else "full"
+    return Response(
+        content=blob,
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="ioc-{ioc_snapshot.NODE_ID}-{kind}.json.gz"'},
+    )
+
+
+@router.post("/intel/ioc/import")
+async def import_ioc_snapshot(file: UploadFile = File(...)):
+    """Load a partner node's snapshot; its entities then raise risk in URL and entity scoring."""
+    try:
+        return ioc_snapshot.import_snapshot(await file.read())
+    except ioc_snapshot.SnapshotError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/intel/ioc/status")
+def ioc_status():
+    return ioc_snapshot.ioc_index.stats()
+
@@ -5,6 +5,7 @@ import os, json
 from datetime import datetime
 
 from app.reports.unified_report_generator import generate_unified_report
+from app.pipelines.batch_analyzer import save_batch_summary
 from app.services.chainlog import chain_log
 
 router = APIRouter()
@@ -69,9 +70,13 @@ def unified_report(batch_id: str = Form(...)):
 
     # ✅ Generate unified report
     try:
-        pdf_bytes, pdf_path = generate_unified_report(batch_cases, batch_id=batch_id)
+        save_batch_summary(batch_id, batch_cases)
+        report = generate_unified_report(batch_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unified report generation failed: {e}")
+    if "error" in report:
+        raise HTTPException(status_code=500, detail=f"Unified report generation failed: {report['error']}")
+    pdf_path = report["pdf_path"]
 
     if not os.path.exists(pdf_path):
         raise HTTPException(status_code=500, detail="PDF generation failed — no file created.")
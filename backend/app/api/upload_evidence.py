@@ -1,12 +1,20 @@
 # app/api/upload_evidence.py
-import hashlib, os, uuid, json
+import os, uuid, json
 from datetime import datetime
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.chainlog import chain_log
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, Header, Request, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from app.services.chainlog import chain_log, ChainLogError
+from app.services.blob_store import BlobWriter, CHUNK_SIZE, link
+from app.services import upload_sessions
+from app.services.upload_sessions import SessionError
 from app.pipelines.url_qr_scanner import scan_urls_and_qr
+from app.services.image_index import image_hashes, index_image, find_visual_matches
 
 router = APIRouter()
 
+ALLOWED_EXTS = {".png", ".jpg", ".jpeg", ".pdf", ".txt"}
+
 UPLOAD_DIR = "app/data/uploads"
 META_DIR = "app/data/metadata"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -14,93 +22,220 @@ os.makedirs(META_DIR, exist_ok=True)
 
 
 # -------------------------------------------------------
-# 🧠 Utility: Compute SHA-256 for file integrity
+# 🗂️ Metadata
 # -------------------------------------------------------
-def sha256_file(file_path: str) -> str:
-    sha = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            sha.update(chunk)
-    return sha.hexdigest()
+def _meta_path(file_id: str) -> str:
+    return os.path.join(META_DIR, f"{os.path.basename(file_id)}.json")
+
+
+def _write_metadata(file_id: str, metadata: dict):
+    # Atomic replace: the background pre-scan rewrites this file while readers may be open.
+    tmp_path = _meta_path(file_id) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, _meta_path(file_id))
+
+
+def _visual_fingerprint(file_id: str, file_path: str):
+    """Perceptual hash — flags re-shared screenshots of known cases."""
+    visual_hashes = image_hashes(file_path)
+    visual_matches = []
+    if visual_hashes:
+        index_image(file_id, visual_hashes)
+        visual_matches = find_visual_matches(visual_hashes, exclude=file_id)
+    return visual_hashes, visual_matches
+
+
+def _background_pre_scan(file_id: str, file_path: str):
+    """QR/URL pre-scan (OpenCV + OSINT lookups), attached to the metadata when done."""
+    started = datetime.now()
+    try:
+        result = scan_urls_and_qr(None, file_path)
+        status = "complete"
+    except Exception as e:
+        result, status = {"error": f"Pre-scan failed: {str(e)}"}, "failed"
+
+    with open(_meta_path(file_id), "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    metadata["pre_scan"] = result
+    metadata["pre_scan_status"] = status
+    metadata["pre_scan_sec"] = round((datetime.now() - started).total_seconds(), 2)
+    _write_metadata(file_id, metadata)
 
 
 # -------------------------------------------------------
 # 🚀 Upload Route
 # -------------------------------------------------------
 @router.post("/upload-evidence")
-async def upload_evidence(file: UploadFile = File(...)):
+async def upload_evidence(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """
-    Uploads digital evidence, verifies integrity, logs the chain-of-custody,
-    and performs instant QR/URL pre-scan for early threat signals.
+    Uploads digital evidence, verifies integrity and logs the chain-of-custody.
+    Disk I/O runs off the event loop; the QR/URL pre-scan runs as a background
+    task and lands in the file's metadata (GET /evidence/{file_id}).
     """
     # ✅ Step 1: Validate file type
-    allowed_exts = {".png", ".jpg", ".jpeg", ".pdf", ".txt"}
-    ext = os.path.splitext(file.filename)[1].lower()
-    if ext not in allowed_exts:
+    ext = _validate_ext(file.filename)
+
+    # ✅ Step 2: Stream into the content-addressed store, hashing as bytes arrive
+    try:
+        writer = await run_in_threadpool(BlobWriter)
+        try:
+            while content := await file.read(CHUNK_SIZE):
+                await run_in_threadpool(writer.write, content)
+            blob = await run_in_threadpool(writer.commit)
+        except Exception:
+            writer.abort()
+            raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+
+    return await _register_upload(background_tasks, blob, file.filename, ext)
+
+
+def _validate_ext(filename: str) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext not in ALLOWED_EXTS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported file type: {ext}. Allowed: {', '.join(allowed_exts)}",
+            detail=f"Unsupported file type: {ext}. Allowed: {', '.join(ALLOWED_EXTS)}",
         )
+    return ext
 
-    # ✅ Step 2: Save file with UUID (STREAMING)
-    new_name = f"{uuid.uuid4()}{ext}"
-    file_path = os.path.join(UPLOAD_DIR, new_name)
 
+async def _register_upload(background_tasks: BackgroundTasks, blob: dict, original_name: str, ext: str) -> dict:
+    """Give a stored blob its file_id, log custody, write metadata and queue the pre-scan."""
+    # ✅ Step 3: The file_id is a reference to the blob (duplicates share one copy)
+    new_name = f"{uuid.uuid4()}{ext}"
     try:
-        # ⚠️ FIX: Stream chunks instead of reading entire file
-        with open(file_path, "wb") as buffer:
-            while content := await file.read(1024 * 1024):  # 1MB chunks
-                buffer.write(content)
-                
+        file_path = await run_in_threadpool(link, blob["sha256"], os.path.join(UPLOAD_DIR, new_name))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
 
-    # ✅ Step 3: Compute file hash
-    file_hash = sha256_file(file_path)
-
-    # ✅ Step 4: Log to chain of custody
-    chain_log(
-        action="UPLOAD_EVIDENCE",
-        actor="system",
-        target=new_name,
-        sha256=file_hash,
-        meta={
-            "original_name": file.filename,
-            "uploaded_at": datetime.now().isoformat(),
-            "file_type": ext,
-            "size_bytes": os.path.getsize(file_path),
-        },
-    )
-
-    # ✅ Step 5: Instant URL/QR Scan (non-blocking preview)
+    file_hash = blob["sha256"]
+
+    # ✅ Step 4: Log to chain of custody (durable: waits for the fsync, so off the event loop)
     try:
-        pre_scan_result = scan_urls_and_qr(None, file_path)
-    except Exception as e:
-        pre_scan_result = {"error": f"Pre-scan failed: {str(e)}"}
+        await run_in_threadpool(
+            chain_log,
+            action="UPLOAD_EVIDENCE",
+            actor="system",
+            target=new_name,
+            sha256=file_hash,
+            meta={
+                "original_name": original_name,
+                "uploaded_at": datetime.now().isoformat(),
+                "file_type": ext,
+                "size_bytes": blob["size"],
+                "deduplicated": blob["deduplicated"],
+            },
+        )
+    except ChainLogError as e:
+        # No custody entry, no evidence: drop the reference (the blob stays shared/deduplicated).
+        await run_in_threadpool(os.unlink, file_path)
+        raise HTTPException(status_code=500, detail=f"Chain of custody not recorded: {str(e)}")
 
-    # ✅ Step 6: Store structured metadata
+    # ✅ Step 5: Perceptual hash (cheap, off the event loop)
+    visual_hashes, visual_matches = await run_in_threadpool(_visual_fingerprint, new_name, file_path)
+
+    # ✅ Step 6: Store structured metadata; the pre-scan fills in later
     metadata = {
         "file_id": new_name,
-        "original_name": file.filename,
+        "original_name": original_name,
         "sha256": file_hash,
         "uploaded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "stored_at": file_path,
         "file_type": ext,
-        "file_size": os.path.getsize(file_path),
-        "pre_scan": pre_scan_result,
+        "file_size": blob["size"],
+        "blob": blob["path"],
+        "pre_scan": None,
+        "pre_scan_status": "pending",
+        "phash": visual_hashes,
+        "visual_matches": visual_matches,
     }
+    await run_in_threadpool(_write_metadata, new_name, metadata)
 
-    meta_path = os.path.join(META_DIR, f"{new_name}.json")
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
+    # ✅ Step 7: QR/URL pre-scan after the response is sent
+    background_tasks.add_task(_background_pre_scan, new_name, file_path)
 
-    # ✅ Step 7: Return response
     return {
         "status": "success",
         "file_id": new_name,
         "sha256": file_hash,
-        "original_name": file.filename,
+        "original_name": original_name,
         "stored_at": file_path,
-        "pre_scan": pre_scan_result,
-        "message": "Evidence successfully uploaded, verified, logged, and scanned.",
-    }
\ No newline at end of file
+        "deduplicated": blob["deduplicated"],
+        "pre_scan_status": "pending",
+        "visual_matches": visual_matches,
+        "message": "Evidence successfully uploaded, verified and logged; pre-scan running in background.",
+    }
+
+
+@router.get("/evidence/{file_id}")
+def evidence_metadata(file_id: str):
+    """Upload metadata, including the background pre-scan once it has finished."""
+    try:
+        with open(_meta_path(file_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Evidence not found: {file_id}")
+
+
+# -------------------------------------------------------
+# 📦 Resumable Chunked Uploads
+# -------------------------------------------------------
+def _session_or_404(result: Optional[dict], session_id: str) -> dict:
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Upload session not found: {session_id}")
+    return result
+
+
+@router.post("/upload-sessions")
+def create_upload_session(
+    filename: str = Form(...),
+    size: int = Form(..., description="Total file size in bytes"),
+    chunk_size: int = Form(upload_sessions.DEFAULT_CHUNK_SIZE),
+    sha256: Optional[str] = Form(None, description="Optional whole-file SHA-256, checked at completion"),
+):
+    """Start a resumable upload. PUT each chunk to /upload-sessions/{id}/chunks/{offset}, then POST /complete."""
+    _validate_ext(filename)
+    try:
+        return upload_sessions.create_session(filename, size, chunk_size, sha256)
+    except SessionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/upload-sessions/{session_id}")
+def get_upload_session(session_id: str):
+    """Progress, including the offsets still missing (what to re-send after a dropped connection)."""
+    try:
+        return _session_or_404(upload_sessions.session_status(session_id), session_id)
+    except SessionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.put("/upload-sessions/{session_id}/chunks/{offset}")
+async def put_upload_chunk(
+    session_id: str,
+    offset: int,
+    request: Request,
+    x_chunk_sha256: str = Header(..., description="SHA-256 of this chunk's bytes"),
+):
+    """Upload one chunk (raw request body). Chunks may be sent in parallel and in any order."""
+    data = await request.body()
+    try:
+        result = await run_in_threadpool(upload_sessions.write_chunk, session_id, offset, data, x_chunk_sha256)
+    except SessionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return _session_or_404(result, session_id)
+
+
+@router.post("/upload-sessions/{session_id}/complete")
+async def complete_upload_session(session_id: str, background_tasks: BackgroundTasks):
+    """Assemble, verify and register the file exactly like a single-request upload."""
+    try:
+        blob = await run_in_threadpool(upload_sessions.finalize, session_id)
+    except SessionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    blob = _session_or_404(blob, session_id)
+    result = await _register_upload(background_tasks, blob, blob["filename"], _validate_ext(blob["filename"]))
+    return {**result, "chunk_count": blob["chunk_count"]}
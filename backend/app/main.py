@@ -14,9 +14,16 @@ from app.api.admin import router as admin_router                      # Step 7:
 from app.api.auth_routes import router as auth_router                 # 🔐 Authentication
 from app.api.dashboards import router as dashboard_router             # 📊 Dashboard APIs
 from app.api.copilot import router as copilot_router                   # 🤖 AI Copilot
+from app.api.alerts import router as alerts_router                     # 🚨 Campaign Alerts
+from app.api.chainlog import router as chainlog_router                 # 🔗 Chain of Custody
 
 # --- Initialize Auth ---
 from app.auth import init_default_admin
+from app.services.case_store import sync_case_indexes
+from app.services.image_index import sync_image_index
+from app.services.case_table import case_table
+from app.services.knowledge_store import start_compactor
+from app.services.batch_jobs import recover_batches
 
 # --- App Config ---
 app = FastAPI(
@@ -69,12 +76,26 @@ app.include_router(unified_router, prefix="/api")         # 📊 /api/unified-re
 app.include_router(fraud_predict_router, prefix="/api")   # 🚨 /api/fraud-predict
 app.include_router(admin_router, prefix="/api")           # 🛡️ /api/admin/ingest
 app.include_router(copilot_router, prefix="/api")         # 🤖 /api/copilot/chat
+app.include_router(alerts_router, prefix="/api")          # 🚨 /api/alerts, /api/alerts/stream
+app.include_router(chainlog_router, prefix="/api")        # 🔗 /api/chainlog, /api/integrity/audit
 
 
 # --- Startup Event ---
 @app.on_event("startup")
 async def startup():
     init_default_admin()
+    indexed = sync_case_indexes()
+    if indexed:
+        print(f"🔎 Replayed {indexed} knowledge-store cases into the intel store")
+    hashed = sync_image_index()
+    if hashed:
+        print(f"🖼️ Hashed {hashed} uploaded images into the visual index")
+    start_compactor()
+    case_table.refresh()
+    print(f"🧮 Case table loaded: {case_table.stats()['live_cases']} cases")
+    resumed = recover_batches()
+    if resumed:
+        print(f"🧮 Resumed {resumed} interrupted batch(es) from their manifests")
     print("🚀 SatyaSetu.AI v2.0 — All systems operational")
 
 
@@ -1,5 +1,5 @@
 import os, json, uuid, time
-from typing import List
+from typing import List, Optional
 from statistics import mean
 from datetime import datetime
 
@@ -7,11 +7,13 @@ from datetime import datetime
 from app.pipelines.ocr import extract_text_from_image
 from app.pipelines.regex_extract import extract_entities
 from app.pipelines.ner import extract_named_entities
-from app.pipelines.osint_engine import enrich_entity_osint
+from app.pipelines.entity_canonical import canonicalize_entities
+from app.pipelines.osint_engine import EntityEnricher, osint_key
 from app.pipelines.risk_assessor import assess_risk
 from app.pipelines.scam_classifier import classify_scam
 from app.pipelines.url_qr_scanner import scan_urls_and_qr
 from app.services.chainlog import chain_log
+from app.services.case_store import save_case
 
 UPLOAD_DIR = "app/data/uploads"
 CACHE_DIR = "app/data/analysis_cache"
@@ -21,8 +23,12 @@ os.makedirs(CACHE_DIR, exist_ok=True)
 # -------------------------------------------------------
 # 🧩 Process a Single File
 # -------------------------------------------------------
-def process_single_file(file_path: str):
-    """Run full intelligence pipeline on a single file with timestamps."""
+def extract_file(file_path: str, enricher: EntityEnricher) -> dict:
+    """
+    The expensive part of a file's analysis, done once per file: OCR, entities,
+    classification and the URL/QR scan. OSINT lookups start as soon as the
+    entities are known and are collected by score_file().
+    """
     file_id = os.path.basename(file_path)
     start_time = time.time()
 
@@ -32,56 +38,84 @@ def process_single_file(file_path: str):
     # 2️⃣ Entity Recognition
     regex_hits = extract_entities(raw_text)
     ner_hits = extract_named_entities(raw_text)
-    all_entities = regex_hits + ner_hits
+    all_entities = canonicalize_entities(regex_hits + ner_hits)
 
-    # 3️⃣ Scam Classification
-    scam_class = classify_scam(raw_text)
+    # 3️⃣ OSINT Cross-Check: lookups start now and run while the classifier works
+    osint_lookups = enricher.submit(all_entities)
 
-    # 4️⃣ OSINT Cross-Check
-    osint_hits = []
-    for e in all_entities:
-        try:
-            osint_hits.extend(enrich_entity_osint(e["value"]))
-        except Exception as e:
-            print(f"⚠️ OSINT lookup failed for {e['value']}: {e}")
-
-    # 5️⃣ Risk Assessment
-    risk_result = assess_risk(raw_text, all_entities, scam_class, osint_hits)
+    # 4️⃣ Scam Classification
+    scam_class = classify_scam(raw_text)
 
-    # 6️⃣ URL + QR Scan
+    # 5️⃣ URL + QR Scan
     url_qr_findings = scan_urls_and_qr(raw_text, file_path)
 
-    # 7️⃣ Cache individual result
-    result = {
+    return {
         "file_id": file_id,
         "raw_text": raw_text,
         "entities": all_entities,
         "scam_class": scam_class,
+        "url_qr_findings": url_qr_findings,
+        "osint_lookups": osint_lookups,
+        "extract_sec": time.time() - start_time,
+    }
+
+
+def score_file(extracted: dict, enricher: EntityEnricher) -> dict:
+    """
+    OSINT hits and risk fusion for an extracted file. Cheap next to extraction,
+    so a file whose OSINT sources failed transiently retries only this step.
+    """
+    start_time = time.time()
+
+    # 6️⃣ OSINT hits (lookups started during extraction, or re-queried on a retry)
+    lookups = extracted.pop("osint_lookups", None) or enricher.submit(extracted["entities"])
+    osint_hits = enricher.collect(lookups)
+
+    # 7️⃣ Risk Assessment
+    risk_result = assess_risk(
+        extracted["raw_text"], extracted["entities"], extracted["scam_class"], osint_hits, extracted["file_id"]
+    )
+
+    return {
+        "file_id": extracted["file_id"],
+        "raw_text": extracted["raw_text"],
+        "entities": extracted["entities"],
+        "scam_class": extracted["scam_class"],
         "osint_hits": osint_hits,
         "risk": risk_result,
-        "url_qr_findings": url_qr_findings,
+        "url_qr_findings": extracted["url_qr_findings"],
         "analyzed_at": datetime.now().isoformat(),
-        "processing_time_sec": round(time.time() - start_time, 2),
+        "processing_time_sec": round(extracted["extract_sec"] + time.time() - start_time, 2),
     }
 
-    cache_path = os.path.join(CACHE_DIR, f"{file_id}.json")
-    with open(cache_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2)
+
+def save_file_result(result: dict):
+    """Cache the file's result and log it in the chain of custody."""
+    save_case(result)
 
     # 8️⃣ Log each file in chain-of-custody
     chain_log(
         action="BATCH_ANALYZE_ITEM",
         actor="system",
-        target=file_id,
+        target=result["file_id"],
         meta={
-            "risk_score": risk_result.get("score", 0),
-            "risk_level": risk_result.get("risk_level", "Unknown"),
-            "urls_detected": len(url_qr_findings),
-            "entities_found": len(all_entities),
+            "risk_score": result["risk"].get("score", 0),
+            "risk_level": result["risk"].get("risk_level", "Unknown"),
+            "urls_detected": len(result["url_qr_findings"]),
+            "entities_found": len(result["entities"]),
             "processing_time_sec": result["processing_time_sec"],
         },
     )
 
+
+def process_single_file(file_path: str, enricher: Optional[EntityEnricher] = None):
+    """
+    Run full intelligence pipeline on a single file with timestamps.
+    Files of one batch share an `enricher`, so each entity is looked up only once.
+    """
+    enricher = enricher or EntityEnricher()
+    result = score_file(extract_file(file_path, enricher), enricher)
+    save_file_result(result)
     return result
 
 
@@ -94,8 +128,10 @@ def aggregate_results(results: List[dict]):
     total_risk = []
     categories = {}
 
+    lookups = set()
     for r in results:
         all_entities += [e["value"] for e in r.get("entities", [])]
+        lookups.update(osint_key(e) or f"raw:{e.get('value', '')}" for e in r.get("entities", []))
         total_risk.append(r.get("risk", {}).get("score", 0))
         cat = r.get("scam_class", {}).get("category", "Unknown")
         categories[cat] = categories.get(cat, 0) + 1
@@ -111,9 +147,27 @@ def aggregate_results(results: List[dict]):
         "dominant_category": dominant_category,
         "categories": categories,
         "sample_entities": unique_entities[:10],
+        # Share of entity mentions that didn't need their own OSINT lookup
+        "entity_mentions": len(all_entities),
+        "osint_lookups": len(lookups),
+        "dedup_ratio": round(1 - len(lookups) / len(all_entities), 3) if all_entities else 0.0,
     }
 
 
+def save_batch_summary(batch_id: str, results: List[dict]) -> dict:
+    """Write batch_<id>.json (summary + cases), the input of the unified report."""
+    final_data = {
+        "batch_id": batch_id,
+        "summary": aggregate_results(results),
+        "cases": results,
+        "analyzed_at": datetime.now().isoformat(),
+    }
+    summary_path = os.path.join(CACHE_DIR, f"batch_{batch_id}.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(final_data, f, indent=2)
+    return final_data
+
+
 # -------------------------------------------------------
 # 🧠 Main Batch Analysis
 # -------------------------------------------------------
@@ -123,28 +177,20 @@ def analyze_batch(file_paths: List[str]):
     print(f"🚀 Starting batch analysis {batch_id} on {len(file_paths)} files...")
 
     results = []
+    enricher = EntityEnricher()
     for fp in file_paths:
         try:
-            results.append(process_single_file(fp))
+            results.append(process_single_file(fp, enricher))
         except Exception as e:
             print(f"⚠️ Skipped {fp}: {e}")
 
     if not results:
         return {"error": "No valid results generated."}
 
-    summary = aggregate_results(results)
-
     # ✅ Save final batch JSON
-    final_data = {
-        "batch_id": batch_id,
-        "summary": summary,
-        "cases": results,
-        "analyzed_at": datetime.now().isoformat(),
-    }
-
+    final_data = save_batch_summary(batch_id, results)
+    summary = final_data["summary"]
     summary_path = os.path.join(CACHE_DIR, f"batch_{batch_id}.json")
-    with open(summary_path, "w", encoding="utf-8") as f:
-        json.dump(final_data, f, indent=2)
 
     # ✅ Log completion in chain-of-custody
     chain_log(
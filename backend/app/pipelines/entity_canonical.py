@@ -0,0 +1,232 @@
+"""
+🧬 Entity Canonicalization
+Maps extracted entity values to canonical keys so the same indicator links
+across cases no matter how it was written:
+
+    +91 98765 43210 / 9876543210          → phone:+919876543210
+    https://www.fakebank.xyz/secure       → domain:fakebank.xyz, host:www.fakebank.xyz
+    Support@FakeBank.xyz                  → email:support@fakebank.xyz, email_local:support, domain:fakebank.xyz
+    fraud.pay @ YBL                       → upi:fraud.pay@ybl
+    0xAbC…                                → crypto:eth:0xabc…
+
+Keys are computed once per entity (stored as `entity["canonical"]`) and used by
+the threat hub, cluster detection and the OSINT cache.
+"""
+
+import re
+import hashlib
+from typing import List, Optional
+from urllib.parse import urlparse
+
+# Multi-label public suffixes we see in Indian scam evidence (registered domain = one label more).
+MULTI_LABEL_SUFFIXES = {
+    "co.in", "net.in", "org.in", "gov.in", "ac.in", "edu.in", "res.in", "firm.in", "gen.in", "ind.in", "nic.in",
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "com.au", "net.au", "org.au", "co.nz", "com.br", "com.cn",
+    "com.sg", "com.my", "co.za", "com.pk", "com.bd", "com.np", "co.jp", "com.hk",
+}
+
+# Shared mailbox providers: an email there says nothing about who runs the domain.
+FREEMAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "yahoo.com", "yahoo.co.in", "hotmail.com", "outlook.com", "live.com",
+    "rediffmail.com", "icloud.com", "protonmail.com", "proton.me", "aol.com", "zoho.com", "mail.com",
+}
+
+DEFAULT_COUNTRY_CODE = "91"
+
+_BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_HOST_RE = re.compile(r"^[a-z0-9.-]+\.[a-z]{2,}$")
+_IP_RE = re.compile(r"^(?:\d{1,3}\.){3}\d{1,3}$")
+_EMAIL_RE = re.compile(r"^[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}$")
+_UPI_RE = re.compile(r"^[a-z0-9.\-_]{2,256}@[a-z]{2,64}$")
+_ETH_RE = re.compile(r"^0x[0-9a-f]{40}$")
+_BTC_RE = re.compile(r"^[13][a-km-zA-HJ-NP-Z1-9]{25,34}$")
+
+
+# -------------------------------------------------------
+# 📞 Phones
+# -------------------------------------------------------
+def canonical_phone(value: str) -> Optional[str]:
+    """E.164 form (Indian numbers assumed when no country code is present)."""
+    raw = value.strip()
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        return f"+{digits}" if 8 <= len(digits) <= 15 else None
+    if digits.startswith("00") and 10 <= len(digits) - 2 <= 15:
+        return f"+{digits[2:]}"
+    if len(digits) == 10 and digits[0] in "6789":
+        return f"+{DEFAULT_COUNTRY_CODE}{digits}"
+    if len(digits) == 11 and digits[0] == "0" and digits[1] in "6789":
+        return f"+{DEFAULT_COUNTRY_CODE}{digits[1:]}"
+    if len(digits) == 12 and digits.startswith(DEFAULT_COUNTRY_CODE) and digits[2] in "6789":
+        return f"+{digits}"
+    return None
+
+
+# -------------------------------------------------------
+# 🌐 Hosts, URLs, Emails
+# -------------------------------------------------------
+def canonical_host(value: str) -> Optional[str]:
+    """Lower-cased hostname without scheme, credentials, port, path or trailing dot."""
+    text = value.strip().lower()
+    if "://" not in text:
+        text = "http://" + text
+    try:
+        host = urlparse(text).hostname or ""
+    except ValueError:
+        return None
+    host = host.strip(".")
+    if _IP_RE.match(host) or _HOST_RE.match(host):
+        return host
+    return None
+
+
+def registered_domain(host: str) -> str:
+    """`login.secure.fakebank.co.in` → `fakebank.co.in` (IPs are returned unchanged)."""
+    if _IP_RE.match(host):
+        return host
+    labels = host.split(".")
+    if len(labels) >= 3 and ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def _host_keys(host: str) -> List[str]:
+    if _IP_RE.match(host):
+        return [f"ip:{host}"]
+    domain = registered_domain(host)
+    keys = [f"domain:{domain}"]
+    if host != domain and host != f"www.{domain}":
+        keys.append(f"host:{host}")
+    return keys
+
+
+def canonical_email(value: str) -> Optional[tuple]:
+    """(local_part, domain) with plus-tags dropped, or None if it is not an email."""
+    text = value.strip().lower().rstrip(".")
+    if not _EMAIL_RE.match(text):
+        return None
+    local, domain = text.rsplit("@", 1)
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local = local.replace(".", "")
+        domain = "gmail.com"
+    return local, domain
+
+
+# -------------------------------------------------------
+# 💸 UPI & Crypto
+# -------------------------------------------------------
+def canonical_upi(value: str) -> Optional[str]:
+    text = re.sub(r"\s+", "", value).lower()
+    return text if _UPI_RE.match(text) else None
+
+
+def _base58check_ok(address: str) -> bool:
+    num = 0
+    for ch in address:
+        num = num * 58 + _BASE58_ALPHABET.index(ch)
+    raw = num.to_bytes(25, "big") if num.bit_length() <= 200 else b""
+    if len(raw) != 25:
+        return False
+    return hashlib.sha256(hashlib.sha256(raw[:-4]).digest()).digest()[:4] == raw[-4:]
+
+
+def canonical_crypto(value: str) -> Optional[str]:
+    """
+    Ethereum addresses are case-insensitive once the EIP-55 mixed-case checksum is dropped,
+    so they are keyed lower-cased. Base58 (BTC) addresses are case-sensitive: they are kept
+    as-is and only accepted when their double-SHA256 checksum verifies.
+    """
+    text = value.strip()
+    if _ETH_RE.match(text.lower()):
+        return f"eth:{text.lower()}"
+    if _BTC_RE.match(text) and _base58check_ok(text):
+        return f"btc:{text}"
+    return None
+
+
+# -------------------------------------------------------
+# 🔑 Public API
+# -------------------------------------------------------
+def _text_key(value: str) -> str:
+    return re.sub(r"\s+", " ", value.strip().lower())
+
+
+def canonical_keys(entity: dict) -> List[str]:
+    """Canonical linking keys for one extracted entity (most specific/primary first)."""
+    etype = (entity.get("type") or "").lower()
+    value = entity.get("value") or ""
+    if not value.strip():
+        return []
+
+    if etype == "phone":
+        phone = canonical_phone(value)
+        return [f"phone:{phone}"] if phone else [f"phone:{re.sub(r'[^0-9+]', '', value)}"]
+
+    if etype in ("url", "domain", "ip"):
+        host = canonical_host(value)
+        if host:
+            return _host_keys(host)
+
+    if etype == "email":
+        parts = canonical_email(value)
+        if parts:
+            local, domain = parts
+            keys = [f"email:{local}@{domain}"]
+            if domain not in FREEMAIL_DOMAINS:
+                keys += [f"email_local:{local}", f"domain:{registered_domain(domain)}"]
+            return keys
+
+    if etype == "upi":
+        upi = canonical_upi(value)
+        if upi:
+            return [f"upi:{upi}"]
+
+    if etype == "crypto_wallet":
+        wallet = canonical_crypto(value)
+        if wallet:
+            return [f"crypto:{wallet}"]
+
+    if etype in ("ifsc", "pan", "invoice_id"):
+        return [f"{etype}:{re.sub(r'[^A-Za-z0-9]', '', value).upper()}"]
+
+    return [f"text:{_text_key(value)}"]
+
+
+def entity_keys(entity: dict) -> List[str]:
+    """Stored keys when present (analyses after canonicalization), computed otherwise."""
+    return entity.get("canonical") or canonical_keys(entity)
+
+
+def canonicalize_entities(entities: List[dict]) -> List[dict]:
+    """Annotate each entity with its canonical keys, once, in place."""
+    for ent in entities:
+        ent["canonical"] = canonical_keys(ent)
+    return entities
+
+
+def guess_entity(value: str) -> dict:
+    """Best-effort typed entity for a free-form lookup string (e.g. a profile query)."""
+    text = value.strip()
+    lowered = text.lower()
+    if canonical_crypto(text):
+        etype = "crypto_wallet"
+    elif _EMAIL_RE.match(lowered):
+        etype = "email"
+    elif _UPI_RE.match(re.sub(r"\s+", "", lowered)):
+        etype = "upi"
+    elif canonical_phone(text):
+        etype = "phone"
+    elif lowered.startswith(("http://", "https://")):
+        etype = "url"
+    elif canonical_host(text) and "." in lowered and " " not in lowered:
+        etype = "domain"
+    else:
+        etype = "text"
+    return {"type": etype, "value": text}
+
+
+def key_value(key: str) -> str:
+    """Display value of a canonical key (`domain:fakebank.xyz` → `fakebank.xyz`)."""
+    prefix, _, rest = key.partition(":")
+    return rest.partition(":")[2] if prefix == "crypto" else rest
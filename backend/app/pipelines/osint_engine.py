@@ -1,8 +1,12 @@
-import os, json, re, time, hashlib, requests
-from typing import Dict, Any, Optional
+import os, json, re, time, hashlib, requests, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, urlunsplit
 from dotenv import load_dotenv
 from datetime import datetime
 
+from app.pipelines.entity_canonical import entity_keys, canonical_host, canonical_email
+
 # 🔐 Load API keys
 load_dotenv()
 VT_API_KEY = os.getenv("VT_API_KEY", "")
@@ -47,12 +51,18 @@ def _save_cache(key: str, data: dict):
     except Exception:
         pass
 
+def _transient_status(code: int) -> bool:
+    return code == 429 or code >= 500
+
 def _safe_get_json(url: str, headers=None, params=None, timeout=10):
+    # Failures flagged "transient" (rate limits, 5xx, network) are worth retrying later.
     try:
         r = requests.get(url, headers=headers, params=params, timeout=timeout)
         if r.status_code == 200:
             return r.json(), False
-        return {"error": f"status_{r.status_code}"}, True
+        return {"error": f"status_{r.status_code}", "transient": _transient_status(r.status_code)}, True
+    except requests.RequestException as e:
+        return {"error": str(e), "transient": True}, True
     except Exception as e:
         return {"error": str(e)}, True
 
@@ -160,23 +170,60 @@ def openphish_check(domain_or_url: str):
             out = {"source": "openphish", "listed": bool(hit)}
             _save_cache(key, out)
             return out
-        return {"source": "openphish", "error": f"status_{r.status_code}"}
+        return {"source": "openphish", "error": f"status_{r.status_code}", "transient": _transient_status(r.status_code)}
+    except requests.RequestException as e:
+        return {"source": "openphish", "error": str(e), "transient": True}
     except Exception as e:
         return {"source": "openphish", "error": str(e)}
 
 # ------------------------------------------------------------
 # 🧠 OSINT Fusion Layer
 # ------------------------------------------------------------
+def _normalized_url(url: str) -> str:
+    """Scheme and host lower-cased, default port, empty path and fragment dropped."""
+    parts = urlsplit(url.strip())
+    host = canonical_host(url) or (parts.hostname or "")
+    netloc = host if parts.port in (None, 80, 443) else f"{host}:{parts.port}"
+    path = "" if parts.path == "/" else parts.path
+    return urlunsplit((parts.scheme.lower(), netloc, path, parts.query, ""))
+
+def osint_key(entity: Dict[str, Any]) -> Optional[str]:
+    """
+    Key an enrichment result can be shared under. It follows what enrich_entity_osint
+    actually queries: URLs are checked per URL and domains per host, so neither shares
+    the registered-domain key other URLs and subdomains resolve to.
+    """
+    val = entity.get("value", "")
+    if "@" not in val and re.match(URL_RE, val):
+        return f"url:{_normalized_url(val)}"
+    if "@" not in val and not re.match(IP_RE, val) and "." in val:
+        host = canonical_host(val)
+        if host:
+            return f"host:{host}"
+    keys = entity_keys(entity)
+    return keys[0] if keys else None
+
 def enrich_entity_osint(entity: Dict[str, Any]) -> Dict[str, Any]:
     """Central intelligence hub: combines multi-source OSINT into one dict."""
     etype = entity.get("type", "").lower()
     val = entity.get("value", "")
-    result = {"entity": val, "type": etype, "timestamp": datetime.now().isoformat()}
+
+    # One lookup per canonical entity: "+91 98765 43210" and "9876543210" share a cache entry.
+    keys = entity_keys(entity)
+    lookup_key = osint_key(entity)
+    cache_key = f"entity_{lookup_key}" if lookup_key else None
+    if cache_key:
+        cached = _from_cache(cache_key)
+        if cached:
+            return {**cached, "entity": val, "type": etype, "cache_hit": True}
+
+    result = {"entity": val, "type": etype, "canonical": keys, "timestamp": datetime.now().isoformat()}
 
     try:
         if "@" in val:  # email
+            parts = canonical_email(val)
             m = EMAIL_RE.search(val)
-            domain = m.group(1) if m else None
+            domain = parts[1] if parts else (m.group(1).lower() if m else None)
             vt = vt_domain_report(domain)
             wh = whois_domain(domain)
             op = openphish_check(domain)
@@ -184,7 +231,7 @@ def enrich_entity_osint(entity: Dict[str, Any]) -> Dict[str, Any]:
             result.update({"domain": domain, "sources": [vt, wh, op], "aggregate_score": score, "risk": _risk_label(score)})
         elif re.match(URL_RE, val):
             m = URL_RE.search(val)
-            domain = m.group(1) if m else None
+            domain = canonical_host(val) or (m.group(1) if m else None)
             vt_u = vt_url_report(val)
             vt_d = vt_domain_report(domain)
             op = openphish_check(val)
@@ -194,9 +241,10 @@ def enrich_entity_osint(entity: Dict[str, Any]) -> Dict[str, Any]:
             ab = abuseipdb_report(val)
             result.update({"sources": [ab], "aggregate_score": ab.get("score", 0), "risk": ab.get("risk", "Low")})
         elif "." in val:  # domain
-            vt = vt_domain_report(val)
-            wh = whois_domain(val)
-            op = openphish_check(val)
+            domain = canonical_host(val) or val
+            vt = vt_domain_report(domain)
+            wh = whois_domain(domain)
+            op = openphish_check(domain)
             score = int((vt.get("score", 0) + (wh.get("age_tag") == "new_domain" and 15 or 0) + (op.get("listed") and 20 or 0)))
             result.update({"sources": [vt, wh, op], "aggregate_score": score, "risk": _risk_label(score)})
         else:
@@ -204,8 +252,77 @@ def enrich_entity_osint(entity: Dict[str, Any]) -> Dict[str, Any]:
     except Exception as e:
         result.update({"error": str(e)})
 
+    # Don't pin transient source failures for the cache TTL.
+    failed = "error" in result or any(isinstance(src, dict) and src.get("error") for src in result.get("sources", []))
+    if cache_key and not failed:
+        _save_cache(cache_key, result)
+
     return result
 
+def has_transient_failure(hit: Dict[str, Any]) -> bool:
+    """True if an enrichment result lost a source to a retryable failure."""
+    return any(isinstance(src, dict) and src.get("transient") for src in hit.get("sources", []))
+
+# ------------------------------------------------------------
+# 🧵 Shared Enrichment (batches)
+# ------------------------------------------------------------
+OSINT_WORKERS = int(os.getenv("OSINT_WORKERS", "8"))
+_osint_pool = ThreadPoolExecutor(max_workers=OSINT_WORKERS, thread_name_prefix="osint")
+
+class EntityEnricher:
+    """
+    Single-flight OSINT for a group of files: each distinct lookup (osint_key) runs
+    once, concurrently, and the result is shared by every file that mentions it.
+    Lookups that lost a source to a transient failure are not shared, so a retry
+    queries again.
+    """
+
+    def __init__(self):
+        self._lookups: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.mentions = 0
+        self.lookups = 0
+
+    def submit(self, entities: List[Dict[str, Any]]) -> list:
+        """Start (or join) the lookups for a file's entities; pass the result to collect()."""
+        pending = []
+        with self._lock:
+            for ent in entities:
+                key = osint_key(ent) or f"raw:{ent.get('value', '')}"
+                future = self._lookups.get(key)
+                if future is None:
+                    future = self._lookups[key] = _osint_pool.submit(enrich_entity_osint, ent)
+                    self.lookups += 1
+                self.mentions += 1
+                pending.append((ent, key, future))
+        return pending
+
+    def collect(self, pending: list) -> List[Dict[str, Any]]:
+        """One OSINT hit per entity, in order."""
+        hits = []
+        for ent, key, future in pending:
+            try:
+                hit = future.result()
+            except Exception as e:
+                print(f"⚠️ OSINT lookup failed for {ent.get('value')}: {e}")
+                continue
+            if has_transient_failure(hit):
+                with self._lock:
+                    if self._lookups.get(key) is future:
+                        del self._lookups[key]
+            hits.append({**hit, "entity": ent.get("value", ""), "type": (ent.get("type") or "").lower()})
+        return hits
+
+    def enrich(self, entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self.collect(self.submit(entities))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entity_mentions": self.mentions,
+            "osint_lookups": self.lookups,
+            "dedup_ratio": round(1 - self.lookups / self.mentions, 3) if self.mentions else 0.0,
+        }
+
 # -------------------------------
 # 🧩 Local Fallbacks (used by URL/QR scanner)
 # -------------------------------
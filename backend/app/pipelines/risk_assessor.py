@@ -2,6 +2,11 @@ import re
 import numpy as np
 from textblob import TextBlob
 from datetime import datetime
+from typing import List, Optional
+
+from app.pipelines.entity_canonical import entity_keys
+from app.services.entity_reputation import reputation, reputation_by_key, reputation_for_cases
+from app.services.ioc_snapshot import ioc_index
 
 # -----------------------------------
 # Entity-level Risk Analyzer
@@ -12,6 +17,46 @@ def domain_from_email(email):
     return match.group(1) if match else None
 
 
+SUSPICIOUS_TLDS = [".xyz", ".top", ".tk", ".pw", ".cf", ".club"]
+PHISHING_TERMS = ["verify", "kyc", "secure", "update", "payment", "login"]
+TRUSTED_EMAIL_DOMAINS = ["gov", "edu", "amazon", "hdfcbank", "icici", "paytm"]
+FOREIGN_TLDS = [".ru", ".cn", ".br", ".cl", ".io"]
+FINANCIAL_TYPES = ["upi", "crypto_wallet"]
+
+# calculate_risk's heuristics in order: (tag, points); assess_risk_batch uses them as feature columns
+ENTITY_FEATURES = [
+    ("suspicious_tld", 20),
+    ("phishing_keyword", 25),
+    ("unverified_domain", 30),
+    ("foreign_domain", 15),
+    ("financial_channel", 10),
+    ("shared_ioc", 40),
+]
+
+
+def _unverified_email(value):
+    domain = domain_from_email(value)
+    return bool(domain) and not any(ok in domain for ok in TRUSTED_EMAIL_DOMAINS)
+
+
+def _entity_result(entity, score, tags):
+    """Confidence scaling, capping and labelling shared by calculate_risk and assess_risk_batch."""
+    if "confidence" in entity:
+        score *= entity["confidence"]
+
+    score = min(100, round(score, 2))
+
+    risk_level = "High" if score >= 70 else "Medium" if score >= 40 else "Low"
+
+    return {
+        "entity": entity["value"],
+        "type": entity.get("type", ""),
+        "risk_score": score,
+        "risk_level": risk_level,
+        "tags": tags
+    }
+
+
 def calculate_risk(entity):
     """
     Assigns a risk score to a single entity based on pattern heuristics.
@@ -23,47 +68,37 @@ def calculate_risk(entity):
     tags = []
 
     # 1️⃣ Suspicious TLDs / domains
-    if any(tld in value for tld in [".xyz", ".top", ".tk", ".pw", ".cf", ".club"]):
+    if any(tld in value for tld in SUSPICIOUS_TLDS):
         score += 20
         tags.append("suspicious_tld")
 
     # 2️⃣ Financial/credential-related keywords
-    if any(k in value for k in ["verify", "kyc", "secure", "update", "payment", "login"]):
+    if any(k in value for k in PHISHING_TERMS):
         score += 25
         tags.append("phishing_keyword")
 
     # 3️⃣ Email reputation
-    if etype == "email":
-        domain = domain_from_email(value)
-        if domain and not any(ok in domain for ok in ["gov", "edu", "amazon", "hdfcbank", "icici", "paytm"]):
-            score += 30
-            tags.append("unverified_domain")
+    if etype == "email" and _unverified_email(value):
+        score += 30
+        tags.append("unverified_domain")
 
     # 4️⃣ Foreign domains
-    if any(cc in value for cc in [".ru", ".cn", ".br", ".cl", ".io"]):
+    if any(cc in value for cc in FOREIGN_TLDS):
         score += 15
         tags.append("foreign_domain")
 
     # 5️⃣ UPI or Crypto presence
-    if etype in ["upi", "crypto_wallet"]:
+    if etype in FINANCIAL_TYPES:
         score += 10
         tags.append("financial_channel")
 
-    # 6️⃣ Adjust using regex confidence (if available)
-    if "confidence" in entity:
-        score *= entity["confidence"]
-
-    score = min(100, round(score, 2))
-
-    risk_level = "High" if score >= 70 else "Medium" if score >= 40 else "Low"
+    # 🛰️ Known-bad on a partner deployment (imported IOC snapshot)
+    if ioc_index.lookup(entity_keys(entity)):
+        score += 40
+        tags.append("shared_ioc")
 
-    return {
-        "entity": entity["value"],
-        "type": etype,
-        "risk_score": score,
-        "risk_level": risk_level,
-        "tags": tags
-    }
+    # 6️⃣ Adjust using regex confidence (if available)
+    return _entity_result(entity, score, tags)
 
 # -----------------------------------
 # Case-Level Aggregation
@@ -84,6 +119,38 @@ DECEPTIVE_TONE_PATTERNS = [
 ]
 
 
+# Historical prior: at full confidence it takes this share of the fused score.
+REPUTATION_WEIGHT = 0.2
+# Effective prior cases at which confidence reaches 50%.
+REPUTATION_HALF_CONFIDENCE = 3.0
+
+
+def _prior_confidence(rep):
+    return rep["effective_cases"] / (rep["effective_cases"] + REPUTATION_HALF_CONFIDENCE)
+
+
+def _best_prior(entries):
+    best = None
+    for rep in entries:
+        confidence = _prior_confidence(rep)
+        if best is None or confidence * rep["decayed_risk"] > best[1] * best[0]:
+            best = (rep["decayed_risk"], confidence, rep)
+    return best
+
+
+def _reputation_prior(entities, file_id=None):
+    """
+    Strongest history-based prior among the entities: (risk, confidence, ledger entry) or None.
+    A re-analysed case (file_id) doesn't count its own earlier contribution.
+    """
+    return _best_prior(_known_entities(entities, file_id))
+
+
+def _known_entities(entities, file_id=None):
+    keys = [k for e in entities for k in entity_keys(e)]
+    return reputation(keys, exclude_file=file_id)
+
+
 def _detect_deceptive_tone(text):
     """Detects psychological manipulation cues in scam-like language."""
     text_lower = text.lower()
@@ -91,16 +158,78 @@ def _detect_deceptive_tone(text):
     return min(1.0, count * 0.15)  # scale 0–1
 
 
-def assess_risk(text, entities, scam_class, osint_hits=None):
+def _text_factors(text):
+    """(keyword toxicity, deceptive tone, sentiment neutrality) for one document."""
+    text_lower = text.lower()
+    high_kw = sum(1 for kw in HIGH_RISK_KEYWORDS if kw in text_lower)
+    med_kw = sum(1 for kw in MEDIUM_RISK_KEYWORDS if kw in text_lower)
+    kw_score = min(1.0, (high_kw * 0.12) + (med_kw * 0.05))
+    tone_score = _detect_deceptive_tone(text)
+
+    blob = TextBlob(text)
+    sentiment = blob.sentiment.polarity
+    sentiment_score = 1 - abs(sentiment)
+    return kw_score, tone_score, sentiment_score
+
+
+def _fusion_weights(scam_type):
+    """Relative factor weights, adjusted to the scam type."""
+    base_weights = {
+        "scam_conf": 0.4,
+        "entity_risk": 0.25,
+        "keyword_toxicity": 0.15,
+        "sentiment": 0.05,
+        "osint": 0.1,
+        "tone": 0.05
+    }
+
+    if "investment" in scam_type.lower():
+        base_weights["osint"] += 0.05
+    elif "phishing" in scam_type.lower():
+        base_weights["keyword_toxicity"] += 0.05
+    elif "loan" in scam_type.lower():
+        base_weights["entity_risk"] += 0.05
+    return base_weights
+
+
+def _risk_level(final_score):
+    if final_score >= 0.75:
+        return "HIGH 🔴"
+    if final_score >= 0.45:
+        return "MEDIUM 🟠"
+    return "LOW 🟢"
+
+
+def _rationale(scam_type, scam_conf, avg_entity_risk, kw_score, tone_score, osint_score, prior):
+    reasons = []
+    if scam_conf > 0.7:
+        reasons.append(f"AI classified as {scam_type} ({int(scam_conf * 100)}% confidence)")
+    if avg_entity_risk > 0.3:
+        reasons.append("Suspicious entities or financial channels detected")
+    if kw_score > 0.3:
+        reasons.append("Urgent or manipulative keywords found")
+    if tone_score > 0.3:
+        reasons.append("Deceptive tone detected in language")
+    if osint_score > 0.1:
+        reasons.append("Entity flagged in OSINT threat feeds")
+    if prior and prior[0] >= 0.6 and prior[2]["case_count"] >= 2:
+        reasons.append(
+            f"{prior[2]['entity']} seen in {prior[2]['case_count']} earlier cases "
+            f"(avg risk {prior[0]:.2f})"
+        )
+
+    return "; ".join(reasons) if reasons else "No major fraud indicators found."
+
+
+def assess_risk(text, entities, scam_class, osint_hits=None, file_id=None):
     """
     ⚖️ Multi-factor risk fusion engine
     Combines AI classifier, entities, OSINT, sentiment, tone, and keyword signals.
+    `file_id` keeps the case's own earlier analysis out of its reputation prior.
     """
     if osint_hits is None:
         osint_hits = []
 
-    text_lower = text.lower()
-
     # --- 1️⃣ Scam classifier weight ---
     scam_conf = scam_class.get("confidence", 0)
     scam_type = scam_class.get("category", "Unknown")
@@ -109,22 +238,9 @@ def assess_risk(text, entities, scam_class, osint_hits=None):
     entity_results = [calculate_risk(e) for e in entities]
     avg_entity_risk = np.mean([e["risk_score"] for e in entity_results]) / 100 if entity_results else 0
 
-    # --- 3️⃣ Keyword & tone toxicity ---
-    high_kw = sum(1 for kw in HIGH_RISK_KEYWORDS if kw in text_lower)
-    med_kw = sum(1 for kw in MEDIUM_RISK_KEYWORDS if kw in text_lower)
-    kw_score = min(1.0, (high_kw * 0.12) + (med_kw * 0.05))
-    tone_score = _detect_deceptive_tone(text)
-
-    # --- 4️⃣ Sentiment neutrality ---
-    blob = TextBlob(text)
-    sentiment = blob.sentiment.polarity
-    sentiment_score = 1 - abs(sentiment)
+    # --- 3️⃣ Keyword & tone toxicity, 4️⃣ sentiment neutrality ---
+    kw_score, tone_score, sentiment_score = _text_factors(text)
 
-    # --- 5️⃣ OSINT intelligence impact ---
-    osint_confidence = 0
-    for hit in osint_hits:
-        agg = hit.get("aggregate_score", 0)
-        osint_confidence += min(1.0, agg / 100 * 0.3)
     # --- 5️⃣ OSINT contribution ---
     osint_score = 0
     if osint_hits:
@@ -137,24 +253,8 @@ def assess_risk(text, entities, scam_class, osint_hits=None):
                 osint_score += 0.1
         osint_score = min(1.0, osint_score / len(osint_hits))
 
-
     # --- 6️⃣ Dynamic weight tuning ---
-    # Adjust relative weights depending on scam type
-    base_weights = {
-        "scam_conf": 0.4,
-        "entity_risk": 0.25,
-        "keyword_toxicity": 0.15,
-        "sentiment": 0.05,
-        "osint": 0.1,
-        "tone": 0.05
-    }
-
-    if "investment" in scam_type.lower():
-        base_weights["osint"] += 0.05
-    elif "phishing" in scam_type.lower():
-        base_weights["keyword_toxicity"] += 0.05
-    elif "loan" in scam_type.lower():
-        base_weights["entity_risk"] += 0.05
+    base_weights = _fusion_weights(scam_type)
 
     # --- 7️⃣ Weighted fusion ---
     final_score = (
@@ -165,30 +265,21 @@ def assess_risk(text, entities, scam_class, osint_hits=None):
         + sentiment_score * base_weights["sentiment"]
         + osint_score * base_weights["osint"]
     )
+
+    # --- 7️⃣b Entity reputation prior (blended in only when history exists) ---
+    prior = _reputation_prior(entities, file_id)
+    reputation_score = 0.0
+    if prior:
+        reputation_score, prior_confidence, prior_entry = prior
+        w = REPUTATION_WEIGHT * prior_confidence
+        final_score = (1 - w) * final_score + w * reputation_score
     final_score = round(final_score, 3)
 
     # --- 8️⃣ Risk classification ---
-    if final_score >= 0.75:
-        risk_level = "HIGH 🔴"
-    elif final_score >= 0.45:
-        risk_level = "MEDIUM 🟠"
-    else:
-        risk_level = "LOW 🟢"
+    risk_level = _risk_level(final_score)
 
     # --- 9️⃣ Explainable reasoning ---
-    reasons = []
-    if scam_conf > 0.7:
-        reasons.append(f"AI classified as {scam_type} ({int(scam_conf * 100)}% confidence)")
-    if avg_entity_risk > 0.3:
-        reasons.append("Suspicious entities or financial channels detected")
-    if kw_score > 0.3:
-        reasons.append("Urgent or manipulative keywords found")
-    if tone_score > 0.3:
-        reasons.append("Deceptive tone detected in language")
-    if osint_score > 0.1:
-        reasons.append("Entity flagged in OSINT threat feeds")
-
-    rationale = "; ".join(reasons) if reasons else "No major fraud indicators found."
+    rationale = _rationale(scam_type, scam_conf, avg_entity_risk, kw_score, tone_score, osint_score, prior)
 
     # --- 🔟 Return full structured intelligence ---
     return {
@@ -204,6 +295,294 @@ def assess_risk(text, entities, scam_class, osint_hits=None):
             "tone_score": tone_score,
             "sentiment_neutrality": sentiment_score,
             "osint_weight": osint_score,
+            "reputation_prior": round(reputation_score, 3),
         },
         "scam_type": scam_type,
     }
+
+
+# -----------------------------------
+# Cheap Heuristic Verdict (cascade tier 0/1)
+# -----------------------------------
+
+# Blocklisted infrastructure (local list or shared IOC) is close to conclusive on its own.
+BLOCKLIST_WEIGHT = 0.9
+HEURISTIC_WEIGHTS = {"url_risk": 0.8, "entity_risk": 0.6, "keyword_toxicity": 0.5, "tone": 0.5}
+# An entity with an established low-risk history (~3+ effective cases) is positive benign evidence.
+CLEAN_HISTORY_RISK = 0.2
+CLEAN_HISTORY_CONFIDENCE = 0.5
+
+
+def assess_risk_heuristic(text, entities, url_findings, file_id=None):
+    """
+    ⚡ Fraud likelihood from signals that need no model and no network:
+    regex entities, keyword/tone lexicons, the reputation ledger, local blocklists
+    and heuristic URL/QR risk. Independent signals are combined as a noisy-OR.
+    """
+    entity_results = [calculate_risk(e) for e in entities]
+    max_entity_risk = max((e["risk_score"] for e in entity_results), default=0) / 100
+    max_url_risk = max((u["combined_risk"] for u in url_findings), default=0) / 100
+    kw_score, tone_score, sentiment_score = _text_factors(text)
+
+    blocklisted = sorted(
+        {u["domain"] for u in url_findings
+         if {"known_malicious_domain", "shared_ioc"} & set(u["heuristics"]["tags"])}
+        | {e["entity"] for e in entity_results if "shared_ioc" in e["tags"]}
+    )
+    known = _known_entities(entities, file_id)
+    prior = _best_prior(known)
+    reputation_score = prior[0] * prior[1] if prior else 0.0
+    clean_history = sorted({
+        rep["entity"] for rep in known
+        if rep["decayed_risk"] <= CLEAN_HISTORY_RISK and _prior_confidence(rep) >= CLEAN_HISTORY_CONFIDENCE
+    })
+
+    signals = [
+        BLOCKLIST_WEIGHT if blocklisted else 0.0,
+        max_url_risk * HEURISTIC_WEIGHTS["url_risk"],
+        max_entity_risk * HEURISTIC_WEIGHTS["entity_risk"],
+        kw_score * HEURISTIC_WEIGHTS["keyword_toxicity"],
+        tone_score * HEURISTIC_WEIGHTS["tone"],
+        reputation_score,
+    ]
+    final_score = round(1 - float(np.prod([1 - s for s in signals])), 3)
+
+    reasons = []
+    if blocklisted:
+        reasons.append(f"Blocklisted infrastructure: {', '.join(blocklisted[:3])}")
+    if max_url_risk >= 0.4:
+        reasons.append("High-risk URL or QR link")
+    if max_entity_risk > 0.3:
+        reasons.append("Suspicious entities or financial channels detected")
+    if kw_score > 0.3:
+        reasons.append("Urgent or manipulative keywords found")
+    if tone_score > 0.3:
+        reasons.append("Deceptive tone detected in language")
+    if reputation_score >= 0.3:
+        reasons.append(f"{prior[2]['entity']} seen in {prior[2]['case_count']} earlier cases")
+
+    return {
+        "score": final_score,
+        "risk_level": _risk_level(final_score),
+        "rationale": "; ".join(reasons) if reasons else "No cheap fraud indicators found.",
+        "timestamp": datetime.now().isoformat(),
+        "entity_details": entity_results,
+        "factors": {
+            "blocklist_hits": blocklisted,
+            "max_url_risk": round(max_url_risk, 2),
+            "max_entity_risk": round(max_entity_risk, 2),
+            "keyword_toxicity": kw_score,
+            "tone_score": tone_score,
+            "sentiment_neutrality": sentiment_score,
+            "reputation_prior": round(reputation_score, 3),
+            "clean_history": clean_history,
+        },
+        "scam_type": "Unclassified",
+    }
+
+
+# -----------------------------------
+# Batch / Corpus Scoring
+# -----------------------------------
+
+def _contains_any(values, terms):
+    hit = np.zeros(len(values), dtype=bool)
+    for term in terms:
+        hit |= np.char.find(values, term) >= 0
+    return hit
+
+
+def _entity_risk_table(unique):
+    """calculate_risk for distinct entities: one feature matrix, fused with a single dot product."""
+    if not unique:
+        return []
+    values = np.array([e["value"].lower() for e in unique], dtype=str)
+    types = np.array([e.get("type", "") for e in unique], dtype=object)
+    features = np.column_stack([
+        _contains_any(values, SUSPICIOUS_TLDS),
+        _contains_any(values, PHISHING_TERMS),
+        np.array([t == "email" and _unverified_email(e["value"].lower()) for t, e in zip(types, unique)], dtype=bool),
+        _contains_any(values, FOREIGN_TLDS),
+        np.isin(types, FINANCIAL_TYPES),
+        np.array([bool(ioc_index.lookup(entity_keys(e))) for e in unique], dtype=bool),
+    ])
+    scores = features.astype(np.int64) @ np.array([points for _, points in ENTITY_FEATURES], dtype=np.int64)
+    tags = [tag for tag, _ in ENTITY_FEATURES]
+    return [
+        _entity_result(e, int(score), [tags[j] for j in np.flatnonzero(row)])
+        for e, score, row in zip(unique, scores, features)
+    ]
+
+
+def _mean_by_length(values_per_case):
+    """np.mean of each case's list (bit-identical to calling it per case), one reduction per distinct length."""
+    means = np.zeros(len(values_per_case))
+    lengths = np.array([len(v) for v in values_per_case])
+    for n in np.unique(lengths[lengths > 0]):
+        rows = np.flatnonzero(lengths == n)
+        means[rows] = np.mean(np.array([values_per_case[i] for i in rows], dtype=np.float64), axis=1)
+    return means, lengths
+
+
+def _batch_priors(distinct_keys, slots):
+    """
+    _reputation_prior for every case from one ledger read. assess_risk keeps the first key
+    (in key order) with the highest confidence × risk, so each distinct entity's best key is
+    found once and each case takes the best of its entities' (highest product, lowest key).
+    Returns per-case candidate indexes (-1: no prior) and the candidates as (entry, confidence).
+    """
+    ledger = reputation_by_key(k for keys in distinct_keys for k in keys)
+    known = sorted({k for keys in distinct_keys for k in keys if k in ledger})
+    if not known:
+        return np.full(len(slots), -1), []
+    rank = {k: i for i, k in enumerate(known)}
+    candidates = [(ledger[k], _prior_confidence(ledger[k])) for k in known]
+    product = np.array([confidence * rep["decayed_risk"] for rep, confidence in candidates])
+
+    entity_best = np.full(len(distinct_keys), -1)
+    for i, keys in enumerate(distinct_keys):
+        for r in sorted(rank[k] for k in keys if k in rank):
+            if entity_best[i] < 0 or product[r] > product[entity_best[i]]:
+                entity_best[i] = r
+
+    case_of = np.repeat(np.arange(len(slots)), [len(row) for row in slots])
+    best = entity_best[np.fromiter((j for row in slots for j in row), dtype=np.int64, count=len(case_of))]
+    case_of, best = case_of[best >= 0], best[best >= 0]
+    order = np.lexsort((best, -product[best], case_of))
+    cases, first = np.unique(case_of[order], return_index=True)
+    prior_index = np.full(len(slots), -1)
+    prior_index[cases] = best[order][first]
+    return prior_index, candidates
+
+
+def _case_priors(file_ids, distinct_keys, slots):
+    """_batch_priors with each case's own ledger contribution left out (assess_risk with file_id)."""
+    entries = reputation_for_cases([
+        (file_id, [k for j in row for k in distinct_keys[j]]) for file_id, row in zip(file_ids, slots)
+    ])
+    prior_index, candidates = np.full(len(slots), -1), []
+    for i, case_entries in enumerate(entries):
+        prior = _best_prior(case_entries)
+        if prior:
+            prior_index[i] = len(candidates)
+            candidates.append((prior[2], prior[1]))
+    return prior_index, candidates
+
+
+def assess_risk_batch(texts: List[str], entities: List[list], scam_classes: List[dict],
+                      osint_hits: Optional[List[list]] = None, text_factors: Optional[List[Optional[dict]]] = None,
+                      details: bool = True, file_ids: Optional[List[str]] = None):
+    """
+    ⚖️ assess_risk for many cases at once, with identical per-case results (bar the timestamp).
+    Distinct entities are scored once from a feature matrix, reputation is read in one pass,
+    and the weighted fusion and thresholds run as array operations. `text_factors` may carry
+    a case's cached keyword/tone/sentiment factors (risk["factors"]) so rescoring skips the
+    text; details=False leaves out the per-entity breakdown. With `file_ids`, each case's
+    prior leaves out its own ledger contribution, as assess_risk(..., file_id) does.
+    """
+    n = len(texts)
+    if not n:
+        return []
+    osint_hits = osint_hits or [None] * n
+    text_factors = text_factors or [None] * n
+
+    # --- 1️⃣ Scam classifier ---
+    scam_conf_raw = [c.get("confidence", 0) for c in scam_classes]
+    scam_types = [c.get("category", "Unknown") for c in scam_classes]
+    scam_conf = np.array(scam_conf_raw, dtype=np.float64)
+
+    # --- 2️⃣ Entities: each distinct entity is scored once across the batch ---
+    unique, distinct, distinct_keys, slots = {}, [], [], []
+    for ents in entities:
+        row = []
+        for e in ents:
+            keys = entity_keys(e)
+            ident = (e["value"], e.get("type", ""), "confidence" in e, e.get("confidence"), tuple(keys))
+            j = unique.get(ident)
+            if j is None:
+                j = unique[ident] = len(distinct)
+                distinct.append(e)
+                distinct_keys.append(keys)
+            row.append(j)
+        slots.append(row)
+    table = _entity_risk_table(distinct)
+    entity_scores = [entry["risk_score"] for entry in table]
+    avg_entity_risk, entity_counts = _mean_by_length([[entity_scores[j] for j in row] for row in slots])
+    avg_entity_risk /= 100
+
+    # --- 3️⃣ 4️⃣ Text factors (reused from the cache when provided) ---
+    kw_score, tone_score, sentiment_score = np.array([
+        (f["keyword_toxicity"], f["tone_score"], f["sentiment_neutrality"]) if f else _text_factors(text)
+        for text, f in zip(texts, text_factors)
+    ], dtype=np.float64).reshape(n, 3).T
+
+    # --- 5️⃣ OSINT: sequential per-case sums, as in assess_risk ---
+    hits = [h or [] for h in osint_hits]
+    hit_case = np.repeat(np.arange(n), [len(h) for h in hits])
+    hit_value = np.array([hit.get("aggregate_score", 0) / 100 if isinstance(hit, dict) else 0.1
+                          for h in hits for hit in h], dtype=np.float64)
+    hit_counts = np.bincount(hit_case, minlength=n)
+    osint_score = np.minimum(1.0, np.bincount(hit_case, weights=hit_value, minlength=n) / np.maximum(hit_counts, 1))
+
+    # --- 6️⃣ 7️⃣ Weights per scam type, then the weighted fusion ---
+    weight_rows = {t: _fusion_weights(t) for t in set(scam_types)}
+    w = {k: np.array([weight_rows[t][k] for t in scam_types]) for k in _fusion_weights("")}
+    final_score = (
+        scam_conf * w["scam_conf"]
+        + avg_entity_risk * w["entity_risk"]
+        + kw_score * w["keyword_toxicity"]
+        + tone_score * w["tone"]
+        + sentiment_score * w["sentiment"]
+        + osint_score * w["osint"]
+    )
+
+    # --- 7️⃣b Reputation prior ---
+    if file_ids is not None:
+        prior_index, candidates = _case_priors(file_ids, distinct_keys, slots)
+    else:
+        prior_index, candidates = _batch_priors(distinct_keys, slots)
+    has_prior = prior_index >= 0
+    if candidates:
+        prior_risk = np.array([rep["decayed_risk"] for rep, _ in candidates])[prior_index]
+        prior_weight = REPUTATION_WEIGHT * np.array([confidence for _, confidence in candidates])[prior_index]
+        final_score = np.where(has_prior, (1 - prior_weight) * final_score + prior_weight * prior_risk, final_score)
+
+    # assess_risk rounds a NumPy scalar when the case has entities and a float otherwise
+    has_entities = (entity_counts > 0).tolist()
+    np_rounded = np.round(final_score, 3).tolist()
+    avg_rounded = np.round(avg_entity_risk, 2).tolist()
+    final_score, avg_entity_risk, osint_score = final_score.tolist(), avg_entity_risk.tolist(), osint_score.tolist()
+    kw_score, tone_score, sentiment_score = kw_score.tolist(), tone_score.tolist(), sentiment_score.tolist()
+    hit_counts, prior_index = hit_counts.tolist(), prior_index.tolist()
+
+    # --- 8️⃣ 9️⃣ 🔟 Per-case results ---
+    timestamp = datetime.now().isoformat()
+    results = []
+    for i in range(n):
+        score = np_rounded[i] if has_entities[i] else round(final_score[i], 3)
+        osint_i = osint_score[i] if hit_counts[i] else 0
+        prior = None
+        if prior_index[i] >= 0:
+            rep, confidence = candidates[prior_index[i]]
+            prior = (rep["decayed_risk"], confidence, rep)
+        result = {
+            "score": score,
+            "risk_level": _risk_level(score),
+            "rationale": _rationale(scam_types[i], scam_conf_raw[i], avg_entity_risk[i], kw_score[i],
+                                    tone_score[i], osint_i, prior),
+            "timestamp": timestamp,
+            "factors": {
+                "scam_confidence": scam_conf_raw[i],
+                "avg_entity_risk": avg_rounded[i] if has_entities[i] else 0,
+                "keyword_toxicity": kw_score[i],
+                "tone_score": tone_score[i],
+                "sentiment_neutrality": sentiment_score[i],
+                "osint_weight": osint_i,
+                "reputation_prior": round(prior[0] if prior else 0.0, 3),
+            },
+            "scam_type": scam_types[i],
+        }
+        if details:
+            result["entity_details"] = [{**table[j], "tags": list(table[j]["tags"])} for j in slots[i]]
+        results.append(result)
+    return results
@@ -20,6 +20,8 @@ from app.pipelines.osint_engine import (
     openphish_check,
     fallback_domain
 )
+from app.pipelines.entity_canonical import canonical_host, canonical_keys
+from app.services.ioc_snapshot import ioc_index
 
 # -------------------------------
 # 🧩 Threat Intelligence (Local Fallback)
@@ -68,6 +70,12 @@ def heuristic_url_risk(url: str) -> Dict:
         risk_score += 20
         tags.append("phishing_keyword")
 
+    # Known-bad on a partner deployment (imported IOC snapshot)
+    shared_ioc = ioc_index.lookup(canonical_keys({"type": "URL", "value": url}))
+    if shared_ioc:
+        risk_score += 50
+        tags.append("shared_ioc")
+
     if not url.lower().startswith("https://"):
         risk_score += 10
         tags.append("no_https")
@@ -81,7 +89,8 @@ def heuristic_url_risk(url: str) -> Dict:
         "risk_score": risk_score,
         "risk_level": risk_level,
         "tags": tags,
-        "note": MALICIOUS_DOMAINS.get(hostname, "N/A"),
+        "note": MALICIOUS_DOMAINS.get(hostname)
+        or (f"Shared IOC from {shared_ioc['source_node']} ({shared_ioc['category']})" if shared_ioc else "N/A"),
     }
 
 
@@ -114,7 +123,7 @@ def extract_qr_codes(image_path: str) -> List[str]:
 def osint_enrich(domain_or_url: str) -> Dict:
     try:
         parsed = urlparse(domain_or_url)
-        domain = parsed.netloc or domain_or_url
+        domain = canonical_host(domain_or_url) or parsed.netloc or domain_or_url
 
         vt_d = vt_domain_report(domain)
         vt_u = vt_url_report(domain_or_url)
@@ -141,15 +150,19 @@ def scan_urls_and_qr(text: str, image_path: str) -> List[Dict]:
     urls = extract_urls(text or "")
     # Only try extracting QR if image path is provided
     qr_links = extract_qr_codes(image_path) if image_path else []
+    return scan_links(urls + qr_links)
+
 
-    all_links = list(set(urls + qr_links))
+def scan_links(links: List[str], with_osint: bool = True) -> List[Dict]:
+    """Score each distinct link; with_osint=False keeps to local heuristics (no network)."""
+    all_links = list(set(links))
     if not all_links:
         return []
 
     results = []
     for link in all_links:
         heuristics = heuristic_url_risk(link)
-        osint = osint_enrich(link)
+        osint = osint_enrich(link) if with_osint else {}
 
         final_risk = heuristics["risk_score"]
         if isinstance(osint, dict):
@@ -78,6 +78,7 @@ Total Cases: {summary['total_cases']}
 Unique Entities: {summary['unique_entities']}
 Average Risk Score: {summary['average_risk']}%
 Dominant Scam Category: {summary['dominant_category']}
+Entity Mentions: {summary.get('entity_mentions', 'N/A')} ({summary.get('osint_lookups', 'N/A')} distinct OSINT lookups, dedup ratio {summary.get('dedup_ratio', 0):.0%})
 """
     )
     pdf.ln(5)
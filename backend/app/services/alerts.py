@@ -0,0 +1,202 @@
+"""
+🚨 Campaign Alerting
+Streaming rules evaluated on the analysis write path, against the windowed
+entity counters, for every entity a new case introduces. Fired alerts are
+persisted and pushed to analysts over the event bus ("alerts" channel).
+
+Rule types:
+  • entity_surge  — an entity seen in ≥ min_cases cases within window_minutes
+  • domain_joins_cluster — a never-seen host on a high-risk case whose
+    registered domain already belongs to a known scam cluster
+Rules can be overridden with a JSON list in app/data/alert_rules.json.
+"""
+
+import os
+import json
+import time
+from typing import List, Optional
+
+from app.pipelines.entity_canonical import key_value, registered_domain
+from app.services.intel_store import get_intel_db, ensure_schema
+from app.services import entity_counters, event_bus
+
+ensure_schema("alerts", """
+CREATE TABLE IF NOT EXISTS alerts (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    rule_id       TEXT NOT NULL,
+    severity      TEXT NOT NULL,
+    entity_key    TEXT,
+    file_id       TEXT,
+    message       TEXT NOT NULL,
+    details       TEXT,
+    created_at    REAL NOT NULL,
+    acknowledged  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_rule_entity ON alerts(rule_id, entity_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_alerts_created ON alerts(created_at);
+""")
+
+RULES_PATH = "app/data/alert_rules.json"
+
+DEFAULT_RULES = [
+    {
+        "id": "entity_surge",
+        "type": "entity_surge",
+        "severity": "high",
+        "min_cases": 5,
+        "window_minutes": 60,
+        "key_prefixes": ["upi:", "phone:", "domain:", "host:", "email:", "crypto:", "ip:"],
+    },
+    {
+        "id": "domain_joins_cluster",
+        "type": "domain_joins_cluster",
+        "severity": "high",
+        "min_risk": 0.75,
+        "min_cluster_size": 2,
+    },
+]
+
+CHANNEL = "alerts"
+
+
+def load_rules() -> List[dict]:
+    if os.path.exists(RULES_PATH):
+        try:
+            with open(RULES_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Invalid {RULES_PATH}, using default alert rules: {e}")
+    return DEFAULT_RULES
+
+
+RULES = load_rules()
+
+
+# -------------------------------------------------------
+# 🧠 Rule Evaluation
+# -------------------------------------------------------
+def _recently_fired(conn, rule_id: str, entity_key: str, since: float) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM alerts WHERE rule_id = ? AND entity_key = ? AND created_at >= ? LIMIT 1",
+        (rule_id, entity_key, since),
+    ).fetchone() is not None
+
+
+def _fire(conn, rule: dict, entity_key: str, file_id: str, message: str, details: dict) -> dict:
+    now = time.time()
+    cur = conn.execute(
+        """
+        INSERT INTO alerts (rule_id, severity, entity_key, file_id, message, details, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (rule["id"], rule.get("severity", "medium"), entity_key, file_id, message, json.dumps(details), now),
+    )
+    alert = {
+        "id": cur.lastrowid,
+        "rule_id": rule["id"],
+        "severity": rule.get("severity", "medium"),
+        "entity": key_value(entity_key),
+        "entity_key": entity_key,
+        "file_id": file_id,
+        "message": message,
+        "details": details,
+        "created_at": now,
+    }
+    event_bus.publish(conn, CHANNEL, "alert", alert)
+    return alert
+
+
+def _entity_surge(conn, rule: dict, case: dict, key: str) -> Optional[dict]:
+    if not key.startswith(tuple(rule.get("key_prefixes", []))):
+        return None
+    window_sec = int(rule["window_minutes"]) * 60
+    seen = entity_counters.window_count(key, window_sec)
+    if seen < rule["min_cases"] or _recently_fired(conn, rule["id"], key, time.time() - window_sec):
+        return None
+    return _fire(
+        conn, rule, key, case["file_id"],
+        f"{key_value(key)} seen in {seen} cases within {rule['window_minutes']} minutes",
+        {"cases_in_window": seen, "window_minutes": rule["window_minutes"]},
+    )
+
+
+def _domain_joins_cluster(conn, rule: dict, case: dict, key: str) -> Optional[dict]:
+    if not key.startswith("host:"):
+        return None
+    risk = case.get("risk", {}).get("score", 0.0) or 0.0
+    if risk < rule["min_risk"]:
+        return None
+    # Only brand-new hosts: the counter was just created by this case.
+    row = conn.execute("SELECT count FROM entity_counters WHERE entity_key = ?", (key,)).fetchone()
+    if not row or row["count"] != 1:
+        return None
+
+    domain_key = f"domain:{registered_domain(key_value(key))}"
+    cluster = conn.execute(
+        """
+        SELECT c.cluster_id, c.size FROM case_entities e
+        JOIN cluster_membership m ON m.file_id = e.file_id
+        JOIN clusters c ON c.root = m.root
+        WHERE e.entity_key = ? AND e.file_id != ? AND c.size >= ?
+        LIMIT 1
+        """,
+        (domain_key, case["file_id"], rule["min_cluster_size"]),
+    ).fetchone()
+    if not cluster:
+        return None
+    return _fire(
+        conn, rule, key, case["file_id"],
+        f"New high-risk host {key_value(key)} shares {key_value(domain_key)} with cluster {cluster['cluster_id']}",
+        {"registered_domain": key_value(domain_key), "cluster_id": cluster["cluster_id"],
+         "cluster_size": cluster["size"], "risk_score": risk},
+    )
+
+
+_EVALUATORS = {
+    "entity_surge": _entity_surge,
+    "domain_joins_cluster": _domain_joins_cluster,
+}
+
+
+def evaluate(conn, case: dict, new_keys: List[str]) -> List[dict]:
+    """
+    Run every rule against the entities this case just added. Must run after the
+    entity counters are updated and before the case joins its clusters.
+    """
+    fired = []
+    for key in new_keys:
+        for rule in RULES:
+            evaluator = _EVALUATORS.get(rule.get("type"))
+            if not evaluator:
+                continue
+            alert = evaluator(conn, rule, case, key)
+            if alert:
+                fired.append(alert)
+    return fired
+
+
+# -------------------------------------------------------
+# 📋 Queries
+# -------------------------------------------------------
+def list_alerts(limit: int = 50, before_id: Optional[int] = None, unacknowledged: bool = False) -> dict:
+    filters, params = [], []
+    if before_id:
+        filters.append("id < ?")
+        params.append(before_id)
+    if unacknowledged:
+        filters.append("acknowledged = 0")
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    with get_intel_db() as conn:
+        rows = conn.execute(f"SELECT * FROM alerts {where} ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+    alerts = [{**dict(r), "details": json.loads(r["details"] or "{}"), "acknowledged": bool(r["acknowledged"])} for r in rows]
+    return {
+        "count": len(alerts),
+        "next_before_id": alerts[-1]["id"] if len(alerts) == limit else None,
+        "alerts": alerts,
+    }
+
+
+def acknowledge(alert_id: int) -> bool:
+    with get_intel_db() as conn:
+        cur = conn.execute("UPDATE alerts SET acknowledged = 1 WHERE id = ?", (alert_id,))
+    return cur.rowcount > 0
@@ -0,0 +1,114 @@
+"""
+⚡ Tiered Analysis Cascade
+Bounds that decide when a cheap heuristic verdict is final, and a ledger of
+analysis runs used to report how much compute the cascade saved.
+
+Tier 0: regex entities, lexicons, reputation, local blocklists and QR links
+        from text that costs nothing to get (plain-text evidence, reused OCR).
+Tier 1: the same heuristics after OCR.
+Tier 2: the full pipeline (NER, scam classifier, OSINT).
+"""
+
+import os
+import time
+from typing import Optional
+
+from app.services.intel_store import get_intel_db, ensure_schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_runs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id      TEXT NOT NULL,
+    mode         TEXT NOT NULL,
+    tier         INTEGER NOT NULL,
+    ocr_skipped  INTEGER NOT NULL,
+    deep_skipped INTEGER NOT NULL,
+    ocr_sec      REAL,
+    deep_sec     REAL,
+    total_sec    REAL NOT NULL,
+    created_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_runs_mode ON analysis_runs(mode, tier);
+"""
+ensure_schema("analysis_cascade", SCHEMA)
+
+# A heuristic score at or above CASCADE_HIGH is final as fraud. A score at or below
+# CASCADE_LOW is final as benign only with readable text and positive evidence (entities
+# with a clean reputation history): a low score alone just means no cheap indicator fired.
+# Anything else goes deeper.
+CASCADE_LOW = float(os.getenv("CASCADE_LOW", "0.05"))
+CASCADE_HIGH = float(os.getenv("CASCADE_HIGH", "0.85"))
+
+TIER_NAMES = {0: "heuristic", 1: "heuristic+ocr", 2: "deep"}
+
+
+def decisive(score: float, has_text: bool, benign_evidence: bool = False) -> Optional[str]:
+    """'fraud' / 'benign' when the heuristic score is past a bound, else None."""
+    if score >= CASCADE_HIGH:
+        return "fraud"
+    if has_text and benign_evidence and score <= CASCADE_LOW:
+        return "benign"
+    return None
+
+
+def record_run(file_id: str, mode: str, tier: int, ocr_skipped: bool, deep_skipped: bool,
+               ocr_sec: Optional[float], deep_sec: Optional[float], total_sec: float):
+    """Log one /analyze run; ocr_sec/deep_sec are None when that stage did not run."""
+    try:
+        with get_intel_db() as conn:
+            conn.execute(
+                "INSERT INTO analysis_runs (file_id, mode, tier, ocr_skipped, deep_skipped, "
+                "ocr_sec, deep_sec, total_sec, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_id, mode, tier, int(ocr_skipped), int(deep_skipped),
+                 ocr_sec, deep_sec, total_sec, time.time()),
+            )
+    except Exception as e:
+        print(f"⚠️ Cascade run not recorded for {file_id}: {e}")
+
+
+def cascade_stats() -> dict:
+    """Runs per tier and the estimated compute saved, priced at the mean cost of the stages that did run."""
+    with get_intel_db() as conn:
+        rows = conn.execute(
+            "SELECT mode, tier, COUNT(*) AS runs, AVG(total_sec) AS avg_sec, "
+            "SUM(ocr_skipped) AS ocr_skipped, SUM(deep_skipped) AS deep_skipped "
+            "FROM analysis_runs GROUP BY mode, tier ORDER BY mode, tier"
+        ).fetchall()
+        costs = conn.execute(
+            "SELECT AVG(ocr_sec) AS ocr, COUNT(ocr_sec) AS ocr_samples, "
+            "AVG(deep_sec) AS deep, COUNT(deep_sec) AS deep_samples FROM analysis_runs"
+        ).fetchone()
+
+    avg_ocr = costs["ocr"] or 0.0
+    avg_deep = costs["deep"] or 0.0
+    cascade_runs = sum(r["runs"] for r in rows if r["mode"] == "cascade")
+    settled_early = sum(r["runs"] for r in rows if r["mode"] == "cascade" and r["tier"] < 2)
+    ocr_skipped = sum(r["ocr_skipped"] for r in rows)
+    deep_skipped = sum(r["deep_skipped"] for r in rows)
+    saved = ocr_skipped * avg_ocr + deep_skipped * avg_deep
+
+    return {
+        "bounds": {"low": CASCADE_LOW, "high": CASCADE_HIGH},
+        "tiers": [
+            {
+                "mode": r["mode"],
+                "tier": r["tier"],
+                "name": TIER_NAMES.get(r["tier"], str(r["tier"])),
+                "runs": r["runs"],
+                "avg_sec": round(r["avg_sec"] or 0.0, 3),
+            }
+            for r in rows
+        ],
+        "cascade_runs": cascade_runs,
+        "settled_early": settled_early,
+        "settled_early_ratio": round(settled_early / cascade_runs, 3) if cascade_runs else 0.0,
+        "ocr_skipped": ocr_skipped,
+        "deep_skipped": deep_skipped,
+        "stage_cost_sec": {
+            "ocr": round(avg_ocr, 3),
+            "ocr_samples": costs["ocr_samples"],
+            "deep": round(avg_deep, 3),
+            "deep_samples": costs["deep_samples"],
+        },
+        "estimated_sec_saved": round(saved, 2),
+    }
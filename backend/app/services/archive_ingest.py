@@ -0,0 +1,339 @@
+"""
+🗜️ Streaming Archive Ingestion
+Turns a ZIP or TAR(.gz/.bz2/.xz) evidence drop into a batch while it is still
+uploading. The request body is fed chunk by chunk into a parser thread that
+walks the archive entry by entry: each entry is hashed straight into the blob
+store (nothing is extracted to a temp directory), skipped if its content is
+already known, and otherwise linked into the batch and queued for analysis
+at once, so the first results stream out before the archive has arrived.
+
+ZIP is read from its local file headers (no central directory, so no seeking);
+deflated and stored entries are supported, including the data-descriptor form
+streaming zip writers produce, and every entry's CRC is checked before its
+blob is committed.
+"""
+
+import os
+import queue
+import struct
+import hashlib
+import tarfile
+import zlib
+import threading
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+from app.services.blob_store import BlobWriter, link, CHUNK_SIZE
+from app.services.upload_sessions import MAX_UPLOAD_BYTES
+from app.services.chainlog import chain_log
+from app.services import batch_jobs
+
+EVIDENCE_EXTS = {".png", ".jpg", ".jpeg", ".pdf", ".txt"}
+FEED_QUEUE_CHUNKS = 16  # request chunks buffered ahead of the parser
+
+_ZIP_LOCAL = b"PK\x03\x04"
+_ZIP_DESCRIPTOR = b"PK\x07\x08"
+_ZIP_END = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06")
+
+
+class ArchiveError(ValueError):
+    """Raised for archives that can't be read as a stream."""
+
+
+# -------------------------------------------------------
+# 🚰 Request Body → Parser Thread
+# -------------------------------------------------------
+class _ChunkStream:
+    """Blocking reader over chunks pushed by the request handler, with push-back for the ZIP parser."""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=FEED_QUEUE_CHUNKS)
+        self._buf = b""
+        self._eof = False
+        self.closed = threading.Event()  # parser finished: stop feeding
+        self.sha = hashlib.sha256()
+        self.size = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """Producer side; b"" marks the end. Returns False once the parser no longer wants data."""
+        if chunk:
+            self.sha.update(chunk)
+            self.size += len(chunk)
+        while not self.closed.is_set():
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(self, n: int = -1) -> bytes:
+        parts, have = [self._buf], len(self._buf)
+        while (n < 0 or have < n) and not self._eof:
+            chunk = self._queue.get()
+            if chunk:
+                parts.append(chunk)
+                have += len(chunk)
+            else:
+                self._eof = True
+        buf = b"".join(parts) if len(parts) > 1 else parts[0]
+        if n < 0:
+            n = len(buf)
+        data, self._buf = buf[:n], buf[n:]
+        return data
+
+    def unread(self, data: bytes):
+        self._buf = data + self._buf
+
+    def read_exact(self, n: int) -> bytes:
+        data = self.read(n)
+        if len(data) != n:
+            raise ArchiveError("Archive ended unexpectedly")
+        return data
+
+
+# -------------------------------------------------------
+# 📚 Entry Readers
+# -------------------------------------------------------
+def _zip64_sizes(extra: bytes, csize: int, usize: int) -> Tuple[int, int, bool]:
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<HH", extra, pos)
+        if tag == 0x0001:
+            fields = extra[pos + 4:pos + 4 + length]
+            values = list(struct.unpack_from(f"<{len(fields) // 8}Q", fields))
+            if usize == 0xFFFFFFFF and values:
+                usize = values.pop(0)
+            if csize == 0xFFFFFFFF and values:
+                csize = values.pop(0)
+            return csize, usize, True
+        pos += 4 + length
+    return csize, usize, False
+
+
+def _stored(stream: _ChunkStream, size: int) -> Iterator[bytes]:
+    while size:
+        data = stream.read_exact(min(CHUNK_SIZE, size))
+        size -= len(data)
+        yield data
+
+
+def _inflated(stream: _ChunkStream, csize: Optional[int]) -> Iterator[bytes]:
+    """Raw-deflate decode; with csize=None the stream's own end marker bounds the entry."""
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+    remaining = csize
+    while not inflater.eof:
+        if remaining == 0:
+            raise ArchiveError("Deflate data ended before its end marker")
+        data = stream.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+        if not data:
+            raise ArchiveError("Archive ended unexpectedly")
+        if remaining is not None:
+            remaining -= len(data)
+        out = inflater.decompress(data, CHUNK_SIZE)  # bounded output: no zip-bomb bursts
+        while out:
+            yield out
+            out = inflater.decompress(inflater.unconsumed_tail, CHUNK_SIZE) if inflater.unconsumed_tail else b""
+    if inflater.unused_data:
+        stream.unread(inflater.unused_data)
+
+
+def _stored_until_descriptor(stream: _ChunkStream) -> Iterator[bytes]:
+    """Stored entry of unknown size: it ends at the first descriptor whose CRC and size match the bytes before it."""
+    crc, size, buf = 0, 0, b""
+    while True:
+        data = stream.read(CHUNK_SIZE)
+        if not data:
+            raise ArchiveError("Archive ended unexpectedly")
+        buf += data
+        cut, start = max(0, len(buf) - 3), 0  # a signature may straddle the next read
+        while (pos := buf.find(_ZIP_DESCRIPTOR, start)) != -1:
+            if pos + 16 > len(buf):
+                cut = pos
+                break
+            d_crc, d_size32 = struct.unpack_from("<II", buf, pos + 4)
+            d_size64 = struct.unpack_from("<Q", buf, pos + 8)[0]
+            if size + pos in (d_size32, d_size64) and zlib.crc32(buf[:pos], crc) == d_crc:
+                if pos:
+                    yield buf[:pos]
+                stream.unread(buf[pos:])
+                return
+            start = pos + 1
+        if cut:
+            crc, size = zlib.crc32(buf[:cut], crc), size + cut
+            yield buf[:cut]
+            buf = buf[cut:]
+
+
+def _checked(stream: _ChunkStream, name: str, chunks: Iterator[bytes], crc: int,
+             has_descriptor: bool, zip64: bool) -> Iterator[bytes]:
+    """Yield an entry's bytes; the CRC is verified before the last read returns, so a bad entry is never committed."""
+    actual = 0
+    for chunk in chunks:
+        actual = zlib.crc32(chunk, actual)
+        yield chunk
+    if has_descriptor:
+        head = stream.read_exact(4)
+        if head == _ZIP_DESCRIPTOR:
+            head = stream.read_exact(4)
+        crc = struct.unpack("<I", head)[0]
+        stream.read_exact(16 if zip64 else 8)
+    if actual != crc:
+        raise ArchiveError(f"CRC mismatch in ZIP entry {name}")
+
+
+def _zip_entries(stream: _ChunkStream) -> Iterator[Tuple[str, Iterator[bytes]]]:
+    while True:
+        signature = stream.read(4)
+        if not signature or signature in _ZIP_END:
+            return
+        if signature != _ZIP_LOCAL:
+            raise ArchiveError("Corrupt ZIP: expected a local file header")
+        (_, flags, method, _, _, crc, csize, usize, name_len, extra_len) = struct.unpack(
+            "<HHHHHIIIHH", stream.read_exact(26))
+        raw_name = stream.read_exact(name_len)
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437", errors="replace")
+        csize, usize, zip64 = _zip64_sizes(stream.read_exact(extra_len), csize, usize)
+        has_descriptor = bool(flags & 0x08)
+        if flags & 0x01:
+            raise ArchiveError(f"Encrypted ZIP entry not supported: {name}")
+
+        if method == 0:
+            chunks = _stored_until_descriptor(stream) if has_descriptor else _stored(stream, csize)
+        elif method == 8:
+            chunks = _inflated(stream, None if has_descriptor else csize)
+        elif not has_descriptor:
+            print(f"⚠️ Skipping ZIP entry {name}: compression method {method} not supported")
+            for _ in _stored(stream, csize):
+                pass
+            continue
+        else:
+            raise ArchiveError(f"ZIP entry {name} can't be streamed (method {method} with data descriptor)")
+
+        entry = _checked(stream, name, chunks, crc, has_descriptor, zip64)
+        yield name, entry
+        for _ in entry:  # drain (and check) whatever the consumer didn't read
+            pass
+
+
+def _tar_entries(stream: _ChunkStream) -> Iterator[Tuple[str, Iterator[bytes]]]:
+    try:
+        with tarfile.open(fileobj=stream, mode="r|*") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                f = tar.extractfile(member)
+                yield member.name, iter(lambda: f.read(CHUNK_SIZE), b"")
+    except tarfile.TarError as e:
+        raise ArchiveError(f"Not a readable ZIP or TAR archive: {e}")
+
+
+# -------------------------------------------------------
+# 📥 Ingest
+# -------------------------------------------------------
+class ArchiveIngest:
+    """One archive upload feeding one batch. The handler calls feed(); run() executes in a worker thread."""
+
+    def __init__(self, batch_id: str, archive_name: str, skip_known: bool = True):
+        self.batch_id = batch_id
+        self.archive_name = archive_name
+        self.skip_known = skip_known
+        self.batch_path = os.path.join(batch_jobs.BATCH_DIR, batch_id)
+        self.stream = _ChunkStream()
+        self.stats = {"entries": 0, "queued": 0, "skipped_known": 0, "skipped_duplicate": 0, "ignored": 0}
+        self.skipped = []
+        self.files = []
+        self.error = None
+        os.makedirs(self.batch_path, exist_ok=True)
+        batch_jobs.start_batch(batch_id, [], sealed=False)
+
+    def feed(self, chunk: bytes) -> bool:
+        return self.stream.feed(chunk)
+
+    def _name_for(self, entry_name: str) -> Optional[str]:
+        name = os.path.basename(entry_name.replace("\\", "/"))
+        if not name or name.startswith(".") or "__MACOSX/" in entry_name:
+            return None
+        if os.path.splitext(name)[1].lower() not in EVIDENCE_EXTS:
+            return None
+        unique, n = name, 1
+        while unique in self.files:
+            unique, n = f"{n}_{name}", n + 1
+        return unique
+
+    def _store(self, entry_name: str, chunks: Iterator[bytes], seen: set):
+        self.stats["entries"] += 1
+        name = self._name_for(entry_name)
+        if not name:
+            self.stats["ignored"] += 1
+            return
+        with BlobWriter() as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+                if writer.size > MAX_UPLOAD_BYTES:
+                    raise ArchiveError(f"Entry {entry_name} exceeds {MAX_UPLOAD_BYTES} bytes")
+            blob = writer.commit()
+
+        reason = None
+        if blob["sha256"] in seen:
+            reason, key = "duplicate_in_archive", "skipped_duplicate"
+        elif blob["deduplicated"] and self.skip_known:
+            reason, key = "already_known", "skipped_known"
+        seen.add(blob["sha256"])
+        if reason:
+            self.stats[key] += 1
+            self.skipped.append({"entry": entry_name, "sha256": blob["sha256"], "reason": reason})
+            return
+
+        self.files.append(name)
+        path = link(blob["sha256"], os.path.join(self.batch_path, name))
+        batch_jobs.add_file(self.batch_id, path, blob["sha256"])
+        self.stats["queued"] += 1
+
+    def run(self) -> dict:
+        """Parse the archive into the batch. The batch is sealed however parsing ends."""
+        seen = set()
+        try:
+            head = self.stream.read(4)
+            self.stream.unread(head)
+            if not head:
+                raise ArchiveError("Empty upload")
+            entries = _zip_entries if head == _ZIP_LOCAL or head in _ZIP_END else _tar_entries
+            for entry_name, chunks in entries(self.stream):
+                self._store(entry_name, chunks, seen)
+            while self.stream.read(CHUNK_SIZE):  # trailing bytes (ZIP central directory, TAR padding)
+                pass
+        except (ArchiveError, OSError, zlib.error, tarfile.TarError, EOFError) as e:
+            # A truncated upload ends here: whatever was queued before the cut still gets analyzed.
+            self.error = str(e) or type(e).__name__
+            print(f"⚠️ Archive ingest for batch {self.batch_id} stopped: {self.error}")
+        except Exception as e:
+            self.error = f"Archive ingest failed: {e}"
+            raise
+        finally:
+            self.stream.closed.set()
+            result = self._seal()
+        return result
+
+    def _seal(self) -> dict:
+        summary = {
+            "archive": self.archive_name,
+            "archive_sha256": self.stream.sha.hexdigest(),
+            "archive_bytes": self.stream.size,
+            **self.stats,
+            "error": self.error,
+        }
+        batch_jobs.seal_batch(self.batch_id, ingest={**summary, "skipped": self.skipped})
+        chain_log(
+            action="BATCH_UPLOAD",
+            actor="system",
+            target=self.batch_id,
+            sha256=summary["archive_sha256"],
+            meta={
+                "file_count": len(self.files),
+                "files": self.files,
+                **summary,
+                "timestamp": datetime.now().isoformat(),
+            },
+        )
+        return {**summary, "skipped": self.skipped}
@@ -0,0 +1,470 @@
+"""
+🧮 Batch Analysis Jobs
+Runs a batch in the background on a bounded worker pool shared by every
+batch in the process, so a 500-file upload cannot spawn 500 OCR runs at once.
+Each file's outcome is published on the event bus (channel "batch:<id>") the
+moment it completes; clients follow it as SSE or NDJSON. When the last file
+finishes, the unified report is built from the collected results.
+
+Every batch keeps a durable manifest (batches/<id>/.manifest.json) with each
+file's state (pending → running → done | failed), attempts and a link to its
+cached result, rewritten atomically on every transition. After a crash the
+batch resumes from the manifest — at startup or via POST /batches/{id}/resume —
+and only unfinished files are analyzed again. Transient failures (network
+errors, timeouts, rate-limited OSINT sources) are retried with exponential
+backoff without holding a worker slot while waiting. A file whose extraction
+succeeded keeps it across retries, so a degraded OSINT result repeats only the
+lookups and the risk fusion, and the case is saved once, after the last
+attempt, even if some OSINT sources are still unavailable. A file left
+unfinished with no task queued for it is marked failed, so the batch always
+completes.
+"""
+
+import os
+import json
+import time
+import fcntl
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+import requests
+
+from app.pipelines.batch_analyzer import extract_file, score_file, save_file_result, save_batch_summary
+from app.pipelines.osint_engine import EntityEnricher, has_transient_failure
+from app.reports.unified_report_generator import generate_unified_report
+from app.services.intel_store import get_intel_db
+from app.services.case_store import load_case
+from app.services.chainlog import chain_log
+from app.services import event_bus
+
+BATCH_DIR = "app/data/batches"
+CACHE_DIR = "app/data/analysis_cache"
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SEC = 2.0
+LIVENESS_CHECK_SEC = 30.0
+
+TRANSIENT_ERRORS = (requests.RequestException, ConnectionError, TimeoutError)
+UNFINISHED = ("pending", "running")
+
+_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch-worker")
+_runs = {}
+_runs_lock = threading.Lock()
+
+
+class BatchBusy(RuntimeError):
+    """Raised when a batch is already running (in this or another worker)."""
+
+
+def channel(batch_id: str) -> str:
+    return f"batch:{batch_id}"
+
+
+def _publish(batch_id: str, event_type: str, payload: dict):
+    try:
+        with get_intel_db() as conn:
+            event_bus.publish(conn, channel(batch_id), event_type, {"batch_id": batch_id, **payload})
+    except Exception as e:
+        print(f"⚠️ Batch event {event_type} for {batch_id} not published: {e}")
+
+
+def _file_summary(result: dict) -> dict:
+    """The per-file event payload: what a progress view needs, not the full case."""
+    risk = result.get("risk", {})
+    return {
+        "file_id": result.get("file_id"),
+        "category": result.get("scam_class", {}).get("category", "Unknown"),
+        "risk_score": risk.get("score", 0),
+        "risk_level": risk.get("risk_level", "Unknown"),
+        "entities_found": len(result.get("entities", [])),
+        "urls_detected": len(result.get("url_qr_findings", [])),
+        "processing_time_sec": result.get("processing_time_sec"),
+    }
+
+
+# -------------------------------------------------------
+# 📒 Manifest
+# -------------------------------------------------------
+def _manifest_path(batch_id: str) -> str:
+    return os.path.join(BATCH_DIR, os.path.basename(batch_id), ".manifest.json")
+
+
+def load_manifest(batch_id: str) -> Optional[dict]:
+    try:
+        with open(_manifest_path(batch_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(manifest: dict):
+    path = _manifest_path(manifest["batch_id"])
+    manifest["updated_at"] = time.time()
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def _counts(manifest: dict) -> dict:
+    states = [f["state"] for f in manifest["files"]]
+    return {
+        "done": states.count("done"),
+        "failed": states.count("failed"),
+        "pending": states.count("pending") + states.count("running"),
+        "total": len(states),
+    }
+
+
+# -------------------------------------------------------
+# 🏃 Runner
+# -------------------------------------------------------
+class _Run:
+    """One active batch in this process: its manifest, lock file and completion tracking."""
+
+    def __init__(self, manifest: dict, lock_file):
+        self.manifest = manifest
+        self.lock_file = lock_file
+        self.lock = threading.Lock()
+        self.remaining = sum(f["state"] in UNFINISHED for f in manifest["files"])
+        self.finished = threading.Event()
+        self.enricher = EntityEnricher()  # entities shared across the batch are enriched once
+        self.extracted = {}  # file index -> extraction kept for a retry of its OSINT/risk step
+        self.inflight = 0  # files queued, backing off or being processed
+        if self.remaining == 0 and manifest.get("sealed", True):
+            self.finished.set()
+
+    def update(self, index: int, **changes) -> dict:
+        with self.lock:
+            entry = self.manifest["files"][index]
+            was_unfinished = entry["state"] in UNFINISHED
+            entry.update(changes, updated_at=time.time())
+            if was_unfinished and changes.get("state") in ("done", "failed"):
+                self.remaining -= 1
+                if self.remaining == 0 and self.manifest.get("sealed", True):
+                    self.finished.set()
+            _write_manifest(self.manifest)
+            return {**_counts(self.manifest), "file": entry["name"]}
+
+
+def _schedule(run: _Run, index: int, delay: float = 0.0):
+    with run.lock:
+        run.inflight += 1
+    try:
+        if delay:
+            # Wait off the pool so a backing-off file doesn't hold a worker slot.
+            threading.Timer(delay, _pool.submit, args=(_process, run, index)).start()
+        else:
+            _pool.submit(_process, run, index)
+    except Exception:
+        with run.lock:
+            run.inflight -= 1
+        raise
+
+
+def _retry(run: _Run, index: int, attempts: int, error: str):
+    delay = RETRY_BASE_SEC * 2 ** (attempts - 1)
+    progress = run.update(index, state="pending", error=error)
+    _publish(run.manifest["batch_id"], "file_retry", {**progress, "error": error, "attempt": attempts, "retry_in_sec": delay})
+    _schedule(run, index, delay)
+
+
+def _fail(run: _Run, index: int, attempts: int, error: Exception):
+    batch_id = run.manifest["batch_id"]
+    run.extracted.pop(index, None)
+    print(f"⚠️ Batch {batch_id}: {run.manifest['files'][index]['name']} failed after {attempts} attempt(s): {error}")
+    progress = run.update(index, state="failed", error=str(error))
+    _publish(batch_id, "file_failed", {**progress, "error": str(error), "attempts": attempts})
+
+
+def _process(run: _Run, index: int):
+    """Pool task for one file; whatever goes wrong, the file ends up retried, done or failed."""
+    attempts = run.manifest["files"][index].get("attempts", 0) + 1
+    try:
+        _attempt(run, index, attempts)
+    except Exception as e:
+        try:
+            _fail(run, index, attempts, e)
+        except Exception as e2:
+            print(f"⚠️ Batch {run.manifest['batch_id']}: could not record failure of file {index}: {e2}")
+    finally:
+        with run.lock:
+            run.inflight -= 1
+
+
+def _attempt(run: _Run, index: int, attempts: int):
+    batch_id = run.manifest["batch_id"]
+    entry = run.manifest["files"][index]
+    run.update(index, state="running", attempts=attempts)
+    try:
+        extracted = run.extracted.get(index)
+        if extracted is None:
+            extracted = run.extracted[index] = extract_file(entry["path"], run.enricher)
+        result = score_file(extracted, run.enricher)
+    except Exception as e:
+        if isinstance(e, TRANSIENT_ERRORS) and attempts < MAX_ATTEMPTS:
+            return _retry(run, index, attempts, str(e))
+        return _fail(run, index, attempts, e)
+
+    degraded = sum(has_transient_failure(hit) for hit in result.get("osint_hits", []))
+    if degraded and attempts < MAX_ATTEMPTS:
+        return _retry(run, index, attempts, f"{degraded} OSINT lookup(s) hit transient source failures")
+
+    run.extracted.pop(index, None)
+    save_file_result(result)
+
+    progress = run.update(
+        index, state="done", error=None, osint_degraded=degraded,
+        file_id=result.get("file_id"),
+        result=os.path.join(CACHE_DIR, f"{result.get('file_id')}.json"),
+    )
+    _publish(batch_id, "file_done", {**progress, **_file_summary(result)})
+
+
+def _finish(run: _Run):
+    manifest = run.manifest
+    batch_id = manifest["batch_id"]
+    results = [
+        case for case in (load_case(f["file_id"]) for f in manifest["files"] if f["state"] == "done")
+        if case
+    ]
+    summary, report_path, report_error = None, None, None
+    if results:
+        summary = save_batch_summary(batch_id, results)["summary"]
+        try:
+            report = generate_unified_report(batch_id)
+            report_path, report_error = report.get("pdf_path"), report.get("error")
+        except Exception as e:
+            report_error = f"Unified report generation failed: {e}"
+
+    with run.lock:
+        manifest.update(
+            status="complete" if results or not manifest["files"] else "failed",
+            finished_at=time.time(),
+            summary=summary,
+            report_path=report_path,
+            report_error=report_error,
+            enrichment=run.enricher.stats(),
+        )
+        _write_manifest(manifest)
+    counts = _counts(manifest)
+    chain_log(
+        action="BATCH_ANALYSIS_COMPLETE",
+        actor="system",
+        target=batch_id,
+        meta={**counts, "report_path": report_path, "timestamp": datetime.now().isoformat()},
+    )
+    _publish(batch_id, "batch_complete", {
+        **counts,
+        "status": manifest["status"],
+        "summary": summary,
+        "report_path": report_path,
+        "report_error": report_error,
+        "enrichment": manifest["enrichment"],
+        "elapsed_sec": round(manifest["finished_at"] - manifest["created_at"], 2),
+    })
+
+
+def _check_liveness(run: _Run):
+    """A sealed batch with nothing in flight can't make progress: settle what is left."""
+    with run.lock:
+        if not run.manifest.get("sealed", True) or run.inflight:
+            return
+        lost = [(i, f.get("attempts", 0)) for i, f in enumerate(run.manifest["files"]) if f["state"] in UNFINISHED]
+        if not lost:
+            run.finished.set()
+            return
+    for index, attempts in lost:
+        try:
+            _fail(run, index, attempts, RuntimeError("File was dropped by the batch runner"))
+        except Exception as e:
+            print(f"⚠️ Batch {run.manifest['batch_id']}: could not record failure of file {index}: {e}")
+
+
+def _drive(run: _Run, queued: List[int]):
+    batch_id = run.manifest["batch_id"]
+    try:
+        for index in queued:
+            _schedule(run, index)
+        while not run.finished.wait(LIVENESS_CHECK_SEC):
+            _check_liveness(run)
+        _finish(run)
+    except Exception as e:
+        print(f"❌ Batch {batch_id} crashed: {e}")
+        _publish(batch_id, "batch_complete", {**_counts(run.manifest), "status": "failed", "error": str(e)})
+    finally:
+        with _runs_lock:
+            _runs.pop(batch_id, None)
+        fcntl.flock(run.lock_file, fcntl.LOCK_UN)
+        run.lock_file.close()
+
+
+def _acquire(batch_id: str):
+    """The batch's ownership lock (one runner across all workers); raises BatchBusy if it is held."""
+    lock_file = open(os.path.join(BATCH_DIR, batch_id, ".lock"), "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise BatchBusy(f"Batch '{batch_id}' is already running")
+    return lock_file
+
+
+def _launch(manifest: dict, resumed: bool, lock_file=None) -> dict:
+    """Take ownership of a batch (unless the caller already holds its lock) and start driving it."""
+    batch_id = manifest["batch_id"]
+    lock_file = lock_file or _acquire(batch_id)
+
+    manifest = load_manifest(batch_id) or manifest  # re-read under the lock
+    for entry in manifest["files"]:
+        if entry["state"] == "running":
+            entry["state"] = "pending"  # interrupted mid-analysis
+    if resumed:
+        manifest["sealed"] = True  # an interrupted archive upload can't deliver more files
+    manifest["status"] = "running"
+    _write_manifest(manifest)
+
+    run = _Run(manifest, lock_file)
+    # Files appended later by add_file() are queued there, not here.
+    queued = [i for i, f in enumerate(manifest["files"]) if f["state"] in UNFINISHED]
+    with _runs_lock:
+        _runs[batch_id] = run
+    counts = _counts(manifest)
+    _publish(batch_id, "batch_resumed" if resumed else "batch_started", {**counts, "workers": BATCH_WORKERS})
+    threading.Thread(target=_drive, args=(run, queued), name=f"batch-{batch_id}", daemon=True).start()
+    return {**_status(manifest), "resumed_files": counts["pending"] if resumed else 0}
+
+
+# -------------------------------------------------------
+# 🚀 Public API
+# -------------------------------------------------------
+def start_batch(batch_id: str, file_paths: List[str], hashes: Optional[List[str]] = None, sealed: bool = True) -> dict:
+    """
+    Write the batch manifest and queue the batch; returns immediately with its status.
+    An unsealed batch accepts more files through add_file() and completes only after seal_batch().
+    """
+    os.makedirs(os.path.join(BATCH_DIR, batch_id), exist_ok=True)
+    # Own the batch before its manifest says "running", or a recovering worker could claim it.
+    lock_file = _acquire(batch_id)
+    manifest = {
+        "batch_id": batch_id,
+        "status": "running",
+        "sealed": sealed,
+        "created_at": time.time(),
+        "files": [
+            {"name": os.path.basename(p), "path": p, "sha256": (hashes or [None] * len(file_paths))[i],
+             "state": "pending", "attempts": 0}
+            for i, p in enumerate(file_paths)
+        ],
+    }
+    try:
+        _write_manifest(manifest)
+    except Exception:
+        lock_file.close()
+        raise
+    return _launch(manifest, resumed=False, lock_file=lock_file)
+
+
+def add_file(batch_id: str, path: str, sha256: Optional[str] = None):
+    """Append a file to a running, unsealed batch and queue it immediately."""
+    run = _runs.get(batch_id)
+    if not run or run.manifest.get("sealed", True):
+        raise ValueError(f"Batch '{batch_id}' is not accepting files")
+    with run.lock:
+        run.manifest["files"].append({
+            "name": os.path.basename(path), "path": path, "sha256": sha256,
+            "state": "pending", "attempts": 0, "updated_at": time.time(),
+        })
+        run.remaining += 1
+        index = len(run.manifest["files"]) - 1
+        _write_manifest(run.manifest)
+    _schedule(run, index)
+
+
+def seal_batch(batch_id: str, **details):
+    """No more files are coming: record `details` in the manifest and let the batch complete."""
+    run = _runs.get(batch_id)
+    if not run:
+        return
+    with run.lock:
+        run.manifest.update(details, sealed=True)
+        _write_manifest(run.manifest)
+        if run.remaining == 0:
+            run.finished.set()
+
+
+def resume_batch(batch_id: str) -> Optional[dict]:
+    """Continue a batch's unfinished files. None if there is no manifest; raises BatchBusy if it is running."""
+    manifest = load_manifest(batch_id)
+    if not manifest:
+        return None
+    if batch_id in _runs:
+        raise BatchBusy(f"Batch '{batch_id}' is already running")
+    if not any(f["state"] in UNFINISHED for f in manifest["files"]) and manifest.get("status") != "running":
+        return {**_status(manifest), "resumed_files": 0}
+    return _launch(manifest, resumed=True)
+
+
+def recover_batches() -> int:
+    """Startup: resume every batch whose manifest says it was still running."""
+    resumed = 0
+    if not os.path.isdir(BATCH_DIR):
+        return 0
+    for batch_id in sorted(os.listdir(BATCH_DIR)):
+        manifest = load_manifest(batch_id)
+        if not manifest or manifest.get("status") != "running":
+            continue
+        try:
+            _launch(manifest, resumed=True)
+            resumed += 1
+        except BatchBusy:
+            pass  # another worker picked it up
+        except Exception as e:
+            print(f"⚠️ Could not resume batch {batch_id}: {e}")
+    return resumed
+
+
+def _status(manifest: dict) -> dict:
+    return {
+        "batch_id": manifest["batch_id"],
+        "status": manifest.get("status"),
+        **_counts(manifest),
+        "created_at": manifest.get("created_at"),
+        "finished_at": manifest.get("finished_at"),
+        "report_path": manifest.get("report_path"),
+        "files": [
+            {k: f.get(k) for k in ("name", "state", "attempts", "error", "file_id", "result", "osint_degraded")}
+            for f in manifest["files"]
+        ],
+    }
+
+
+def job_status(batch_id: str) -> Optional[dict]:
+    run = _runs.get(batch_id)
+    if run:
+        with run.lock:
+            return _status(run.manifest)
+    manifest = load_manifest(batch_id)
+    return _status(manifest) if manifest else None
+
+
+def completion(batch_id: str) -> Optional[dict]:
+    """A batch_complete payload rebuilt from the manifest once the batch has finished, else None."""
+    if batch_id in _runs:
+        return None
+    manifest = load_manifest(batch_id)
+    if not manifest or manifest.get("status") not in ("complete", "failed"):
+        return None
+    return {
+        **_counts(manifest),
+        "status": manifest["status"],
+        "summary": manifest.get("summary"),
+        "report_path": manifest.get("report_path"),
+        "report_error": manifest.get("report_error"),
+        "enrichment": manifest.get("enrichment"),
+        "elapsed_sec": round((manifest.get("finished_at") or manifest["created_at"]) - manifest["created_at"], 2),
+        "from_manifest": True,
+    }
@@ -0,0 +1,151 @@
+"""
+🧱 Content-Addressed Evidence Store
+Evidence bytes are stored once, under their SHA-256 (app/data/blobs/ab/cd/<sha>),
+hashed while they stream in so nothing is re-read after upload. A file_id is a
+reference to a blob: uploads/<file_id> and batches/<id>/<name> are hard links,
+so re-submitted evidence costs no extra disk and batches never copy bytes.
+Blobs are read-only once written.
+"""
+
+import os
+import json
+import errno
+import shutil
+import hashlib
+import tempfile
+from typing import Optional
+
+BLOB_DIR = os.getenv("BLOB_DIR", "app/data/blobs")
+UPLOAD_DIR = "app/data/uploads"
+META_DIR = "app/data/metadata"
+CHUNK_SIZE = 1024 * 1024
+
+_TMP_DIR = os.path.join(BLOB_DIR, ".tmp")
+os.makedirs(_TMP_DIR, exist_ok=True)
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+# -------------------------------------------------------
+# ✍️ Streaming Writer
+# -------------------------------------------------------
+class BlobWriter:
+    """Write chunks as they arrive; `commit()` files the blob under its hash (or drops it if already stored)."""
+
+    def __init__(self):
+        fd, self._tmp = tempfile.mkstemp(dir=_TMP_DIR)
+        self._file = os.fdopen(fd, "wb")
+        self._sha = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._sha.update(chunk)
+        self.size += len(chunk)
+
+    def commit(self) -> dict:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        return adopt(self._tmp, self._sha.hexdigest(), self.size)
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self._tmp):
+            os.unlink(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.abort()
+
+
+def _copy_in(path: str) -> str:
+    """Durable copy of `path` inside the blob store's filesystem (for sources on another device)."""
+    fd, tmp = tempfile.mkstemp(dir=_TMP_DIR)
+    try:
+        with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            dst.flush()
+            os.fsync(dst.fileno())
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def adopt(path: str, sha256: str, size: int) -> dict:
+    """
+    File an already-hashed, durable file under its hash. The file is moved (or dropped if the
+    blob exists); if anything else goes wrong it is left in place for the caller.
+    """
+    dest = blob_path(sha256)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    source = path
+    try:
+        os.link(source, dest)  # fails if the blob exists: never replaces stored evidence
+    except FileExistsError:
+        os.unlink(path)
+        return {"sha256": sha256, "size": size, "path": dest, "deduplicated": True}
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # BLOB_DIR is on another filesystem: copy across, then link the copy.
+        source = _copy_in(path)
+        try:
+            os.link(source, dest)
+        except FileExistsError:
+            os.unlink(source)
+            os.unlink(path)
+            return {"sha256": sha256, "size": size, "path": dest, "deduplicated": True}
+        except BaseException:
+            os.unlink(source)
+            raise
+        os.unlink(source)
+    os.chmod(dest, 0o444)
+    os.unlink(path)
+    return {"sha256": sha256, "size": size, "path": dest, "deduplicated": False}
+
+
+def put_stream(fileobj) -> dict:
+    """Store everything readable from a binary file object."""
+    with BlobWriter() as writer:
+        while chunk := fileobj.read(CHUNK_SIZE):
+            writer.write(chunk)
+        return writer.commit()
+
+
+# -------------------------------------------------------
+# 🔗 References
+# -------------------------------------------------------
+def link(sha256: str, dest: str) -> str:
+    """Point `dest` at a stored blob (hard link; symlink where hard links aren't available)."""
+    source = blob_path(sha256)
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    if os.path.lexists(dest):
+        os.unlink(dest)
+    try:
+        os.link(source, dest)
+    except OSError:
+        os.symlink(os.path.abspath(source), dest)
+    return dest
+
+
+def evidence_path(file_id: str) -> Optional[str]:
+    """Readable path for an uploaded file_id, re-linking it from the blob store if the reference is gone."""
+    path = os.path.join(UPLOAD_DIR, os.path.basename(file_id))
+    if os.path.exists(path):
+        return path
+    try:
+        with open(os.path.join(META_DIR, f"{os.path.basename(file_id)}.json"), "r", encoding="utf-8") as f:
+            sha256 = json.load(f).get("sha256")
+    except (FileNotFoundError, ValueError):
+        return None
+    if not sha256 or not os.path.exists(blob_path(sha256)):
+        return None
+    return link(sha256, path)
@@ -0,0 +1,261 @@
+"""
+🔗 Incremental Scam Clustering
+Persistent disjoint-set over cases: each new case is merged into the clusters
+of any earlier case that shares a (non-stop) canonical entity key with it, as it is indexed.
+
+Sets are kept flat (every case points straight at its root) and merged
+smaller-into-larger, so `find` is a single lookup and each case is relabelled
+at most O(log n) times over the life of the store.
+"""
+
+from typing import List, Optional
+
+from app.pipelines.entity_canonical import entity_keys, key_value, FREEMAIL_DOMAINS
+from app.services.intel_store import get_intel_db, ensure_schema, create_schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS case_entities (
+    file_id     TEXT NOT NULL,
+    entity_key  TEXT NOT NULL,
+    linkable    INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (file_id, entity_key)
+);
+CREATE INDEX IF NOT EXISTS idx_case_entities_key ON case_entities(entity_key);
+
+CREATE TABLE IF NOT EXISTS cluster_membership (
+    file_id  TEXT PRIMARY KEY,
+    root     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cluster_membership_root ON cluster_membership(root);
+
+CREATE TABLE IF NOT EXISTS clusters (
+    root         TEXT PRIMARY KEY,
+    cluster_id   TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    created_seq  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clusters_size ON clusters(size);
+CREATE INDEX IF NOT EXISTS idx_clusters_cluster_id ON clusters(cluster_id);
+
+CREATE TABLE IF NOT EXISTS cluster_entities (
+    root        TEXT NOT NULL,
+    entity_key  TEXT NOT NULL,
+    case_count  INTEGER NOT NULL,
+    PRIMARY KEY (root, entity_key)
+);
+"""
+ensure_schema("case_clusters", SCHEMA)
+
+# Low-information NER / regex types that would chain unrelated cases together.
+STOP_ENTITY_TYPES = {"DATE", "MONEY", "CARDINAL", "qr_placeholder"}
+
+# Generic values that show up in almost every scam message.
+STOP_ENTITY_VALUES = {
+    "bank", "upi", "otp", "kyc", "paytm", "google", "whatsapp", "india",
+    "today", "customer", "support", "account", "rbi", "sbi",
+}
+
+# A shared mailbox name alone ("support", "info") is not evidence of a common operator.
+STOP_KEY_PREFIXES = ("email_local:",)
+
+MIN_ENTITY_LENGTH = 3
+
+
+# -------------------------------------------------------
+# 🧹 Entity Keys
+# -------------------------------------------------------
+def is_linkable(entity: dict, key: str) -> bool:
+    """Whether a canonical key is informative enough to merge clusters on."""
+    if entity.get("type") in STOP_ENTITY_TYPES or key.startswith(STOP_KEY_PREFIXES):
+        return False
+    value = key_value(key)
+    if key.startswith("domain:") and value in FREEMAIL_DOMAINS:
+        return False
+    return len(value) >= MIN_ENTITY_LENGTH and value not in STOP_ENTITY_VALUES
+
+
+def case_entity_keys(case: dict) -> List[tuple]:
+    """[(canonical_key, linkable)] for a case, deduplicated in first-seen order."""
+    keys = {}
+    for ent in case.get("entities", []):
+        for key in entity_keys(ent):
+            keys[key] = keys.get(key, False) or is_linkable(ent, key)
+    return list(keys.items())
+
+
+# -------------------------------------------------------
+# 🧩 Disjoint-Set Operations
+# -------------------------------------------------------
+def _find(conn, file_id: str) -> Optional[str]:
+    row = conn.execute("SELECT root FROM cluster_membership WHERE file_id = ?", (file_id,)).fetchone()
+    return row["root"] if row else None
+
+
+def _union(conn, a: str, b: str) -> Optional[dict]:
+    """Merge the sets holding a and b. Returns merge details, or None if already joined."""
+    ra, rb = _find(conn, a), _find(conn, b)
+    if ra is None or rb is None or ra == rb:
+        return None
+
+    ca = conn.execute("SELECT * FROM clusters WHERE root = ?", (ra,)).fetchone()
+    cb = conn.execute("SELECT * FROM clusters WHERE root = ?", (rb,)).fetchone()
+    big, small = (ca, cb) if ca["size"] >= cb["size"] else (cb, ca)
+    # The older cluster's id survives so ids handed to analysts stay valid.
+    elder = ca if ca["created_seq"] <= cb["created_seq"] else cb
+
+    conn.execute("UPDATE cluster_membership SET root = ? WHERE root = ?", (big["root"], small["root"]))
+    conn.execute(
+        """
+        INSERT INTO cluster_entities (root, entity_key, case_count)
+        SELECT ?, entity_key, case_count FROM cluster_entities WHERE root = ?
+        ON CONFLICT(root, entity_key) DO UPDATE SET case_count = case_count + excluded.case_count
+        """,
+        (big["root"], small["root"]),
+    )
+    conn.execute("DELETE FROM cluster_entities WHERE root = ?", (small["root"],))
+    conn.execute(
+        "UPDATE clusters SET size = ?, cluster_id = ?, created_seq = ? WHERE root = ?",
+        (big["size"] + small["size"], elder["cluster_id"], elder["created_seq"], big["root"]),
+    )
+    conn.execute("DELETE FROM clusters WHERE root = ?", (small["root"],))
+
+    return {
+        "cluster_id": elder["cluster_id"],
+        "absorbed_cluster_id": (cb if elder is ca else ca)["cluster_id"],
+        "size": big["size"] + small["size"],
+    }
+
+
+# -------------------------------------------------------
+# ✍️ Indexing
+# -------------------------------------------------------
+def index_case(conn, seq: int, case: dict) -> List[dict]:
+    """Add a case to the disjoint-set and merge it with cases sharing its entities."""
+    file_id = case["file_id"]
+    conn.execute("INSERT OR IGNORE INTO cluster_membership (file_id, root) VALUES (?, ?)", (file_id, file_id))
+    conn.execute(
+        "INSERT OR IGNORE INTO clusters (root, cluster_id, size, created_seq) VALUES (?, ?, 1, ?)",
+        (file_id, f"CL-{seq:06d}", seq),
+    )
+
+    merges = []
+    for key, linkable in case_entity_keys(case):
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO case_entities (file_id, entity_key, linkable) VALUES (?, ?, ?)",
+            (file_id, key, int(linkable)),
+        )
+        if cur.rowcount == 0 or not linkable:
+            continue  # already indexed for this case (re-analysis), or a stop entity
+
+        conn.execute(
+            """
+            INSERT INTO cluster_entities (root, entity_key, case_count) VALUES (?, ?, 1)
+            ON CONFLICT(root, entity_key) DO UPDATE SET case_count = case_count + 1
+            """,
+            (_find(conn, file_id), key),
+        )
+
+        # One earlier holder is enough: everything sharing the key is already in its set.
+        anchor = conn.execute(
+            "SELECT file_id FROM case_entities WHERE entity_key = ? AND file_id != ? AND linkable = 1 LIMIT 1",
+            (key, file_id),
+        ).fetchone()
+        if anchor:
+            merged = _union(conn, file_id, anchor["file_id"])
+            if merged:
+                merges.append({**merged, "via": key})
+    return merges
+
+
+def link_cases(conn, a: str, b: str, via: str) -> Optional[dict]:
+    """Merge two indexed cases' clusters on evidence other than a shared entity."""
+    merged = _union(conn, a, b)
+    return {**merged, "via": via} if merged else None
+
+
+def reset(conn):
+    """Drop and recreate the clustering tables (used when the index layout changes)."""
+    for table in ("case_entities", "cluster_membership", "clusters", "cluster_entities"):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    create_schema(conn, SCHEMA)
+
+
+# -------------------------------------------------------
+# 📋 Queries
+# -------------------------------------------------------
+def _describe(conn, row, shared_limit: int) -> dict:
+    members = [r["file_id"] for r in conn.execute(
+        "SELECT file_id FROM cluster_membership WHERE root = ?", (row["root"],)
+    )]
+    shared = conn.execute(
+        """
+        SELECT entity_key, case_count FROM cluster_entities
+        WHERE root = ? AND case_count > 1
+        ORDER BY case_count DESC LIMIT ?
+        """,
+        (row["root"], shared_limit),
+    ).fetchall()
+    return {
+        "cluster_id": row["cluster_id"],
+        "size": row["size"],
+        "cases": members,
+        "shared_entities": [{"entity": s["entity_key"], "cases": s["case_count"]} for s in shared],
+    }
+
+
+def list_clusters(min_size: int = 2, limit: int = 50, offset: int = 0, shared_limit: int = 10) -> dict:
+    """Clusters ordered by size; cost is proportional to the page returned."""
+    with get_intel_db() as conn:
+        total = conn.execute("SELECT COUNT(*) AS n FROM clusters WHERE size >= ?", (min_size,)).fetchone()["n"]
+        rows = conn.execute(
+            """
+            SELECT * FROM clusters WHERE size >= ?
+            ORDER BY size DESC, created_seq ASC LIMIT ? OFFSET ?
+            """,
+            (min_size, limit, offset),
+        ).fetchall()
+        clusters = [_describe(conn, r, shared_limit) for r in rows]
+    return {"total_clusters": total, "clusters": clusters}
+
+
+def get_cluster(cluster_id: str, shared_limit: int = 25) -> Optional[dict]:
+    with get_intel_db() as conn:
+        row = conn.execute("SELECT * FROM clusters WHERE cluster_id = ?", (cluster_id,)).fetchone()
+        return _describe(conn, row, shared_limit) if row else None
+
+
+def cluster_of(file_id: str) -> Optional[str]:
+    """Cluster id a case currently belongs to."""
+    with get_intel_db() as conn:
+        row = conn.execute(
+            "SELECT c.cluster_id FROM cluster_membership m JOIN clusters c ON c.root = m.root WHERE m.file_id = ?",
+            (file_id,),
+        ).fetchone()
+    return row["cluster_id"] if row else None
+
+
+def find_cases_by_entity(keys: List[str], contains: Optional[str] = None) -> List[dict]:
+    """Cases holding any of the canonical keys (or, if given, a key containing `contains`)."""
+    with get_intel_db() as conn:
+        if keys:
+            marks = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"""
+                SELECT DISTINCT c.file_id, c.category, c.risk_score, c.analyzed_at
+                FROM case_entities e JOIN cases c ON c.file_id = e.file_id
+                WHERE e.entity_key IN ({marks})
+                """,
+                keys,
+            ).fetchall()
+            if rows or not contains:
+                return [dict(r) for r in rows]
+        rows = conn.execute(
+            """
+            SELECT DISTINCT c.file_id, c.category, c.risk_score, c.analyzed_at
+            FROM case_entities e JOIN cases c ON c.file_id = e.file_id
+            WHERE instr(e.entity_key, ?) > 0
+            """,
+            (contains,),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
@@ -0,0 +1,284 @@
+"""
+💾 Case Store
+Single write path for analysis results: appends to the knowledge store, writes
+the JSON cache used by reports, and keeps the threat-hub indexes in step as
+each analysis completes.
+"""
+
+import os
+import json
+from datetime import datetime
+
+from app.services.intel_store import get_intel_db, ensure_schema
+from app.services import search_index, case_clusters, near_duplicates, entity_counters, alerts, event_bus, entity_reputation
+from app.services import knowledge_store
+
+CACHE_DIR = "app/data/analysis_cache"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Bump whenever an index is added or its keys change: startup then rebuilds all indexes.
+INDEX_VERSION = 9
+
+# Event-bus channel for live threat-hub updates (case summaries, counter deltas, merges).
+INTEL_CHANNEL = "intel"
+
+ensure_schema("cases", """
+CREATE TABLE IF NOT EXISTS cases (
+    seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_id      TEXT UNIQUE NOT NULL,
+    category     TEXT,
+    risk_score   REAL,
+    risk_level   TEXT,
+    analyzed_at  TEXT,
+    analyzed_ts  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_cases_analyzed_ts ON cases(analyzed_ts);
+CREATE INDEX IF NOT EXISTS idx_cases_category ON cases(category);
+
+CREATE TABLE IF NOT EXISTS intel_meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+
+-- Knowledge-store records indexed past a gap in knowledge_lsn (another worker's
+-- write still in flight, or a failed index); drained as the watermark catches up.
+CREATE TABLE IF NOT EXISTS indexed_lsns (
+    lsn  INTEGER PRIMARY KEY
+);
+""")
+
+
+def parse_timestamp(value) -> float:
+    """Epoch seconds for the timestamp formats used across the pipelines (0.0 if unparseable)."""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def case_summary(case: dict) -> dict:
+    """Flattened summary shape used by the dashboard case list."""
+    return {
+        "file_id": case.get("file_id"),
+        "scam_class": {
+            "category": case.get("scam_class", {}).get("category", "Unknown")
+        },
+        "risk": {
+            "score": case.get("risk", {}).get("score", 0.0),
+            "risk_level": case.get("risk", {}).get("risk_level", "N/A")
+        },
+        "analyzed_at": case.get("analyzed_at"),
+    }
+
+
+def _upsert_case_row(conn, case: dict) -> int:
+    summary = case_summary(case)
+    params = (
+        summary["scam_class"]["category"],
+        summary["risk"]["score"],
+        summary["risk"]["risk_level"],
+        summary["analyzed_at"],
+        parse_timestamp(summary["analyzed_at"]),
+        summary["file_id"],
+    )
+    row = conn.execute("SELECT seq FROM cases WHERE file_id = ?", (summary["file_id"],)).fetchone()
+    if row:
+        conn.execute(
+            "UPDATE cases SET category=?, risk_score=?, risk_level=?, analyzed_at=?, analyzed_ts=? WHERE file_id=?",
+            params,
+        )
+        return row["seq"]
+    cur = conn.execute(
+        "INSERT INTO cases (category, risk_score, risk_level, analyzed_at, analyzed_ts, file_id) VALUES (?, ?, ?, ?, ?, ?)",
+        params,
+    )
+    return cur.lastrowid
+
+
+def _publish_intel(conn, seq: int, case: dict, new_keys: list, merges: list):
+    """Push what this write changed so dashboards apply deltas instead of re-querying."""
+    event_bus.publish(conn, INTEL_CHANNEL, "case_summary", {
+        **case_summary(case),
+        "seq": seq,
+        "cluster_id": case_clusters.cluster_of(case["file_id"]),
+    })
+    if new_keys:
+        # Absolute values, so a client that sees an event twice (snapshot overlap) stays correct.
+        event_bus.publish(conn, INTEL_CHANNEL, "entity_delta", {
+            "file_id": case["file_id"],
+            "entities": entity_counters.entity_stats(conn, new_keys),
+        })
+    for merge in merges:
+        event_bus.publish(conn, INTEL_CHANNEL, "cluster_merge", merge)
+
+
+def _advance_knowledge_lsn(conn, lsn: int):
+    """Move knowledge_lsn over every contiguously indexed record, so a restart replays only the gaps."""
+    conn.execute("INSERT OR IGNORE INTO indexed_lsns (lsn) VALUES (?)", (lsn,))
+    mark = int(_get_meta(conn, "knowledge_lsn") or -1)
+    start = mark
+    while conn.execute("DELETE FROM indexed_lsns WHERE lsn = ?", (mark + 1,)).rowcount:
+        mark += 1
+    if mark != start:
+        _set_meta(conn, "knowledge_lsn", mark)
+
+
+def index_case(case: dict, live: bool = True, lsn: int = None) -> dict:
+    """
+    Register a case in the intel store and update every incremental index.
+    `live=False` (backfill) skips alerting and live events so a rebuild doesn't replay old campaigns.
+    `lsn` is the case's knowledge-store record; indexing it advances the replay watermark.
+    """
+    fired = []
+    with get_intel_db() as conn:
+        seq = _upsert_case_row(conn, case)
+        search_index.index_case(conn, seq, case)
+        entity_keys = case_clusters.case_entity_keys(case)
+        risk = case.get("risk", {}).get("score", 0.0) or 0.0
+        ts = parse_timestamp(case.get("analyzed_at")) or None
+        new_keys = entity_counters.index_case(
+            conn, seq, case, keys=[key for key, _ in entity_keys], risk=risk, ts=ts,
+        )
+        # Cascade (tiered) verdicts are heuristic scores that already read the ledger; they
+        # stay out of it so a full re-analysis of the case is what gets learned.
+        if not case.get("tiered"):
+            linkable = [key for key, is_linkable in entity_keys if is_linkable]
+            entity_reputation.index_case(
+                conn, linkable, risk=risk,
+                category=case_summary(case)["scam_class"]["category"], ts=ts, file_id=case["file_id"],
+            )
+        if live:
+            fired = alerts.evaluate(conn, case, new_keys)
+        merges = case_clusters.index_case(conn, seq, case)
+        duplicates = near_duplicates.index_case(conn, seq, case)
+        if near_duplicates.FOLD_INTO_CLUSTERS:
+            for dup in duplicates:
+                merged = case_clusters.link_cases(conn, case["file_id"], dup["file_id"], via="near_duplicate_text")
+                if merged:
+                    merges.append(merged)
+        if live:
+            _publish_intel(conn, seq, case, new_keys, merges)
+        if lsn is not None:
+            _advance_knowledge_lsn(conn, lsn)
+    return {"seq": seq, "cluster_merges": merges, "near_duplicates": duplicates, "alerts": fired}
+
+
+def _write_cache(case: dict) -> str:
+    cache_path = os.path.join(CACHE_DIR, f"{case['file_id']}.json")
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(case, f, indent=2, ensure_ascii=False)
+    return cache_path
+
+
+def _index_saved(case: dict, lsn: int, live: bool):
+    try:
+        index_case(case, live=live, lsn=lsn)
+    except Exception as e:
+        # The knowledge store is the source of truth; indexes catch up on the next sync.
+        print(f"⚠️ Indexing failed for {case.get('file_id')}: {e}")
+
+
+def save_case(case: dict) -> str:
+    """
+    Persist an analysis result: append it to the knowledge store (durable log),
+    write the JSON cache used by reports, and index it. Returns the cache path.
+    """
+    lsn = knowledge_store.append(case)
+    cache_path = _write_cache(case)
+    _index_saved(case, lsn, live=True)
+    return cache_path
+
+
+def save_cases(cases: list, live: bool = True) -> int:
+    """save_case for many results, with one knowledge-store append for the lot. Returns the count."""
+    for case, lsn in zip(cases, knowledge_store.append_many(cases)):
+        _write_cache(case)
+        _index_saved(case, lsn, live=live)
+    return len(cases)
+
+
+def load_case(file_id: str):
+    """Load one cached case, or None if it has not been analyzed."""
+    cache_path = os.path.join(CACHE_DIR, f"{file_id}.json")
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _reset_indexes(conn):
+    if not conn.in_transaction:
+        conn.execute("BEGIN")  # sqlite3 opens none before DDL; the drops must roll back together
+    search_index.reset(conn)
+    case_clusters.reset(conn)
+    near_duplicates.reset(conn)
+    entity_counters.reset(conn)
+    entity_reputation.reset(conn)
+
+
+def _get_meta(conn, key: str):
+    row = conn.execute("SELECT value FROM intel_meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def _set_meta(conn, key: str, value):
+    conn.execute(
+        "INSERT INTO intel_meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, str(value)),
+    )
+
+
+def _seed_knowledge_store() -> int:
+    """One-time migration of cases analyzed before the knowledge store existed."""
+    seeded = 0
+    for file in sorted(os.listdir(CACHE_DIR)):
+        if not file.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(CACHE_DIR, file), "r", encoding="utf-8") as f:
+                case = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Skipping {file}: {e}")
+            continue
+        if case.get("file_id"):
+            knowledge_store.append(case)
+            seeded += 1
+    return seeded
+
+
+def sync_case_indexes() -> int:
+    """
+    Replay the knowledge store into the intel indexes (startup). Only records
+    written since the last sync are replayed; if the index layout changed, every
+    index is rebuilt from the whole log.
+    """
+    if knowledge_store.is_empty():
+        seeded = _seed_knowledge_store()
+        if seeded:
+            print(f"📚 Seeded knowledge store with {seeded} cached cases")
+
+    with get_intel_db() as conn:
+        if _get_meta(conn, "index_version") != str(INDEX_VERSION):
+            print(f"🔁 Rebuilding intel indexes (layout v{INDEX_VERSION})")
+            _reset_indexes(conn)
+            from_lsn = 0
+        else:
+            from_lsn = int(_get_meta(conn, "knowledge_lsn") or -1) + 1
+
+    added, last_lsn = 0, from_lsn - 1
+    for lsn, case in knowledge_store.latest_cases(from_lsn):
+        try:
+            index_case(case, live=False)
+            added += 1
+        except Exception as e:
+            print(f"⚠️ Skipping {case.get('file_id')}: {e}")
+        last_lsn = lsn
+
+    with get_intel_db() as conn:
+        _set_meta(conn, "index_version", INDEX_VERSION)
+        if last_lsn >= 0:
+            _set_meta(conn, "knowledge_lsn", last_lsn)
+            conn.execute("DELETE FROM indexed_lsns WHERE lsn <= ?", (last_lsn,))
+    return added
@@ -0,0 +1,302 @@
+"""
+🧮 Columnar Case Table
+Compact in-memory copy of every case summary, one NumPy array per column, so
+threat-hub filters and aggregations run as vectorized scans instead of walking
+nested case dicts:
+
+  category     int8    (dictionary-encoded)
+  risk         float32
+  analyzed_at  int64   (epoch seconds, 0 if unknown)
+  entities     CSR     (indptr int64 + dictionary-encoded entity ids int32)
+
+Loaded once from the intel store, then kept current by tailing new `cases`
+rows and the "intel" event channel for re-analysed ones. Rows are append-only:
+a re-analysed case tombstones its old row and appends a new one.
+"""
+
+import json
+import threading
+from typing import List, Optional
+
+import numpy as np
+from scipy import sparse
+
+from app.services.intel_store import get_intel_db
+from app.services.case_store import INTEL_CHANNEL
+
+MAX_CATEGORIES = 127  # int8 codes; anything beyond folds into "Other"
+
+
+class _Column:
+    """Growable 1-D array (amortized O(1) append)."""
+
+    def __init__(self, dtype):
+        self.data = np.zeros(1024, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self.data.dtype)
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.zeros(max(needed, 2 * len(self.data)), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size:needed] = values
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class CaseTable:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = 0  # bumped on every change, for derived caches
+        self.generation = -1  # bumped on every reload from scratch (row and entity ids restart)
+        self._clear()
+
+    def _clear(self):
+        self.generation += 1
+        self.file_ids: List[str] = []
+        self.row_of = {}  # file_id -> live row
+        self.categories: List[str] = []
+        self.category_codes = {}
+        self.entity_keys: List[str] = []
+        self.entity_ids = {}
+        self.entity_linkable = _Column(np.bool_)
+
+        self.category = _Column(np.int8)
+        self.risk = _Column(np.float32)
+        self.analyzed_at = _Column(np.int64)
+        self.alive = _Column(np.bool_)
+        self.indptr = _Column(np.int64)
+        self.indptr.extend([0])
+        self.indices = _Column(np.int32)
+
+        self.max_seq = 0
+        self.last_event_id = 0
+
+    # ---------------------------------------------------
+    # ✍️ Loading & Tailing
+    # ---------------------------------------------------
+    def _category_code(self, category: Optional[str]) -> int:
+        category = category or "Unknown"
+        if category not in self.category_codes and len(self.categories) >= MAX_CATEGORIES - 1:
+            category = "Other"
+        code = self.category_codes.get(category)
+        if code is None:
+            code = len(self.categories)
+            self.categories.append(category)
+            self.category_codes[category] = code
+        return code
+
+    def _entity_id(self, key: str, linkable: bool) -> int:
+        eid = self.entity_ids.get(key)
+        if eid is None:
+            eid = len(self.entity_keys)
+            self.entity_keys.append(key)
+            self.entity_ids[key] = eid
+            self.entity_linkable.extend([linkable])
+        elif linkable:
+            self.entity_linkable.data[eid] = True
+        return eid
+
+    def _append(self, rows, entities_by_file: dict):
+        if not rows:
+            return
+        codes, risks, stamps, ends, ids = [], [], [], [], []
+        end = int(self.indptr.view()[-1])
+        for r in rows:
+            old = self.row_of.get(r["file_id"])
+            if old is not None:
+                self.alive.data[old] = False
+            self.row_of[r["file_id"]] = len(self.file_ids)
+            self.file_ids.append(r["file_id"])
+            codes.append(self._category_code(r["category"]))
+            risks.append(r["risk_score"] or 0.0)
+            stamps.append(int(r["analyzed_ts"] or 0))
+            case_ids = [self._entity_id(k, linkable) for k, linkable in entities_by_file.get(r["file_id"], ())]
+            ids.extend(case_ids)
+            end += len(case_ids)
+            ends.append(end)
+
+        self.category.extend(codes)
+        self.risk.extend(risks)
+        self.analyzed_at.extend(stamps)
+        self.alive.extend(np.ones(len(rows), dtype=bool))
+        self.indices.extend(ids)
+        self.indptr.extend(ends)
+        self.version += 1
+
+    def _load_rows(self, conn, where: str, params: tuple):
+        """`where` filters the `cases` table aliased as c."""
+        rows = conn.execute(
+            f"SELECT c.seq, c.file_id, c.category, c.risk_score, c.analyzed_ts FROM cases c WHERE {where} ORDER BY c.seq",
+            params,
+        ).fetchall()
+        entities = {}
+        for e in conn.execute(
+            f"SELECT e.file_id, e.entity_key, e.linkable FROM case_entities e JOIN cases c ON c.file_id = e.file_id WHERE {where}",
+            params,
+        ):
+            entities.setdefault(e["file_id"], []).append((e["entity_key"], bool(e["linkable"])))
+        self._append(rows, entities)
+        if rows:
+            self.max_seq = max(self.max_seq, max(r["seq"] for r in rows))
+
+    def refresh(self):
+        """Pull in cases written since the last call (any worker process). Cheap when nothing changed."""
+        with self._lock, get_intel_db() as conn:
+            oldest = conn.execute("SELECT MIN(id) AS lo, MAX(id) AS hi FROM events").fetchone()
+            if self.last_event_id and oldest["lo"] and oldest["lo"] > self.last_event_id + 1:
+                self._clear()  # event log pruned past our cursor: updates may be lost, reload
+                self.version += 1
+
+            if not self.file_ids:
+                self.last_event_id = oldest["hi"] or 0
+                self._load_rows(conn, "c.seq > ?", (0,))
+                return
+
+            # Re-analysed cases keep their seq, so they surface through the event log.
+            updated, rescored = set(), False
+            for ev in conn.execute(
+                "SELECT id, type, payload FROM events WHERE id > ? AND channel = ? "
+                "AND type IN ('case_summary', 'cases_rescored') ORDER BY id",
+                (self.last_event_id, INTEL_CHANNEL),
+            ):
+                self.last_event_id = ev["id"]
+                if ev["type"] == "cases_rescored":
+                    rescored = True  # corpus-wide score rewrite: cheaper to reload than to patch
+                    continue
+                payload = json.loads(ev["payload"])
+                if payload.get("seq", 0) <= self.max_seq:
+                    updated.add(payload["file_id"])
+            self.last_event_id = max(self.last_event_id, oldest["hi"] or 0)
+
+            if rescored:
+                last_event_id = self.last_event_id
+                self._clear()
+                self.version += 1
+                self.last_event_id = last_event_id
+                self._load_rows(conn, "c.seq > ?", (0,))
+                return
+
+            for file_id in updated:
+                self._load_rows(conn, "c.file_id = ?", (file_id,))
+            self._load_rows(conn, "c.seq > ?", (self.max_seq,))
+
+    # ---------------------------------------------------
+    # 🔍 Vectorized Queries
+    # ---------------------------------------------------
+    def mask(
+        self,
+        category: Optional[str] = None,
+        min_risk: Optional[float] = None,
+        max_risk: Optional[float] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> np.ndarray:
+        m = self.alive.view().copy()
+        if category is not None:
+            code = next((c for name, c in self.category_codes.items() if name.lower() == category.lower()), None)
+            if code is None:
+                return np.zeros_like(m)
+            m &= self.category.view() == code
+        if min_risk is not None:
+            m &= self.risk.view() >= min_risk
+        if max_risk is not None:
+            m &= self.risk.view() <= max_risk
+        if since is not None:
+            m &= self.analyzed_at.view() >= since
+        if until is not None:
+            m &= self.analyzed_at.view() <= until
+        return m
+
+    def filter(self, limit: int = 100, **filters) -> dict:
+        self.refresh()
+        with self._lock:
+            return self._filter(limit, self.mask(**filters))
+
+    def _filter(self, limit: int, m: np.ndarray) -> dict:
+        rows = np.flatnonzero(m)
+        # Newest first, then highest risk.
+        order = np.lexsort((-self.risk.view()[rows], -self.analyzed_at.view()[rows]))[:limit]
+        return {
+            "count": int(rows.size),
+            "cases": [
+                {
+                    "file_id": self.file_ids[r],
+                    "category": self.categories[self.category.data[r]],
+                    "risk_score": round(float(self.risk.data[r]), 4),
+                    "analyzed_ts": int(self.analyzed_at.data[r]),
+                }
+                for r in rows[order]
+            ],
+        }
+
+    def aggregate(self, by: str = "category", limit: int = 20, min_cases: int = 1, **filters) -> dict:
+        """Case count and average risk per category or per entity over the filtered rows."""
+        self.refresh()
+        with self._lock:
+            return self._aggregate(by, limit, min_cases, self.mask(**filters))
+
+    def _aggregate(self, by: str, limit: int, min_cases: int, m: np.ndarray) -> dict:
+        risk = self.risk.view().astype(np.float64)
+
+        if by == "category":
+            groups = self.category.view()[m].astype(np.int64)
+            weights = risk[m]
+            names, size = self.categories, len(self.categories)
+        elif by == "entity":
+            # Expand each case's risk across its CSR entity slice.
+            lengths = np.diff(self.indptr.view())
+            groups = self.indices.view()[np.repeat(m, lengths)].astype(np.int64)
+            weights = np.repeat(risk, lengths)[np.repeat(m, lengths)]
+            names, size = self.entity_keys, len(self.entity_keys)
+        else:
+            raise ValueError(f"Unsupported group-by '{by}' (use category or entity)")
+
+        counts = np.bincount(groups, minlength=size)
+        sums = np.bincount(groups, weights=weights, minlength=size)
+        eligible = np.flatnonzero(counts >= max(min_cases, 1))
+        avg = sums[eligible] / counts[eligible]
+        top = eligible[np.lexsort((-avg, -counts[eligible]))][:limit]
+        return {
+            "by": by,
+            "cases": int(m.sum()),
+            "groups": int(eligible.size),
+            "rows": [
+                {"key": names[g], "count": int(counts[g]), "avg_risk": round(float(sums[g] / counts[g]), 4)}
+                for g in top
+            ],
+        }
+
+    def incidence(self):
+        """
+        (case × entity) 0/1 CSR matrix over every row, tombstoned ones included, with the
+        live-row mask, entity keys, linkable flags and generation. Within a generation rows
+        and entity ids only get appended, so derived indexes can fold in just what changed.
+        """
+        with self._lock:
+            indptr, indices = self.indptr.view().copy(), self.indices.view().copy()
+            alive = self.alive.view().copy()
+            keys = list(self.entity_keys)
+            linkable = self.entity_linkable.view().copy()
+            generation = self.generation
+        matrix = sparse.csr_matrix(
+            (np.ones(indices.size, dtype=np.float32), indices, indptr), shape=(alive.size, len(keys))
+        )
+        return matrix, alive, keys, linkable, generation
+
+    def stats(self) -> dict:
+        columns = [self.category, self.risk, self.analyzed_at, self.alive, self.indptr, self.indices]
+        return {
+            "rows": len(self.file_ids),
+            "live_cases": len(self.row_of),
+            "categories": len(self.categories),
+            "entities": len(self.entity_keys),
+            "column_bytes": int(sum(c.view().nbytes for c in columns)),
+        }
+
+
+case_table = CaseTable()
@@ -1,18 +1,694 @@
-from datetime import datetime
-import json
+"""
+🔗 Chain-of-Custody Log
+Tamper-evident, append-only record of every action taken on evidence.
+
+Each entry carries a sequence number, the previous entry's hash and its own
+SHA-256 over (prev_hash + canonical JSON body), so editing, dropping or
+reordering any entry breaks the chain. The first chained entry is anchored on
+the SHA-256 of the legacy (pre-chain) prefix of the file.
+
+Writes are group-committed: `chain_log` enqueues and a background thread
+drains the queue every FSYNC_INTERVAL_MS, appends the batch under an exclusive
+file lock (safe with several uvicorn workers) and fsyncs once per batch.
+Evidence intake and integrity findings (DURABLE_ACTIONS) wait for that fsync
+before chain_log returns; other actions return at once and are durable within
+about one interval. A line torn by a crash mid-write is cut off the log on the
+next write and kept verbatim in TORN_FILE.
+Every CHECKPOINT_EVERY entries a checkpoint (segment, seq, hash, byte offset)
+is recorded, which lets verification resume from the last verified point
+instead of rehashing the whole log.
+
+Segments: LOG_FILE is the active segment. Once it passes SEGMENT_MAX_BYTES it
+is rotated into ARCHIVE_DIR as segment-<base>-<last seq>.jsonl and then
+compressed into independently inflatable blocks (.jz plus a .jzidx block map
+of "raw offset, compressed offset"), so every entry keeps its (segment, raw
+offset) address for life. A segment's id (base) is the seq its first entry
+follows from: 0 for the first segment, previous segment's last seq + 1 after.
+
+Queries go through a sidecar index in the intel store (target, action,
+timestamp → segment and offset), caught up after every group commit.
+"""
+
 import os
+import json
+import time
+import queue
+import zlib
+import base64
+import fcntl
+import atexit
+import bisect
+import hashlib
+import threading
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from app.services.intel_store import get_intel_db, ensure_schema
+
+LOG_FILE = os.getenv("CHAINLOG_FILE", "app/data/chainlog.jsonl")
+CHECKPOINT_FILE = LOG_FILE.replace(".jsonl", ".checkpoints.jsonl")
+VERIFIED_FILE = LOG_FILE.replace(".jsonl", ".verified.json")
+TORN_FILE = LOG_FILE.replace(".jsonl", ".torn.jsonl")
+ARCHIVE_DIR = os.getenv("CHAINLOG_ARCHIVE_DIR", LOG_FILE.replace(".jsonl", "_segments"))
+os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+FSYNC_INTERVAL_MS = int(os.getenv("CHAINLOG_FSYNC_INTERVAL_MS", "200"))
+CHECKPOINT_EVERY = int(os.getenv("CHAINLOG_CHECKPOINT_EVERY", "1000"))
+SEGMENT_MAX_BYTES = int(float(os.getenv("CHAINLOG_SEGMENT_MB", "64")) * 1024 * 1024)
+BLOCK_LINES = 256
+TAIL_READ_BYTES = 64 * 1024
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chainlog_index (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    segment    INTEGER NOT NULL,
+    offset     INTEGER NOT NULL,
+    length     INTEGER NOT NULL,
+    seq        INTEGER,
+    timestamp  TEXT,
+    action     TEXT,
+    target     TEXT,
+    UNIQUE (segment, offset)
+);
+CREATE INDEX IF NOT EXISTS idx_chainlog_target ON chainlog_index(target, id);
+CREATE INDEX IF NOT EXISTS idx_chainlog_action ON chainlog_index(action, id);
+CREATE INDEX IF NOT EXISTS idx_chainlog_time ON chainlog_index(timestamp);
+"""
+ensure_schema("chainlog_index", INDEX_SCHEMA)
+
+
+# -------------------------------------------------------
+# 🧮 Hashing
+# -------------------------------------------------------
+def _canonical(body: dict) -> str:
+    return json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def entry_hash(prev_hash: str, body: dict) -> str:
+    """SHA-256 of the previous hash plus the entry (without its own hash), canonically encoded."""
+    return hashlib.sha256((prev_hash + _canonical(body)).encode("utf-8")).hexdigest()
+
+
+def _lines_before(f, end: int):
+    """Complete lines ending at or before byte `end`, newest first (reads backwards in growing windows)."""
+    window = TAIL_READ_BYTES
+    while True:
+        start = max(0, end - window)
+        f.seek(start)
+        lines = f.read(end - start).splitlines()
+        if start > 0 and len(lines) <= 1:
+            window *= 2  # a single entry larger than the window
+            continue
+        yield from reversed(lines[1:] if start > 0 else lines)
+        if start == 0:
+            return
+        end = start + len(lines[0])  # the partial first line is re-read by the next window
+        window *= 2
+
+
+def _parse(line: bytes) -> Optional[dict]:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+# -------------------------------------------------------
+# 🗂️ Segments
+# -------------------------------------------------------
+def _archive_path(base: int, last: int, ext: str) -> str:
+    return os.path.join(ARCHIVE_DIR, f"segment-{base:012d}-{last:012d}.{ext}")
+
+
+def _archives() -> List[Tuple[int, int, str]]:
+    """[(base, last seq, ext)] of rotated segments, oldest first; ext is "jz" or "jsonl"."""
+    found = {}
+    for name in os.listdir(ARCHIVE_DIR):
+        if name.startswith("segment-") and name.endswith((".jsonl", ".jz")):
+            stem, ext = name[len("segment-"):].split(".", 1)
+            base, last = map(int, stem.split("-"))
+            # Mid-compression both may exist briefly; the compressed one is authoritative.
+            if found.get(base, (0, ""))[1] != "jz":
+                found[base] = (last, ext)
+    return [(base, last, ext) for base, (last, ext) in sorted(found.items())]
+
+
+def _active_base(archives) -> int:
+    return archives[-1][1] + 1 if archives else 0
+
+
+def _block_map(base: int, last: int) -> List[Tuple[int, int]]:
+    """[(raw offset, compressed offset)] per block, plus a final (raw size, compressed size) row."""
+    with open(_archive_path(base, last, "jzidx"), "r", encoding="utf-8") as f:
+        return [tuple(map(int, line.split())) for line in f if line.strip()]
+
+
+def _inflate(base: int, last: int, blocks, i: int) -> bytes:
+    with open(_archive_path(base, last, "jz"), "rb") as f:
+        f.seek(blocks[i][1])
+        return zlib.decompress(f.read(blocks[i + 1][1] - blocks[i][1]))
+
+
+def _iter_raw(f, offset: int, size: int) -> Iterator[Tuple[int, bytes]]:
+    f.seek(offset)
+    for line in f:
+        if offset + len(line) > size or not line.endswith(b"\n"):
+            return  # not committed yet, or torn by a crash (sealed on the next append)
+        yield offset, line
+        offset += len(line)
+
+
+def _iter_archive(base: int, last: int, ext: str, offset: int) -> Iterator[Tuple[int, bytes]]:
+    if ext == "jsonl":
+        try:
+            f = open(_archive_path(base, last, "jsonl"), "rb")
+        except FileNotFoundError:
+            ext = "jz"  # compressed underneath us
+        else:
+            with f:
+                yield from _iter_raw(f, offset, os.fstat(f.fileno()).st_size)
+            return
+    blocks = _block_map(base, last)
+    for i in range(len(blocks) - 1):
+        if blocks[i + 1][0] <= offset:
+            continue
+        pos = blocks[i][0]
+        for line in _inflate(base, last, blocks, i).splitlines(keepends=True):
+            if pos >= offset:
+                yield pos, line
+            pos += len(line)
+
+
+def _iter_log(segment: int = 0, offset: int = 0) -> Iterator[Tuple[int, int, bytes]]:
+    """(segment, offset, line) for every committed line from a position to the current end of the log."""
+    done = set()
+    while True:
+        archives = _archives()
+        for base, last, ext in archives:
+            if base >= segment and base not in done:
+                for pos, line in _iter_archive(base, last, ext, offset if base == segment else 0):
+                    yield base, pos, line
+                done.add(base)
+        active = _active_base(archives)
+        if active < segment:
+            return
+        try:
+            f = open(LOG_FILE, "rb")
+        except FileNotFoundError:
+            if _active_base(_archives()) != active:
+                continue
+            return
+        with f:
+            # Batches are written under an exclusive lock: everything below this size is complete.
+            fcntl.flock(f, fcntl.LOCK_SH)
+            size = os.fstat(f.fileno()).st_size
+            rotated = _active_base(_archives()) != active
+            fcntl.flock(f, fcntl.LOCK_UN)
+            if rotated:
+                continue  # what we opened may already be an archive; read it from there
+            for pos, line in _iter_raw(f, offset if active == segment else 0, size):
+                yield active, pos, line
+        return
+
+
+def _line_ending_at(segment: int, end: int) -> Optional[bytes]:
+    """The log line whose last byte precedes raw offset `end` in a segment."""
+    archive = next((a for a in _archives() if a[0] == segment), None)
+    if archive and archive[2] == "jz":
+        base, last, _ = archive
+        blocks = _block_map(base, last)
+        i = bisect.bisect_left([raw for raw, _ in blocks], end) - 1
+        if i < 0 or i >= len(blocks) - 1:
+            return None
+        lines = _inflate(base, last, blocks, i)[:end - blocks[i][0]].splitlines()
+        return lines[-1] if lines else None
+    path = _archive_path(*archive) if archive else LOG_FILE
+    try:
+        with open(path, "rb") as f:
+            return next(_lines_before(f, end), None)
+    except FileNotFoundError:
+        return _line_ending_at(segment, end) if archive else None
+
+
+def _segment_tail(base: int, last: int, ext: str) -> Tuple[int, str]:
+    """(seq, hash) of a rotated segment's last entry."""
+    if ext == "jz":
+        blocks = _block_map(base, last)
+        entry = _parse(_line_ending_at(base, blocks[-1][0]) or b"")
+    else:
+        with open(_archive_path(base, last, ext), "rb") as f:
+            entry = _parse(next(_lines_before(f, os.fstat(f.fileno()).st_size), b""))
+    return entry["seq"], entry["hash"]
+
+
+def compress_archives() -> int:
+    """Compress rotated raw segments into block-zlib form. Returns the number compressed."""
+    compressed = 0
+    with open(os.path.join(ARCHIVE_DIR, ".compress.lock"), "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0  # another worker is on it
+        for base, last, ext in _archives():
+            if ext != "jsonl":
+                continue
+            tmp_data, tmp_idx = _archive_path(base, last, "jz.tmp"), _archive_path(base, last, "jzidx.tmp")
+            with open(_archive_path(base, last, "jsonl"), "rb") as src, \
+                    open(tmp_data, "wb") as data, open(tmp_idx, "w", encoding="utf-8") as idx:
+                raw = 0
+                while True:
+                    lines = [line for _, line in zip(range(BLOCK_LINES), src)]
+                    if not lines:
+                        break
+                    idx.write(f"{raw} {data.tell()}\n")
+                    chunk = b"".join(lines)
+                    data.write(zlib.compress(chunk, 6))
+                    raw += len(chunk)
+                idx.write(f"{raw} {data.tell()}\n")
+                data.flush()
+                os.fsync(data.fileno())
+            # Block map first, then data: once the .jz is visible its map is already complete.
+            os.replace(tmp_idx, _archive_path(base, last, "jzidx"))
+            os.replace(tmp_data, _archive_path(base, last, "jz"))
+            os.remove(_archive_path(base, last, "jsonl"))
+            compressed += 1
+    return compressed
+
+
+# -------------------------------------------------------
+# ✍️ Group-Commit Writer
+# -------------------------------------------------------
+class ChainLogError(RuntimeError):
+    """Raised when a waited-for entry could not be made durable (write failed or timed out)."""
 
-LOG_FILE = "app/data/chainlog.jsonl"
 
-def chain_log(action: str, actor: str, target: str, sha256: str = None, meta: dict = None):
-    entry = {
+class _Pending:
+    __slots__ = ("entry", "done", "error")
+
+    def __init__(self, entry: dict):
+        self.entry = entry
+        self.done = threading.Event()
+        self.error = None
+
+
+class ChainLogWriter:
+    def __init__(self, path: str = LOG_FILE):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="chainlog-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def submit(self, entry: dict) -> _Pending:
+        pending = _Pending(entry)
+        self._ensure_started()
+        self._queue.put(pending)
+        return pending
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything submitted so far is durable."""
+        marker = _Pending(None)
+        self._ensure_started()
+        self._queue.put(marker)
+        marker.done.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            time.sleep(FSYNC_INTERVAL_MS / 1000)  # let the group fill up
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [p for p in batch if p.entry is not None]
+            rotated = False
+            try:
+                rotated = bool(entries) and self._commit(entries)
+            except Exception as e:
+                print(f"⚠️ Chain log write failed ({len(entries)} entries): {e}")
+                for p in entries:
+                    p.error = e
+            finally:
+                for p in batch:
+                    p.done.set()
+            # Housekeeping after callers are released: compress a rotated segment, extend the index.
+            try:
+                if rotated:
+                    compress_archives()
+                if entries:
+                    sync_index()
+            except Exception as e:
+                print(f"⚠️ Chain log maintenance failed: {e}")
+
+    def _open_locked(self):
+        """The active segment, exclusively locked (retrying if another worker rotated it meanwhile)."""
+        while True:
+            f = open(self.path, "ab+")
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def _cut_torn_line(self, f, size: int) -> int:
+        """Truncate a partial final line (crash mid-append), quarantining its bytes. Returns the new size."""
+        end = size
+        while end > 0:
+            start = max(0, end - TAIL_READ_BYTES)
+            f.seek(start)
+            cut = f.read(end - start).rfind(b"\n")
+            if cut >= 0:
+                end = start + cut + 1
+                break
+            end = start
+        f.seek(end)
+        torn = f.read(size - end)
+        with open(TORN_FILE, "a", encoding="utf-8") as q:
+            q.write(json.dumps({
+                "quarantined_at": datetime.utcnow().isoformat(),
+                "segment": _active_base(_archives()),
+                "offset": end,
+                "length": len(torn),
+                "data_b64": base64.b64encode(torn).decode("ascii"),
+            }) + "\n")
+            q.flush()
+            os.fsync(q.fileno())
+        f.truncate(end)
+        os.fsync(f.fileno())
+        print(f"⚠️ Chain log: cut a torn {len(torn)}-byte final line at offset {end} (kept in {TORN_FILE})")
+        return end
+
+    def _tail(self, f, archives) -> tuple:
+        """(last seq, last hash) of the chained log, cutting off a torn final line if a crash left one."""
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                size = self._cut_torn_line(f, size)
+        if size:
+            for line in _lines_before(f, size):
+                entry = _parse(line)
+                if entry and "hash" in entry:
+                    return entry["seq"], entry["hash"]
+                if entry:
+                    break  # legacy entry: nothing chained yet
+        if archives:
+            return _segment_tail(*archives[-1])
+        # Genesis: anchor the chain on the legacy prefix.
+        f.seek(0)
+        return 0, hashlib.sha256(f.read()).hexdigest()
+
+    def _commit(self, pending: list) -> bool:
+        """Append one group. Returns True if it filled the segment and rotated it."""
+        f = self._open_locked()
+        try:
+            archives = _archives()
+            segment = _active_base(archives)
+            seq, prev = self._tail(f, archives)
+            offset = f.seek(0, os.SEEK_END)
+            lines, checkpoints = [], []
+            for p in pending:
+                seq += 1
+                body = {**p.entry, "seq": seq, "prev_hash": prev}
+                prev = entry_hash(prev, body)
+                line = (_canonical({**body, "hash": prev}) + "\n").encode("utf-8")
+                lines.append(line)
+                offset += len(line)
+                if seq % CHECKPOINT_EVERY == 0:
+                    checkpoints.append({"segment": segment, "seq": seq, "hash": prev, "offset": offset})
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+            if checkpoints:
+                with open(CHECKPOINT_FILE, "a", encoding="utf-8") as cp:
+                    cp.writelines(json.dumps(c) + "\n" for c in checkpoints)
+                    cp.flush()
+                    os.fsync(cp.fileno())
+            if offset < SEGMENT_MAX_BYTES:
+                return False
+            os.replace(self.path, _archive_path(segment, seq, "jsonl"))
+            return True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+
+_writer = ChainLogWriter()
+
+
+# Custody-relevant actions: chain_log blocks until they are fsynced unless told otherwise.
+DURABLE_ACTIONS = {"UPLOAD_EVIDENCE", "BATCH_UPLOAD", "INTEGRITY_MISMATCH", "INTEGRITY_MISSING"}
+
+
+def chain_log(action: str, actor: str, target: str, sha256: str = None, meta: dict = None,
+              wait: Optional[bool] = None):
+    """
+    Record a custody event. By default only DURABLE_ACTIONS wait until the entry is fsynced;
+    everything else returns immediately. Pass wait=True/False to override. A waited-for
+    entry that was not written, or not within 5 s, raises ChainLogError.
+    """
+    if wait is None:
+        wait = action in DURABLE_ACTIONS
+    pending = _writer.submit({
         "timestamp": datetime.utcnow().isoformat(),
         "action": action,
         "actor": actor,
         "target": target,
         "sha256": sha256,
-        "meta": meta or {}
+        "meta": meta or {},
+    })
+    if not wait:
+        return
+    if not pending.done.wait(5.0):
+        raise ChainLogError(f"Chain log entry {action} for {target} was not written within 5 s")
+    if pending.error:
+        raise ChainLogError(f"Chain log entry {action} for {target} was not written: {pending.error}")
+
+
+def flush_chain_log(timeout: float = 5.0):
+    _writer.flush(timeout)
+
+
+# -------------------------------------------------------
+# 📇 Sidecar Index
+# -------------------------------------------------------
+_index_lock = threading.Lock()
+
+
+def sync_index() -> int:
+    """Index every log line appended since the last indexed one. Returns the number added."""
+    with _index_lock, get_intel_db() as conn:
+        last = conn.execute("SELECT * FROM chainlog_index ORDER BY id DESC LIMIT 1").fetchone()
+        position = (0, 0)
+        if last:
+            # The log was replaced or truncated underneath the index: start over.
+            entry = _parse(_line_ending_at(last["segment"], last["offset"] + last["length"]) or b"")
+            if entry is None or entry.get("seq") != last["seq"] or entry.get("target") != last["target"]:
+                conn.execute("DELETE FROM chainlog_index")
+            else:
+                position = (last["segment"], last["offset"] + last["length"])
+
+        added = 0
+        rows = []
+        for segment, offset, line in _iter_log(*position):
+            entry = _parse(line)
+            if entry is None:
+                continue
+            rows.append((segment, offset, len(line), entry.get("seq"), entry.get("timestamp"),
+                         entry.get("action"), entry.get("target")))
+            if len(rows) >= 5000:
+                added += _insert_rows(conn, rows)
+                rows = []
+        return added + _insert_rows(conn, rows)
+
+
+def _insert_rows(conn, rows) -> int:
+    cur = conn.executemany(
+        """
+        INSERT OR IGNORE INTO chainlog_index (segment, offset, length, seq, timestamp, action, target)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    return max(cur.rowcount, 0)
+
+
+def _read_entries(rows) -> List[Optional[dict]]:
+    """Decode indexed entries, inflating each compressed block at most once."""
+    archives = {base: (last, ext) for base, last, ext in _archives()}
+    blocks, inflated, out = {}, {}, []
+    active = open(LOG_FILE, "rb") if os.path.exists(LOG_FILE) else None
+    try:
+        for r in rows:
+            segment, offset, length = r["segment"], r["offset"], r["length"]
+            last, ext = archives.get(segment, (None, None))
+            if ext == "jz":
+                if segment not in blocks:
+                    blocks[segment] = _block_map(segment, last)
+                bmap = blocks[segment]
+                i = bisect.bisect_right([raw for raw, _ in bmap], offset) - 1
+                if (segment, i) not in inflated:
+                    inflated[segment, i] = _inflate(segment, last, bmap, i)
+                start = offset - bmap[i][0]
+                line = inflated[segment, i][start:start + length]
+            elif ext == "jsonl":
+                with open(_archive_path(segment, last, ext), "rb") as f:
+                    f.seek(offset)
+                    line = f.read(length)
+            elif active:
+                active.seek(offset)
+                line = active.read(length)
+            else:
+                line = b""
+            entry = _parse(line)
+            # A rotation or compression between listing and reading shows up as a mismatch.
+            out.append(entry if entry is not None and entry.get("seq") == r["seq"] else None)
+    finally:
+        if active:
+            active.close()
+    return out
+
+
+def query_log(
+    target: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 50,
+    before_id: Optional[int] = None,
+) -> dict:
+    """Custody entries matching the filters, newest first (`since`/`until` are ISO timestamps)."""
+    sync_index()
+    filters, params = [], []
+    for clause, value in (("target = ?", target), ("action = ?", action), ("timestamp >= ?", since),
+                          ("timestamp <= ?", until), ("id < ?", before_id)):
+        if value:
+            filters.append(clause)
+            params.append(value)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    with get_intel_db() as conn:
+        rows = conn.execute(f"SELECT * FROM chainlog_index {where} ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+
+    entries = _read_entries(rows)
+    if any(e is None for e in entries):
+        entries = _read_entries(rows)  # retry once against the post-rotation layout
+    results = [
+        {"id": r["id"], "segment": r["segment"], **e}
+        for r, e in zip(rows, entries) if e is not None
+    ]
+    return {
+        "count": len(results),
+        "next_before_id": rows[-1]["id"] if len(rows) == limit else None,
+        "entries": results,
+    }
+
+
+def log_stats() -> dict:
+    archives = _archives()
+    with get_intel_db() as conn:
+        indexed = conn.execute("SELECT COUNT(*) FROM chainlog_index").fetchone()[0]
+    return {
+        "active_segment": _active_base(archives),
+        "active_bytes": os.path.getsize(LOG_FILE) if os.path.exists(LOG_FILE) else 0,
+        "archived_segments": len(archives),
+        "compressed_segments": sum(ext == "jz" for _, _, ext in archives),
+        "indexed_entries": indexed,
     }
 
-    with open(LOG_FILE, "a") as f:
-        f.write(json.dumps(entry) + "\n")
+
+# -------------------------------------------------------
+# ✅ Verification
+# -------------------------------------------------------
+def _load_checkpoints() -> dict:
+    if not os.path.exists(CHECKPOINT_FILE):
+        return {}
+    with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+        return {c["seq"]: c for c in map(json.loads, filter(str.strip, f))}
+
+
+def _load_verified() -> Optional[dict]:
+    try:
+        with open(VERIFIED_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def verify_chain(full: bool = False) -> dict:
+    """
+    Check hashes, sequence continuity and checkpoints across all segments. Incremental by
+    default: resumes from the last verified checkpoint (after confirming it is still intact).
+    """
+    checkpoints = _load_checkpoints()
+    anchor = None if full else _load_verified()
+    result = {"valid": True, "mode": "incremental" if anchor else "full", "errors": []}
+
+    def fail(msg):
+        result["valid"] = False
+        result["errors"].append(msg)
+
+    if anchor:
+        anchor = {"segment": anchor.get("segment", 0), **{k: anchor[k] for k in ("seq", "hash", "offset")}}
+        seq, prev = anchor["seq"], anchor["hash"]
+        # The anchor line itself must still hash to what we verified last time.
+        last = _parse(_line_ending_at(anchor["segment"], anchor["offset"]) or b"")
+        if not last or last.get("hash") != anchor["hash"]:
+            fail(f"Previously verified entry {anchor['seq']} was modified; run a full verification")
+            return {**result, "entries_checked": 0, "last_seq": anchor["seq"]}
+        position = (anchor["segment"], anchor["offset"])
+    else:
+        seq, prev, legacy, position = 0, None, hashlib.sha256(), (0, 0)
+
+    checked, new_anchor = 0, anchor
+    for segment, offset, line in _iter_log(*position):
+        end = offset + len(line)
+        entry = _parse(line)
+        if prev is None and not (entry and "hash" in entry):
+            legacy.update(line)  # pre-chain prefix, hashed byte for byte
+            continue
+        if entry is None:
+            if line.strip():
+                fail(f"Unparseable line ending at byte {end} of segment {segment}")
+            continue
+        if "hash" not in entry:
+            fail(f"Unchained entry after seq {seq}")
+            continue
+        if prev is None:
+            prev = legacy.hexdigest()
+
+        body = {k: v for k, v in entry.items() if k != "hash"}
+        if entry.get("seq") != seq + 1:
+            fail(f"Sequence gap: expected {seq + 1}, found {entry.get('seq')}")
+        if entry.get("prev_hash") != prev:
+            fail(f"Entry {entry.get('seq')} does not link to the previous entry")
+        if entry_hash(entry.get("prev_hash", ""), body) != entry["hash"]:
+            fail(f"Entry {entry.get('seq')} hash mismatch (content altered)")
+        seq, prev = entry.get("seq", seq + 1), entry["hash"]
+        checked += 1
+
+        cp = checkpoints.get(seq)
+        if cp:
+            if cp["hash"] != prev or cp["offset"] != end or cp.get("segment", 0) != segment:
+                fail(f"Checkpoint {seq} does not match the log")
+            elif result["valid"]:
+                new_anchor = {"segment": segment, "seq": seq, "hash": prev, "offset": end}
+
+    if result["valid"] and new_anchor and new_anchor != anchor:
+        with open(VERIFIED_FILE + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({**new_anchor, "verified_at": datetime.utcnow().isoformat()}, f)
+        os.replace(VERIFIED_FILE + ".tmp", VERIFIED_FILE)
+    return {**result, "entries_checked": checked, "last_seq": seq, "head_hash": prev,
+            "verified_through": (new_anchor or {}).get("seq", 0)}
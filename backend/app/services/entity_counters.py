@@ -0,0 +1,228 @@
+"""
+📊 Materialized Entity Counters
+Per-entity case counts and risk sums kept up to date on every analysis write,
+plus time-windowed "trending" counters built from per-bucket Count-Min Sketches
+and Space-Saving heavy-hitter summaries, so memory stays bounded no matter how
+many entity occurrences flow through.
+"""
+
+import json
+import time
+import hashlib
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+from app.pipelines.entity_canonical import key_value
+from app.services.intel_store import get_intel_db, ensure_schema, create_schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entity_counters (
+    entity_key  TEXT PRIMARY KEY,
+    count       INTEGER NOT NULL,
+    risk_sum    REAL NOT NULL,
+    last_seen   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_entity_counters_count ON entity_counters(count DESC);
+
+CREATE TABLE IF NOT EXISTS entity_window_buckets (
+    granularity   TEXT NOT NULL,
+    bucket_start  INTEGER NOT NULL,
+    cms           BLOB NOT NULL,
+    heavy         TEXT NOT NULL,
+    PRIMARY KEY (granularity, bucket_start)
+);
+"""
+ensure_schema("entity_counters", SCHEMA)
+
+CMS_DEPTH = 4
+CMS_WIDTH = 2048
+HEAVY_CAPACITY = 256  # Space-Saving slots per bucket
+
+# Bucket sizes (seconds) and the windows assembled from them.
+GRANULARITIES = {"5m": 300, "1h": 3600}
+WINDOWS = {
+    "hour": ("5m", 12),
+    "day": ("1h", 24),
+    "week": ("1h", 168),
+}
+RETENTION_SEC = 8 * 24 * 3600
+
+
+# -------------------------------------------------------
+# 🧮 Sketch Primitives
+# -------------------------------------------------------
+@lru_cache(maxsize=65536)
+def _cms_columns(key: str) -> tuple:
+    digest = hashlib.blake2b(key.encode(), digest_size=4 * CMS_DEPTH).digest()
+    return tuple(int.from_bytes(digest[4 * i:4 * i + 4], "little") % CMS_WIDTH for i in range(CMS_DEPTH))
+
+
+_ROWS = np.arange(CMS_DEPTH)
+
+
+def _cms_estimate(cms: np.ndarray, key: str) -> int:
+    return int(cms[_ROWS, _cms_columns(key)].min())
+
+
+def _space_saving_add(heavy: dict, key: str):
+    """heavy: {key: [count, overestimate]} with at most HEAVY_CAPACITY entries."""
+    if key in heavy:
+        heavy[key][0] += 1
+    elif len(heavy) < HEAVY_CAPACITY:
+        heavy[key] = [1, 0]
+    else:
+        victim = min(heavy, key=lambda k: heavy[k][0])
+        floor = heavy.pop(victim)[0]
+        heavy[key] = [floor + 1, floor]
+
+
+def _bucket_start(ts: float, granularity: str) -> int:
+    size = GRANULARITIES[granularity]
+    return int(ts // size) * size
+
+
+# -------------------------------------------------------
+# ✍️ Write Path
+# -------------------------------------------------------
+def _update_bucket(conn, granularity: str, ts: float, keys: List[str]):
+    start = _bucket_start(ts, granularity)
+    row = conn.execute(
+        "SELECT cms, heavy FROM entity_window_buckets WHERE granularity = ? AND bucket_start = ?",
+        (granularity, start),
+    ).fetchone()
+    if row:
+        cms = np.frombuffer(row["cms"], dtype=np.int32).reshape(CMS_DEPTH, CMS_WIDTH).copy()
+        heavy = json.loads(row["heavy"])
+    else:
+        cms = np.zeros((CMS_DEPTH, CMS_WIDTH), dtype=np.int32)
+        heavy = {}
+
+    for key in keys:
+        cms[_ROWS, _cms_columns(key)] += 1
+        _space_saving_add(heavy, key)
+
+    conn.execute(
+        "INSERT OR REPLACE INTO entity_window_buckets (granularity, bucket_start, cms, heavy) VALUES (?, ?, ?, ?)",
+        (granularity, start, cms.tobytes(), json.dumps(heavy)),
+    )
+
+
+def index_case(conn, seq: int, case: dict, keys: List[str], risk: float, ts: Optional[float] = None) -> List[str]:
+    """
+    Count a case's canonical keys. Must run before the keys are recorded in `case_entities`
+    so re-analysis of the same case is not double counted. Returns the newly counted keys.
+    """
+    ts = ts or time.time()
+    new_keys = [
+        k for k in keys
+        if not conn.execute(
+            "SELECT 1 FROM case_entities WHERE file_id = ? AND entity_key = ?", (case["file_id"], k)
+        ).fetchone()
+    ]
+    if not new_keys:
+        return []
+
+    conn.executemany(
+        """
+        INSERT INTO entity_counters (entity_key, count, risk_sum, last_seen) VALUES (?, 1, ?, ?)
+        ON CONFLICT(entity_key) DO UPDATE SET
+            count = count + 1,
+            risk_sum = risk_sum + excluded.risk_sum,
+            last_seen = MAX(COALESCE(last_seen, 0), excluded.last_seen)
+        """,
+        [(k, risk, ts) for k in new_keys],
+    )
+
+    if ts >= time.time() - RETENTION_SEC:
+        for granularity in GRANULARITIES:
+            _update_bucket(conn, granularity, ts, new_keys)
+        conn.execute("DELETE FROM entity_window_buckets WHERE bucket_start < ?", (int(time.time() - RETENTION_SEC),))
+    return new_keys
+
+
+def _stat(row) -> dict:
+    return {
+        "entity": key_value(row["entity_key"]),
+        "key": row["entity_key"],
+        "count": row["count"],
+        "avg_risk": round(row["risk_sum"] / row["count"], 2),
+    }
+
+
+def entity_stats(conn, keys: List[str]) -> List[dict]:
+    """Current absolute counters for `keys` (pushed to live clients as deltas)."""
+    if not keys:
+        return []
+    marks = ",".join("?" * len(keys))
+    rows = conn.execute(
+        f"SELECT entity_key, count, risk_sum FROM entity_counters WHERE entity_key IN ({marks})", keys
+    ).fetchall()
+    return [_stat(r) for r in rows]
+
+
+def reset(conn):
+    conn.execute("DROP TABLE IF EXISTS entity_counters")
+    conn.execute("DROP TABLE IF EXISTS entity_window_buckets")
+    create_schema(conn, SCHEMA)
+
+
+# -------------------------------------------------------
+# 📈 All-Time Top Entities
+# -------------------------------------------------------
+def top_entities(limit: int = 10) -> dict:
+    """Top-k by case count, read straight off the count index (O(k))."""
+    with get_intel_db() as conn:
+        total = conn.execute("SELECT COUNT(*) AS n FROM entity_counters").fetchone()["n"]
+        rows = conn.execute(
+            "SELECT entity_key, count, risk_sum FROM entity_counters ORDER BY count DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return {"total_entities": total, "top": [_stat(r) for r in rows]}
+
+
+# -------------------------------------------------------
+# 🔥 Windowed / Trending Entities
+# -------------------------------------------------------
+def _window_buckets(granularity: str, count: int, now: Optional[float] = None):
+    """The window's buckets, read in one query (always from the store, which every worker writes to)."""
+    size = GRANULARITIES[granularity]
+    current = _bucket_start(now or time.time(), granularity)
+    with get_intel_db() as conn:
+        rows = conn.execute(
+            "SELECT cms, heavy FROM entity_window_buckets "
+            "WHERE granularity = ? AND bucket_start BETWEEN ? AND ?",
+            (granularity, current - (count - 1) * size, current),
+        ).fetchall()
+    return [
+        (np.frombuffer(r["cms"], dtype=np.int32).reshape(CMS_DEPTH, CMS_WIDTH), json.loads(r["heavy"]))
+        for r in rows
+    ]
+
+
+def window_count(key: str, seconds: int, now: Optional[float] = None) -> int:
+    """Estimated number of cases mentioning `key` in the last `seconds` (never under-counts)."""
+    granularity = "5m" if seconds <= 3600 else "1h"
+    span = -(-seconds // GRANULARITIES[granularity])
+    return sum(_cms_estimate(cms, key) for cms, _ in _window_buckets(granularity, span, now))
+
+
+def trending_entities(window: str = "day", limit: int = 10) -> dict:
+    """Heavy hitters over the last hour/day/week, ranked by Count-Min estimate."""
+    granularity, span = WINDOWS[window]
+    buckets = _window_buckets(granularity, span)
+
+    candidates = set()
+    for _, heavy in buckets:
+        candidates.update(heavy)
+
+    ranked = sorted(
+        ((key, sum(_cms_estimate(cms, key) for cms, _ in buckets)) for key in candidates),
+        key=lambda kv: kv[1],
+        reverse=True,
+    )[:limit]
+    return {
+        "window": window,
+        "buckets": len(buckets),
+        "top": [{"entity": key_value(k), "key": k, "count": c} for k, c in ranked],
+    }
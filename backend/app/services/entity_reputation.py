@@ -0,0 +1,271 @@
+"""
+📜 Entity Reputation Ledger
+Per-entity history kept on every analysis write: first/last seen, case count,
+time-decayed mean risk and linked scam categories. `assess_risk` reads it with
+one primary-key lookup per entity, so "this UPI handle was in 40 high-risk
+cases last week" becomes a fusion factor without any network or model call.
+"""
+
+import os
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+from app.pipelines.entity_canonical import key_value
+from app.services.intel_store import get_intel_db, ensure_schema, create_schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entity_reputation (
+    entity_key     TEXT PRIMARY KEY,
+    first_seen     REAL NOT NULL,
+    last_seen      REAL NOT NULL,
+    case_count     INTEGER NOT NULL,
+    risk_sum       REAL NOT NULL,   -- decayed to decay_ts
+    weight_sum     REAL NOT NULL,   -- decayed to decay_ts
+    decay_ts       REAL NOT NULL,
+    categories     TEXT NOT NULL,   -- {category: case_count}
+    updated_at     REAL NOT NULL    -- write time (last_seen is the cases' own time)
+);
+
+-- What each case added to an entry, so a case's own history can be left out of its prior.
+CREATE TABLE IF NOT EXISTS entity_reputation_cases (
+    file_id     TEXT NOT NULL,
+    entity_key  TEXT NOT NULL,
+    risk        REAL NOT NULL,
+    ts          REAL NOT NULL,
+    category    TEXT,
+    PRIMARY KEY (file_id, entity_key)
+);
+"""
+ensure_schema("entity_reputation", SCHEMA)
+
+HALF_LIFE_SEC = float(os.getenv("REPUTATION_HALF_LIFE_DAYS", "30")) * 86400
+MAX_CATEGORIES = 10
+
+
+def _decay(age_sec: float) -> float:
+    return 0.5 ** (max(age_sec, 0.0) / HALF_LIFE_SEC)
+
+
+# -------------------------------------------------------
+# ✍️ Write Path
+# -------------------------------------------------------
+def _withdraw(conn, own):
+    """Take one case's earlier contribution (an entity_reputation_cases row) back out of its entry."""
+    row = conn.execute("SELECT * FROM entity_reputation WHERE entity_key = ?", (own["entity_key"],)).fetchone()
+    if not row:
+        return
+    if row["case_count"] <= 1:
+        conn.execute("DELETE FROM entity_reputation WHERE entity_key = ?", (own["entity_key"],))
+        return
+    carried = _decay(row["decay_ts"] - own["ts"])
+    categories = json.loads(row["categories"])
+    if own["category"] in categories:
+        categories[own["category"]] -= 1
+        categories = {c: n for c, n in categories.items() if n > 0}
+    conn.execute(
+        """
+        UPDATE entity_reputation SET
+            case_count = case_count - 1, risk_sum = ?, weight_sum = ?, categories = ?, updated_at = ?
+        WHERE entity_key = ?
+        """,
+        (
+            max(row["risk_sum"] - own["risk"] * carried, 0.0),
+            max(row["weight_sum"] - carried, 0.0),
+            json.dumps(categories), time.time(), own["entity_key"],
+        ),
+    )
+
+
+def index_case(conn, keys: List[str], risk: float, category: Optional[str], ts: Optional[float] = None,
+               file_id: Optional[str] = None):
+    """
+    Fold one case into the ledger for `keys`. A case seen before (same file_id) first has its
+    earlier contribution taken back out, so re-analyses and rescores replace it.
+    """
+    ts = ts or time.time()
+    keys = list(dict.fromkeys(keys))
+    if file_id:
+        for own in conn.execute("SELECT * FROM entity_reputation_cases WHERE file_id = ?", (file_id,)).fetchall():
+            _withdraw(conn, own)
+        conn.execute("DELETE FROM entity_reputation_cases WHERE file_id = ?", (file_id,))
+        conn.executemany(
+            "INSERT INTO entity_reputation_cases (file_id, entity_key, risk, ts, category) VALUES (?, ?, ?, ?, ?)",
+            [(file_id, key, risk, ts, category) for key in keys],
+        )
+    for key in keys:
+        row = conn.execute("SELECT * FROM entity_reputation WHERE entity_key = ?", (key,)).fetchone()
+        if not row:
+            conn.execute(
+                """
+                INSERT INTO entity_reputation
+                    (entity_key, first_seen, last_seen, case_count, risk_sum, weight_sum, decay_ts, categories, updated_at)
+                VALUES (?, ?, ?, 1, ?, 1.0, ?, ?, ?)
+                """,
+                (key, ts, ts, risk, ts, json.dumps({category: 1} if category else {}), time.time()),
+            )
+            continue
+
+        # Keep sums anchored at the newest observation; older (backfilled) cases enter pre-decayed.
+        if ts >= row["decay_ts"]:
+            carry, weight, anchor = _decay(ts - row["decay_ts"]), 1.0, ts
+        else:
+            carry, weight, anchor = 1.0, _decay(row["decay_ts"] - ts), row["decay_ts"]
+
+        categories = json.loads(row["categories"])
+        if category:
+            categories[category] = categories.get(category, 0) + 1
+            categories = dict(sorted(categories.items(), key=lambda kv: kv[1], reverse=True)[:MAX_CATEGORIES])
+
+        conn.execute(
+            """
+            UPDATE entity_reputation SET
+                first_seen = MIN(first_seen, ?), last_seen = MAX(last_seen, ?), case_count = case_count + 1,
+                risk_sum = ?, weight_sum = ?, decay_ts = ?, categories = ?, updated_at = ?
+            WHERE entity_key = ?
+            """,
+            (
+                ts, ts,
+                row["risk_sum"] * carry + risk * weight,
+                row["weight_sum"] * carry + weight,
+                anchor, json.dumps(categories), time.time(), key,
+            ),
+        )
+
+
+def reset(conn):
+    conn.execute("DROP TABLE IF EXISTS entity_reputation")
+    conn.execute("DROP TABLE IF EXISTS entity_reputation_cases")
+    create_schema(conn, SCHEMA)
+
+
+# -------------------------------------------------------
+# 🔍 Lookups
+# -------------------------------------------------------
+def _profile(row, own=None) -> Optional[dict]:
+    """Ledger entry for a row; `own` (an entity_reputation_cases row) is subtracted out first."""
+    case_count, risk_sum, weight_sum = row["case_count"], row["risk_sum"], row["weight_sum"]
+    categories = json.loads(row["categories"])
+    if own:
+        if case_count <= 1:
+            return None  # the case itself is the entity's only history
+        carried = _decay(row["decay_ts"] - own["ts"])
+        case_count -= 1
+        risk_sum -= own["risk"] * carried
+        weight_sum = max(weight_sum - carried, 0.0)
+        if own["category"] in categories:
+            categories[own["category"]] -= 1
+            categories = {c: n for c, n in categories.items() if n > 0}
+    return {
+        "entity": key_value(row["entity_key"]),
+        "key": row["entity_key"],
+        "first_seen": row["first_seen"],
+        "last_seen": row["last_seen"],
+        "case_count": case_count,
+        "decayed_risk": round(risk_sum / weight_sum, 4) if weight_sum > 1e-12 else 0.0,
+        # Recency-weighted case count: 40 cases last week outweigh 40 cases last year.
+        "effective_cases": round(weight_sum * _decay(time.time() - row["decay_ts"]), 3),
+        "categories": categories,
+        "updated_at": row["updated_at"],
+    }
+
+
+def _own_contributions(conn, file_ids: List[str]) -> Dict[tuple, dict]:
+    """{(file_id, entity_key): contribution row} for the given cases."""
+    found = {}
+    for i in range(0, len(file_ids), LOOKUP_CHUNK):
+        chunk = file_ids[i:i + LOOKUP_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        for r in conn.execute(f"SELECT * FROM entity_reputation_cases WHERE file_id IN ({marks})", chunk):
+            found[(r["file_id"], r["entity_key"])] = r
+    return found
+
+
+LOOKUP_CHUNK = 900  # bound parameters per IN (...) query
+
+
+def reputation(keys: List[str], exclude_file: Optional[str] = None) -> List[dict]:
+    """
+    Ledger entries for whichever of `keys` have been seen before, ordered by key.
+    `exclude_file` leaves that case's own contribution out (a case is not evidence about itself).
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return []
+    marks = ",".join("?" * len(keys))
+    try:
+        with get_intel_db() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM entity_reputation WHERE entity_key IN ({marks}) ORDER BY entity_key", keys
+            ).fetchall()
+            own = _own_contributions(conn, [exclude_file]) if exclude_file else {}
+    except Exception as e:
+        print(f"⚠️ Reputation lookup failed: {e}")
+        return []
+    entries = (_profile(r, own.get((exclude_file, r["entity_key"]))) for r in rows)
+    return [e for e in entries if e]
+
+
+def reputation_by_key(keys: Iterable[str]) -> Dict[str, dict]:
+    """Bulk form of reputation() for batch scoring: {key: entry} for every known key."""
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    try:
+        with get_intel_db() as conn:
+            for i in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[i:i + LOOKUP_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                for r in conn.execute(f"SELECT * FROM entity_reputation WHERE entity_key IN ({marks})", chunk):
+                    found[r["entity_key"]] = _profile(r)
+    except Exception as e:
+        print(f"⚠️ Reputation lookup failed: {e}")
+        return {}
+    return found
+
+
+def reputation_for_cases(cases: List[tuple]) -> List[List[dict]]:
+    """
+    reputation(keys, exclude_file=file_id) for many (file_id, keys) cases from one ledger read:
+    each case gets its entries ordered by key, with its own contribution left out.
+    """
+    keys = list(dict.fromkeys(k for _, case_keys in cases for k in case_keys))
+    rows = {}
+    try:
+        with get_intel_db() as conn:
+            for i in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[i:i + LOOKUP_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                for r in conn.execute(f"SELECT * FROM entity_reputation WHERE entity_key IN ({marks})", chunk):
+                    rows[r["entity_key"]] = r
+            own = _own_contributions(conn, list({f for f, _ in cases if f}))
+    except Exception as e:
+        print(f"⚠️ Reputation lookup failed: {e}")
+        return [[] for _ in cases]
+
+    shared = {}
+    results = []
+    for file_id, case_keys in cases:
+        entries = []
+        for key in sorted(set(case_keys)):
+            row = rows.get(key)
+            if row is None:
+                continue
+            contribution = own.get((file_id, key))
+            if contribution:
+                entry = _profile(row, contribution)
+            else:
+                entry = shared.get(key) or shared.setdefault(key, _profile(row))
+            if entry:
+                entries.append(entry)
+        results.append(entries)
+    return results
+
+
+def ledger(since: Optional[float] = None) -> List[dict]:
+    """Every ledger entry (or those written after `since`), ordered by key."""
+    query, params = "SELECT * FROM entity_reputation", ()
+    if since:
+        query, params = query + " WHERE updated_at > ?", (since,)
+    with get_intel_db() as conn:
+        rows = conn.execute(query + " ORDER BY entity_key", params).fetchall()
+    return [_profile(r) for r in rows]
@@ -0,0 +1,211 @@
+"""
+📡 Event Bus
+Durable, ordered event log in the intel store with Server-Sent Events fan-out.
+
+Writers append events inside their own transaction (so an event exists iff the
+write that caused it committed). Each worker process runs a single tail task
+that polls for new rows and pushes pre-encoded SSE frames to its local
+subscribers, so the database sees one poll per process no matter how many
+browsers are connected, and events written by any worker reach every client.
+Clients resume after a disconnect with the standard `Last-Event-ID` header.
+"""
+
+import json
+import time
+import asyncio
+from typing import Callable, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.services.intel_store import get_intel_db, ensure_schema
+
+ensure_schema("event_bus", """
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel     TEXT NOT NULL,
+    type        TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_channel ON events(channel, id);
+""")
+
+POLL_INTERVAL_SEC = 0.5
+KEEPALIVE_SEC = 15
+SUBSCRIBER_QUEUE_SIZE = 1000
+REPLAY_LIMIT = 5000
+RETENTION_SEC = 24 * 3600
+
+_subscribers = set()
+_tail_task = None
+_last_id = 0
+
+
+# -------------------------------------------------------
+# ✍️ Publishing
+# -------------------------------------------------------
+def publish(conn, channel: str, event_type: str, payload: dict) -> int:
+    """Append an event within the caller's transaction. Returns the event id."""
+    cur = conn.execute(
+        "INSERT INTO events (channel, type, payload, created_at) VALUES (?, ?, ?, ?)",
+        (channel, event_type, json.dumps(payload, ensure_ascii=False, default=str), time.time()),
+    )
+    return cur.lastrowid
+
+
+def _frame(row) -> str:
+    return f"id: {row['id']}\nevent: {row['type']}\ndata: {row['payload']}\n\n"
+
+
+def _ndjson(row) -> str:
+    return f'{{"id": {row["id"]}, "type": {json.dumps(row["type"])}, "data": {row["payload"]}}}\n'
+
+
+# -------------------------------------------------------
+# 🔁 Tail & Fan-out (one task per process)
+# -------------------------------------------------------
+class _Subscriber:
+    def __init__(self, channels: Iterable[str]):
+        self.channels = set(channels)
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+
+def last_event_id() -> int:
+    """Id of the newest event; clients pass it as `Last-Event-ID` after loading a snapshot."""
+    with get_intel_db() as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) AS n FROM events").fetchone()["n"]
+
+
+def _fetch_since(last_id: int, channels: Optional[Iterable[str]] = None, limit: int = 1000):
+    with get_intel_db() as conn:
+        if channels is None:
+            return conn.execute(
+                "SELECT * FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+            ).fetchall()
+        channels = list(channels)
+        marks = ",".join("?" * len(channels))
+        return conn.execute(
+            f"SELECT * FROM events WHERE id > ? AND channel IN ({marks}) ORDER BY id LIMIT ?",
+            (last_id, *channels, limit),
+        ).fetchall()
+
+
+def _prune():
+    with get_intel_db() as conn:
+        conn.execute("DELETE FROM events WHERE created_at < ?", (time.time() - RETENTION_SEC,))
+
+
+async def _tail_loop():
+    global _last_id
+    _last_id = await asyncio.to_thread(last_event_id)
+    last_prune = time.time()
+    while True:
+        rows = []
+        try:
+            rows = await asyncio.to_thread(_fetch_since, _last_id)
+            for row in rows:
+                _last_id = row["id"]
+                frame = (row["id"], _frame(row), row)  # encoded once, shared by every subscriber
+                for sub in list(_subscribers):
+                    if row["channel"] not in sub.channels:
+                        continue
+                    try:
+                        sub.queue.put_nowait(frame)
+                    except asyncio.QueueFull:
+                        # Too slow to keep up: cut it loose; it reconnects with Last-Event-ID.
+                        _subscribers.discard(sub)
+                        sub.queue = None
+            if time.time() - last_prune > 3600:
+                await asyncio.to_thread(_prune)
+                last_prune = time.time()
+        except Exception as e:
+            print(f"⚠️ Event bus tail error: {e}")
+        if not rows:
+            await asyncio.sleep(POLL_INTERVAL_SEC)
+
+
+def _ensure_tailing():
+    global _tail_task
+    if _tail_task is None or _tail_task.done():
+        _tail_task = asyncio.get_running_loop().create_task(_tail_loop())
+
+
+# -------------------------------------------------------
+# 🌊 Server-Sent Events
+# -------------------------------------------------------
+def _synthetic(event_type: str, payload: dict, after_id: int, ndjson: bool) -> str:
+    """A terminal event built from current state rather than the log (no id, so resume points stay put)."""
+    data = json.dumps(payload, ensure_ascii=False, default=str)
+    if ndjson:
+        return f'{{"id": {after_id}, "type": {json.dumps(event_type)}, "data": {data}}}\n'
+    return f"event: {event_type}\ndata: {data}\n\n"
+
+
+async def _stream(request: Request, channels: list, last_event_id: Optional[str], ndjson: bool = False,
+                  stop_on=(), settled: Optional[Callable[[], Optional[dict]]] = None):
+    sub = _Subscriber(channels)
+    _subscribers.add(sub)
+    _ensure_tailing()
+    try:
+        if not ndjson:
+            yield f"retry: 3000\n: subscribed to {', '.join(channels)}\n\n"
+
+        # Replay what the client missed, then switch to the live queue (skipping overlap).
+        replayed_upto = 0
+        rows = []
+        if last_event_id and last_event_id.isdigit():
+            replayed_upto = int(last_event_id)
+            rows = await asyncio.to_thread(_fetch_since, replayed_upto, channels, REPLAY_LIMIT)
+            for row in rows:
+                replayed_upto = row["id"]
+                yield _ndjson(row) if ndjson else _frame(row)
+                if row["type"] in stop_on:
+                    return
+
+        # The stop event may have been pruned (RETENTION_SEC) while the work it reports is long
+        # finished; `settled` reports that from the owner's own state so the stream still ends.
+        if settled and stop_on and len(rows) < REPLAY_LIMIT:
+            payload = await asyncio.to_thread(settled)
+            if payload is not None:
+                yield _synthetic(sorted(stop_on)[0], payload, replayed_upto, ndjson)
+                return
+
+        while True:
+            if await request.is_disconnected() or sub.queue is None:
+                break
+            try:
+                event_id, frame, row = await asyncio.wait_for(sub.queue.get(), timeout=KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                yield "\n" if ndjson else ": keepalive\n\n"
+                continue
+            if event_id > replayed_upto:
+                yield _ndjson(row) if ndjson else frame
+                if row["type"] in stop_on:
+                    return
+    finally:
+        _subscribers.discard(sub)
+
+
+def sse_response(request: Request, channels: list, last_event_id: Optional[str] = None,
+                 stop_on=(), settled: Optional[Callable[[], Optional[dict]]] = None) -> StreamingResponse:
+    """Events as SSE frames; with `stop_on`, ends after an event of that type (or `settled()`'s stand-in for one)."""
+    return StreamingResponse(
+        _stream(request, channels, last_event_id, stop_on=set(stop_on), settled=settled),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def ndjson_response(request: Request, channels: list, last_event_id: Optional[str] = None, stop_on=(),
+                    settled: Optional[Callable[[], Optional[dict]]] = None) -> StreamingResponse:
+    """Same events as newline-delimited JSON ({"id", "type", "data"}); ends after an event of a `stop_on` type."""
+    return StreamingResponse(
+        _stream(request, channels, last_event_id, ndjson=True, stop_on=set(stop_on), settled=settled),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def subscriber_count() -> int:
+    return len(_subscribers)
@@ -0,0 +1,169 @@
+"""
+🖼️ Perceptual Image Index
+dHash fingerprints for uploaded screenshots, stored in a multi-index hash table
+(four 16-bit chunks) for Hamming-distance search. Recompressed or resized copies
+of a known scam screenshot are found without running OCR again.
+"""
+
+import os
+from typing import List, Optional
+
+from PIL import Image
+
+from app.services.intel_store import get_intel_db, ensure_schema
+
+ensure_schema("image_index", """
+CREATE TABLE IF NOT EXISTS image_hashes (
+    file_id    TEXT PRIMARY KEY,
+    dhash      TEXT NOT NULL,
+    fine_hash  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS image_hash_chunks (
+    chunk    INTEGER NOT NULL,
+    value    INTEGER NOT NULL,
+    file_id  TEXT NOT NULL,
+    PRIMARY KEY (chunk, value, file_id)
+);
+CREATE INDEX IF NOT EXISTS idx_image_hash_chunks_file ON image_hash_chunks(file_id);
+""")
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg"}
+
+NUM_CHUNKS = 4
+CHUNK_BITS = 16
+# Each chunk is probed exactly and at distance 1, so any hash within
+# NUM_CHUNKS * 2 - 1 = 7 bits is guaranteed to surface as a candidate.
+MAX_SEARCH_DISTANCE = 7
+DEFAULT_MAX_DISTANCE = int(os.getenv("VISUAL_MATCH_MAX_DISTANCE", "6"))
+# 256-bit confirmation hash: tolerates recompression, rejects look-alike layouts.
+FINE_MAX_DISTANCE = int(os.getenv("VISUAL_MATCH_FINE_DISTANCE", "24"))
+
+
+# -------------------------------------------------------
+# 🧮 Hashing
+# -------------------------------------------------------
+def _dhash_bits(img: Image.Image, size: int) -> int:
+    small = img.resize((size + 1, size), Image.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (px[offset + col] > px[offset + col + 1])
+    return bits
+
+
+def image_hashes(image_path: str) -> Optional[dict]:
+    """{"dhash": 64-bit hex, "fine_hash": 256-bit hex}, or None if the file isn't a readable image."""
+    if os.path.splitext(image_path)[1].lower() not in IMAGE_EXTS:
+        return None
+    try:
+        with Image.open(image_path) as img:
+            gray = img.convert("L")
+            return {
+                "dhash": f"{_dhash_bits(gray, 8):016x}",
+                "fine_hash": f"{_dhash_bits(gray, 16):064x}",
+            }
+    except Exception as e:
+        print(f"⚠️ Perceptual hash failed for {image_path}: {e}")
+        return None
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def _chunks(dhash: str) -> List[int]:
+    value = int(dhash, 16)
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> (CHUNK_BITS * i)) & mask for i in range(NUM_CHUNKS)]
+
+
+# -------------------------------------------------------
+# ✍️ Indexing
+# -------------------------------------------------------
+def index_image(file_id: str, hashes: dict):
+    with get_intel_db() as conn:
+        conn.execute("DELETE FROM image_hash_chunks WHERE file_id = ?", (file_id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO image_hashes (file_id, dhash, fine_hash) VALUES (?, ?, ?)",
+            (file_id, hashes["dhash"], hashes["fine_hash"]),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO image_hash_chunks (chunk, value, file_id) VALUES (?, ?, ?)",
+            [(i, v, file_id) for i, v in enumerate(_chunks(hashes["dhash"]))],
+        )
+
+
+def get_hashes(file_id: str) -> Optional[dict]:
+    with get_intel_db() as conn:
+        row = conn.execute("SELECT dhash, fine_hash FROM image_hashes WHERE file_id = ?", (file_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def sync_image_index(upload_dir: str = "app/data/uploads") -> int:
+    """Hash uploaded images the index has not seen yet (startup backfill)."""
+    with get_intel_db() as conn:
+        known = {r["file_id"] for r in conn.execute("SELECT file_id FROM image_hashes")}
+    added = 0
+    for file_id in os.listdir(upload_dir):
+        if file_id in known:
+            continue
+        hashes = image_hashes(os.path.join(upload_dir, file_id))
+        if hashes:
+            index_image(file_id, hashes)
+            added += 1
+    return added
+
+
+# -------------------------------------------------------
+# 🔍 Search
+# -------------------------------------------------------
+def find_visual_matches(
+    hashes: dict,
+    max_distance: int = DEFAULT_MAX_DISTANCE,
+    exclude: Optional[str] = None,
+    analyzed_only: bool = True,
+    limit: int = 10,
+) -> List[dict]:
+    """Indexed images within `max_distance` bits of `hashes["dhash"]`, closest first."""
+    max_distance = min(max_distance, MAX_SEARCH_DISTANCE)
+    probes = []
+    for i, value in enumerate(_chunks(hashes["dhash"])):
+        probes.append((i, value))
+        probes.extend((i, value ^ (1 << bit)) for bit in range(CHUNK_BITS))
+
+    with get_intel_db() as conn:
+        candidates = set()
+        for chunk, value in probes:
+            for r in conn.execute(
+                "SELECT file_id FROM image_hash_chunks WHERE chunk = ? AND value = ?", (chunk, value)
+            ):
+                candidates.add(r["file_id"])
+        candidates.discard(exclude)
+
+        matches = []
+        for file_id in candidates:
+            row = conn.execute(
+                f"""
+                SELECT h.dhash, h.fine_hash FROM image_hashes h
+                {'JOIN cases c ON c.file_id = h.file_id' if analyzed_only else ''}
+                WHERE h.file_id = ?
+                """,
+                (file_id,),
+            ).fetchone()
+            if not row:
+                continue
+            distance = hamming(hashes["dhash"], row["dhash"])
+            if distance <= max_distance:
+                matches.append({
+                    "file_id": file_id,
+                    "distance": distance,
+                    "fine_distance": hamming(hashes["fine_hash"], row["fine_hash"]),
+                })
+    return sorted(matches, key=lambda m: (m["distance"], m["fine_distance"]))[:limit]
+
+
+def verified(match: dict) -> bool:
+    """Cheap second check before trusting a match enough to reuse its OCR text."""
+    return match["fine_distance"] <= FINE_MAX_DISTANCE
@@ -0,0 +1,251 @@
+"""
+🛡️ Evidence Integrity Audit
+Re-hashes stored evidence and compares it with the SHA-256 recorded at upload,
+so the chain of custody can show the bytes on disk are still the bytes that
+were received.
+
+Files are hashed in parallel from memory-mapped reads (hashlib releases the
+GIL, so worker threads use every core). Hard links to the same blob are hashed
+once. Incremental by default: a file whose inode, mtime and size match its
+last verified pass is skipped. Reads are paced by a shared I/O budget
+(AUDIT_IO_MBPS) so an audit never starves analysis traffic. Mismatches,
+missing files and a run summary are written to the chain log.
+"""
+
+import os
+import json
+import mmap
+import time
+import fcntl
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.services.intel_store import get_intel_db, ensure_schema
+from app.services.blob_store import evidence_path, META_DIR, UPLOAD_DIR
+from app.services.chainlog import chain_log
+
+ensure_schema("integrity_audit", """
+CREATE TABLE IF NOT EXISTS integrity_state (
+    file_id      TEXT PRIMARY KEY,
+    inode        INTEGER NOT NULL,
+    mtime_ns     INTEGER NOT NULL,
+    size         INTEGER NOT NULL,
+    sha256       TEXT NOT NULL,
+    verified_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS integrity_runs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    mode          TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    started_at    REAL NOT NULL,
+    finished_at   REAL,
+    files         INTEGER NOT NULL DEFAULT 0,
+    hashed        INTEGER NOT NULL DEFAULT 0,
+    skipped       INTEGER NOT NULL DEFAULT 0,
+    bytes_hashed  INTEGER NOT NULL DEFAULT 0,
+    mismatched    INTEGER NOT NULL DEFAULT 0,
+    missing       INTEGER NOT NULL DEFAULT 0,
+    failures      TEXT NOT NULL DEFAULT '[]'
+);
+""")
+
+IO_BUDGET_BYTES = float(os.getenv("AUDIT_IO_MBPS", "50")) * 1024 * 1024  # 0 = unthrottled
+WORKERS = os.cpu_count() or 2
+SLICE_BYTES = 4 * 1024 * 1024
+_LOCK_PATH = os.path.join(os.path.dirname(META_DIR), ".integrity_audit.lock")
+
+
+class AuditRunning(RuntimeError):
+    """Raised when an audit is already in progress (in this or another worker)."""
+
+
+# -------------------------------------------------------
+# 🚦 I/O Budget
+# -------------------------------------------------------
+class _IoBudget:
+    """Token bucket shared by all hashing threads."""
+
+    def __init__(self, bytes_per_sec: float):
+        self.rate = bytes_per_sec
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def spend(self, n: int):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + n / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+def _hash_file(path: str, budget: _IoBudget) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for start in range(0, size, SLICE_BYTES):
+                        chunk = view[start:start + SLICE_BYTES]
+                        budget.spend(len(chunk))
+                        sha.update(chunk)
+                        chunk.release()
+                finally:
+                    view.release()
+    return sha.hexdigest()
+
+
+# -------------------------------------------------------
+# 🔍 Audit
+# -------------------------------------------------------
+def _recorded_evidence():
+    """(file_id, recorded sha256) for every upload with metadata."""
+    for name in sorted(os.listdir(META_DIR)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(META_DIR, name), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get("sha256"):
+            yield meta.get("file_id") or name[:-len(".json")], meta["sha256"]
+
+
+def _run(run_id: int, full: bool):
+    budget = _IoBudget(IO_BUDGET_BYTES)
+    with get_intel_db() as conn:
+        known = {r["file_id"]: r for r in conn.execute("SELECT * FROM integrity_state")}
+
+    stats = {"files": 0, "hashed": 0, "skipped": 0, "bytes_hashed": 0, "mismatched": 0, "missing": 0}
+    failures, verified = [], []
+    by_inode = {}  # (dev, inode) -> [(file_id, expected, path, stat)]
+    for file_id, expected in _recorded_evidence():
+        stats["files"] += 1
+        path = os.path.join(UPLOAD_DIR, os.path.basename(file_id))
+        if not os.path.exists(path):
+            # Record the loss before evidence_path() re-links the upload from the blob store
+            # (which would hide it); the re-linked copy is then hashed like any other.
+            path = evidence_path(file_id)
+            stats["missing"] += 1
+            failures.append({"file_id": file_id, "problem": "missing", "expected": expected, "relinked": bool(path)})
+            chain_log(action="INTEGRITY_MISSING", actor="integrity-audit", target=file_id,
+                      sha256=expected, meta={"run_id": run_id, "relinked": bool(path)})
+            if not path:
+                continue
+        st = os.stat(path)
+        prior = known.get(file_id)
+        if (not full and prior and prior["sha256"] == expected and prior["inode"] == st.st_ino
+                and prior["mtime_ns"] == st.st_mtime_ns and prior["size"] == st.st_size):
+            stats["skipped"] += 1
+            continue
+        by_inode.setdefault((st.st_dev, st.st_ino), []).append((file_id, expected, path, st))
+
+    def check(group):
+        actual = _hash_file(group[0][2], budget)
+        return group, actual
+
+    with ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="integrity-audit") as pool:
+        for group, actual in pool.map(check, by_inode.values()):
+            stats["hashed"] += 1
+            stats["bytes_hashed"] += group[0][3].st_size
+            for file_id, expected, path, st in group:
+                if actual == expected:
+                    verified.append((file_id, st.st_ino, st.st_mtime_ns, st.st_size, actual, time.time()))
+                    continue
+                stats["mismatched"] += 1
+                failures.append({"file_id": file_id, "problem": "hash_mismatch", "expected": expected, "actual": actual})
+                chain_log(
+                    action="INTEGRITY_MISMATCH",
+                    actor="integrity-audit",
+                    target=file_id,
+                    sha256=actual,
+                    meta={"expected_sha256": expected, "run_id": run_id, "path": path},
+                )
+
+    failed_ids = [f["file_id"] for f in failures]
+    with get_intel_db() as conn:
+        conn.executemany("INSERT OR REPLACE INTO integrity_state VALUES (?, ?, ?, ?, ?, ?)", verified)
+        # A file that failed must be re-hashed next time, whatever its stat says.
+        conn.executemany("DELETE FROM integrity_state WHERE file_id = ?", [(i,) for i in failed_ids])
+        conn.execute(
+            f"""
+            UPDATE integrity_runs SET status = ?, finished_at = ?, failures = ?,
+                {", ".join(f"{k} = ?" for k in stats)}
+            WHERE id = ?
+            """,
+            ("failed" if failures else "passed", time.time(), json.dumps(failures), *stats.values(), run_id),
+        )
+
+    chain_log(
+        action="INTEGRITY_AUDIT",
+        actor="integrity-audit",
+        target="evidence-store",
+        meta={"run_id": run_id, "mode": "full" if full else "incremental", **stats},
+    )
+
+
+def _run_locked(run_id: int, full: bool, lock_file):
+    try:
+        _run(run_id, full)
+    except Exception as e:
+        print(f"⚠️ Integrity audit {run_id} crashed: {e}")
+        with get_intel_db() as conn:
+            conn.execute("UPDATE integrity_runs SET status = 'error', finished_at = ? WHERE id = ?", (time.time(), run_id))
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def start_audit(full: bool = False, wait: bool = False) -> dict:
+    """Start an audit in a background thread (or inline with wait=True). Raises AuditRunning if one is active."""
+    lock_file = open(_LOCK_PATH, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise AuditRunning("An integrity audit is already running")
+
+    with get_intel_db() as conn:
+        run_id = conn.execute(
+            "INSERT INTO integrity_runs (mode, status, started_at) VALUES (?, 'running', ?)",
+            ("full" if full else "incremental", time.time()),
+        ).lastrowid
+    if wait:
+        _run_locked(run_id, full, lock_file)
+    else:
+        threading.Thread(target=_run_locked, args=(run_id, full, lock_file), name="integrity-audit", daemon=True).start()
+    return audit_run(run_id)
+
+
+# -------------------------------------------------------
+# 📊 Summary
+# -------------------------------------------------------
+def _run_dict(row) -> dict:
+    return {**dict(row), "failures": json.loads(row["failures"])}
+
+
+def audit_run(run_id: int) -> Optional[dict]:
+    with get_intel_db() as conn:
+        row = conn.execute("SELECT * FROM integrity_runs WHERE id = ?", (run_id,)).fetchone()
+    return _run_dict(row) if row else None
+
+
+def audit_summary(limit: int = 10) -> dict:
+    """Latest run in full, recent runs briefly, and how much evidence has a current verified hash."""
+    with get_intel_db() as conn:
+        runs = conn.execute("SELECT * FROM integrity_runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        verified = conn.execute("SELECT COUNT(*), MIN(verified_at) FROM integrity_state").fetchone()
+    return {
+        "latest": _run_dict(runs[0]) if runs else None,
+        "recent": [{k: r[k] for k in r.keys() if k != "failures"} for r in runs],
+        "verified_files": verified[0],
+        "oldest_verification": verified[1],
+        "io_budget_mbps": IO_BUDGET_BYTES / (1024 * 1024),
+    }
@@ -0,0 +1,73 @@
+"""
+🗃️ Local Intelligence Store
+Embedded SQLite database that backs the threat-hub indexes.
+Everything in here is derived data: it can always be rebuilt from the case cache.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+INTEL_DB_PATH = os.getenv("INTEL_DB_PATH", "app/data/intel.db")
+os.makedirs(os.path.dirname(INTEL_DB_PATH) or ".", exist_ok=True)
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_applied_schemas = set()
+
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's connection (WAL mode, so readers never block the writer)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(INTEL_DB_PATH, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+        _local.depth = 0
+    return conn
+
+
+@contextmanager
+def get_intel_db():
+    """Context manager with auto-commit/rollback. Nested use joins the outer transaction."""
+    conn = get_connection()
+    _local.depth += 1
+    try:
+        yield conn
+        if _local.depth == 1:
+            conn.commit()
+    except Exception:
+        if _local.depth == 1:
+            conn.rollback()
+        raise
+    finally:
+        _local.depth -= 1
+
+
+def create_schema(conn, ddl: str):
+    """
+    Run a DDL script statement by statement inside the caller's transaction
+    (executescript would commit whatever the caller has open first).
+    """
+    statement = ""
+    for line in ddl.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+def ensure_schema(name: str, ddl: str):
+    """Create a module's tables once per process (DDL must use IF NOT EXISTS)."""
+    if name in _applied_schemas:
+        return
+    with _schema_lock:
+        if name in _applied_schemas:
+            return
+        conn = get_connection()
+        conn.executescript(ddl)
+        conn.commit()
+        _applied_schemas.add(name)
@@ -0,0 +1,294 @@
+"""
+🛰️ IOC Snapshot Exchange
+Lets independent deployments share known-bad entities. A node exports its
+high-risk entities (from the reputation ledger) as a versioned, gzip-compressed
+snapshot: an exact list sorted by canonical key, with risk and category. Delta
+snapshots only carry what changed since the previous snapshot, so routine syncs
+stay small; a delta that does not start where the last import ended is refused.
+
+Imported IOCs are kept per source node and loaded into memory behind a Bloom
+filter, so `calculate_risk` and `heuristic_url_risk` get an O(1) membership
+check with no network call.
+"""
+
+import os
+import json
+import math
+import gzip
+import time
+import zlib
+import socket
+import hashlib
+import threading
+from typing import Iterable, Optional
+
+from app.pipelines.entity_canonical import key_value
+from app.services.intel_store import get_intel_db, ensure_schema
+from app.services import entity_reputation
+
+ensure_schema("ioc_snapshot", """
+CREATE TABLE IF NOT EXISTS ioc_feed (
+    entity_key   TEXT NOT NULL,
+    source_node  TEXT NOT NULL,
+    risk         REAL NOT NULL,
+    category     TEXT,
+    case_count   INTEGER NOT NULL,
+    last_seen    REAL,
+    snapshot_id  TEXT NOT NULL,
+    imported_at  REAL NOT NULL,
+    PRIMARY KEY (entity_key, source_node)
+);
+CREATE TABLE IF NOT EXISTS ioc_exports (
+    snapshot_id  TEXT PRIMARY KEY,
+    created_at   REAL NOT NULL,
+    shipped      BLOB NOT NULL       -- zlib-compressed JSON list of every key the snapshot published
+);
+CREATE TABLE IF NOT EXISTS ioc_sources (
+    source_node    TEXT PRIMARY KEY,
+    snapshot_id    TEXT NOT NULL,
+    created_at     REAL NOT NULL,
+    imported_at    REAL NOT NULL
+);
+""")
+
+SNAPSHOT_FORMAT = "satyasetu-ioc"
+SNAPSHOT_VERSION = 1
+NODE_ID = os.getenv("NODE_ID") or socket.gethostname()
+DEFAULT_MIN_RISK = 0.7
+BLOOM_FP_RATE = 0.001
+RELOAD_CHECK_SEC = 30
+# Deltas re-ship rows written this long before `since`, covering writes still uncommitted at export time.
+DELTA_OVERLAP_SEC = 60
+EXPORT_HISTORY = 100
+
+
+class SnapshotError(ValueError):
+    """Raised for snapshots that are malformed, of an unknown format, or out of order."""
+
+
+# -------------------------------------------------------
+# 🌸 Bloom Filter
+# -------------------------------------------------------
+class BloomFilter:
+    def __init__(self, size_bits: int, hashes: int, bits: Optional[bytearray] = None):
+        self.size_bits = max(size_bits, 8)
+        self.hashes = max(hashes, 1)
+        self.bits = bits if bits is not None else bytearray((self.size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, n: int, fp_rate: float = BLOOM_FP_RATE) -> "BloomFilter":
+        n = max(n, 1)
+        m = math.ceil(-n * math.log(fp_rate) / (math.log(2) ** 2))
+        return cls(m, round(m / n * math.log(2)))
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size_bits for i in range(self.hashes))
+
+    def add(self, key: str):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+
+# -------------------------------------------------------
+# 📤 Export
+# -------------------------------------------------------
+def _previous_export(conn, since: float) -> set:
+    row = conn.execute(
+        "SELECT shipped FROM ioc_exports WHERE created_at <= ? ORDER BY created_at DESC LIMIT 1",
+        (since + 1e-3,),
+    ).fetchone()
+    if not row:
+        raise SnapshotError(f"No snapshot exported at or before {since}; export a full snapshot instead")
+    return set(json.loads(zlib.decompress(row["shipped"])))
+
+
+def export_snapshot(since: Optional[float] = None, min_risk: float = DEFAULT_MIN_RISK, min_cases: int = 1) -> bytes:
+    """
+    Gzip-compressed snapshot of this node's high-risk entities. With `since`
+    (the previous snapshot's created_at) it is a delta: entities written since
+    then, plus the keys that snapshot published and that no longer qualify.
+    """
+    created_at = time.time()
+    with get_intel_db() as conn:
+        prior = _previous_export(conn, since) if since else set()
+
+    eligible = [
+        rep for rep in entity_reputation.ledger()
+        if rep["decayed_risk"] >= min_risk and rep["case_count"] >= min_cases
+    ]
+    shipped = [rep["key"] for rep in eligible]
+    if since:
+        eligible = [
+            rep for rep in eligible
+            if rep["updated_at"] > since - DELTA_OVERLAP_SEC or rep["key"] not in prior
+        ]
+    removed = sorted(prior - set(shipped))
+
+    entries = []
+    for rep in eligible:
+        categories = rep["categories"]
+        entries.append({
+            "key": rep["key"],
+            "risk": rep["decayed_risk"],
+            "category": max(categories, key=categories.get) if categories else None,
+            "case_count": rep["case_count"],
+            "last_seen": rep["last_seen"],
+        })
+
+    snapshot_id = f"{NODE_ID}-{int(created_at * 1000)}"
+    with get_intel_db() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO ioc_exports (snapshot_id, created_at, shipped) VALUES (?, ?, ?)",
+            (snapshot_id, created_at, zlib.compress(json.dumps(shipped).encode("utf-8"))),
+        )
+        conn.execute(
+            "DELETE FROM ioc_exports WHERE snapshot_id NOT IN "
+            "(SELECT snapshot_id FROM ioc_exports ORDER BY created_at DESC LIMIT ?)",
+            (EXPORT_HISTORY,),
+        )
+
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "snapshot_id": snapshot_id,
+        "node_id": NODE_ID,
+        "created_at": created_at,
+        "delta_since": since,
+        "min_risk": min_risk,
+        "count": len(entries),
+        "entries": entries,  # sorted by key
+        "removed": removed,
+    }
+    return gzip.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+
+
+# -------------------------------------------------------
+# 📥 Import
+# -------------------------------------------------------
+def _parse(blob: bytes) -> dict:
+    try:
+        snapshot = json.loads(gzip.decompress(blob))
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Not a gzip-compressed JSON snapshot: {e}")
+    if snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError("Unknown snapshot format")
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {snapshot.get('version')} (expected {SNAPSHOT_VERSION})")
+    if snapshot.get("node_id") == NODE_ID:
+        raise SnapshotError("Refusing to import this node's own snapshot")
+    return snapshot
+
+
+def import_snapshot(blob: bytes) -> dict:
+    """Merge a full or delta snapshot into the local IOC feed. Full snapshots replace the source's entries."""
+    snapshot = _parse(blob)
+    source, now = snapshot["node_id"], time.time()
+    with get_intel_db() as conn:
+        prior = conn.execute("SELECT created_at FROM ioc_sources WHERE source_node = ?", (source,)).fetchone()
+        if prior and snapshot["created_at"] <= prior["created_at"]:
+            raise SnapshotError("Snapshot is older than the last one imported from this node")
+        if snapshot["delta_since"] and not prior:
+            raise SnapshotError("Delta snapshot received before any full snapshot from this node")
+        if snapshot["delta_since"] and snapshot["delta_since"] > prior["created_at"]:
+            # Changes between the last import and delta_since were never seen here.
+            raise SnapshotError(
+                "Delta snapshot does not follow the last one imported from this node; "
+                "import a full snapshot (or a delta since "
+                f"{prior['created_at']}) first"
+            )
+
+        if not snapshot["delta_since"]:
+            conn.execute("DELETE FROM ioc_feed WHERE source_node = ?", (source,))
+        conn.executemany(
+            "DELETE FROM ioc_feed WHERE entity_key = ? AND source_node = ?",
+            [(key, source) for key in snapshot["removed"]],
+        )
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO ioc_feed
+                (entity_key, source_node, risk, category, case_count, last_seen, snapshot_id, imported_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (e["key"], source, e["risk"], e.get("category"), e.get("case_count", 1),
+                 e.get("last_seen"), snapshot["snapshot_id"], now)
+                for e in snapshot["entries"]
+            ],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO ioc_sources (source_node, snapshot_id, created_at, imported_at) VALUES (?, ?, ?, ?)",
+            (source, snapshot["snapshot_id"], snapshot["created_at"], now),
+        )
+    ioc_index.invalidate()
+    return {
+        "source_node": source,
+        "snapshot_id": snapshot["snapshot_id"],
+        "delta": bool(snapshot["delta_since"]),
+        "imported": len(snapshot["entries"]),
+        "removed": len(snapshot["removed"]),
+    }
+
+
+# -------------------------------------------------------
+# ⚡ In-Memory Lookup
+# -------------------------------------------------------
+class IocIndex:
+    """Bloom-filtered dict of imported IOCs; reloaded when any worker imports a snapshot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._bloom = BloomFilter(8, 1)
+        self._loaded_marker = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def _marker(self):
+        with get_intel_db() as conn:
+            return tuple(conn.execute("SELECT MAX(imported_at) AS t, COUNT(*) AS n FROM ioc_sources").fetchone())
+
+    def _maybe_reload(self):
+        if time.time() - self._checked_at < RELOAD_CHECK_SEC:
+            return
+        with self._lock:
+            self._checked_at = time.time()
+            marker = self._marker()
+            if marker == self._loaded_marker:
+                return
+            entries = {}
+            with get_intel_db() as conn:
+                for r in conn.execute("SELECT * FROM ioc_feed ORDER BY risk ASC"):
+                    entries[r["entity_key"]] = dict(r)  # highest-risk source wins
+            bloom = BloomFilter.for_capacity(len(entries))
+            for key in entries:
+                bloom.add(key)
+            self._entries, self._bloom, self._loaded_marker = entries, bloom, marker
+
+    def lookup(self, keys: Iterable[str]) -> Optional[dict]:
+        """The highest-risk shared IOC among `keys`, or None."""
+        try:
+            self._maybe_reload()
+        except Exception as e:
+            print(f"⚠️ IOC feed unavailable: {e}")
+            return None
+        hits = [self._entries[k] for k in keys if k in self._bloom and k in self._entries]
+        if not hits:
+            return None
+        best = max(hits, key=lambda h: h["risk"])
+        return {**best, "entity": key_value(best["entity_key"])}
+
+    def stats(self) -> dict:
+        self._maybe_reload()
+        with get_intel_db() as conn:
+            sources = [dict(r) for r in conn.execute("SELECT * FROM ioc_sources ORDER BY source_node")]
+        return {"node_id": NODE_ID, "entries": len(self._entries), "sources": sources}
+
+
+ioc_index = IocIndex()
@@ -0,0 +1,313 @@
+"""
+📚 Knowledge Store
+Append-only, segmented log of every analysis result: the durable record the
+threat-hub indexes (search, clusters, counters, reputation) are rebuilt from.
+
+Layout (app/data/knowledge/):
+  segment-<base_lsn>.jsonl   active segment, one JSON record per line
+  segment-<base_lsn>.jz      compacted segment: blocks of zlib-compressed lines
+  segment-<base_lsn>.idx     sparse index of a raw segment, one "lsn offset"
+                             line per block of BLOCK_RECORDS records
+  segment-<base_lsn>.jzidx   sparse index of a compacted segment
+
+Every record gets a log sequence number (lsn). Reads memory-map a segment and
+use the sparse index to jump to the right block, so a lookup touches at most
+one block. Closed segments are compacted in the background: records superseded
+by a later analysis of the same file are dropped and the rest are compressed
+block by block, which keeps each block independently readable through mmap.
+"""
+
+import os
+import json
+import mmap
+import zlib
+import fcntl
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+KNOWLEDGE_DIR = os.getenv("KNOWLEDGE_DIR", "app/data/knowledge")
+os.makedirs(KNOWLEDGE_DIR, exist_ok=True)
+
+SEGMENT_MAX_BYTES = int(os.getenv("KNOWLEDGE_SEGMENT_MB", "16")) * 1024 * 1024
+BLOCK_RECORDS = 64
+COMPACT_INTERVAL_SEC = 600
+
+_LOCK_PATH = os.path.join(KNOWLEDGE_DIR, ".lock")
+_thread_lock = threading.Lock()
+
+
+@contextmanager
+def _writer_lock():
+    """Serializes writers across threads and worker processes."""
+    with _thread_lock, open(_LOCK_PATH, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# -------------------------------------------------------
+# 🗂️ Segments & Sparse Index
+# -------------------------------------------------------
+def _path(base: int, ext: str) -> str:
+    return os.path.join(KNOWLEDGE_DIR, f"segment-{base:012d}.{ext}")
+
+
+def _segments() -> List[Tuple[int, str]]:
+    """[(base_lsn, ext)] oldest first; ext is "jz" (compacted) or "jsonl" (raw)."""
+    found = {}
+    for name in os.listdir(KNOWLEDGE_DIR):
+        if name.startswith("segment-") and name.endswith((".jsonl", ".jz")):
+            base, ext = name[len("segment-"):].split(".", 1)
+            # Mid-compaction both may exist briefly; the compacted one is authoritative.
+            if found.get(int(base)) != "jz":
+                found[int(base)] = ext
+    return sorted(found.items())
+
+
+def _index_path(base: int, ext: str) -> str:
+    return _path(base, "jzidx" if ext == "jz" else "idx")
+
+
+def _read_index(base: int, ext: str) -> List[Tuple[int, int]]:
+    try:
+        with open(_index_path(base, ext), "r", encoding="utf-8") as f:
+            return [tuple(map(int, line.split())) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _map(path: str):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _blocks(base: int, ext: str, from_lsn: int = 0) -> Iterator[List[dict]]:
+    """Decoded records block by block, skipping blocks that end before from_lsn."""
+    index = _read_index(base, ext)
+    mm = _map(_path(base, ext))
+    if mm is None:
+        return
+    try:
+        for i, (lsn, offset) in enumerate(index):
+            if i + 1 < len(index) and index[i + 1][0] <= from_lsn:
+                continue
+            end = index[i + 1][1] if i + 1 < len(index) else len(mm)
+            chunk = mm[offset:end]
+            if ext == "jz":
+                chunk = zlib.decompress(chunk)
+            yield [r for r in map(_decode, chunk.split(b"\n")) if r and r["lsn"] >= from_lsn]
+    finally:
+        mm.close()
+
+
+def _decode(line: bytes) -> Optional[dict]:
+    if not line.strip():
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None  # torn final line from a crash mid-append
+
+
+# -------------------------------------------------------
+# ✍️ Append
+# -------------------------------------------------------
+def _tail_state() -> Tuple[int, int, int]:
+    """(active base lsn, next lsn, records in the active segment's last block)."""
+    segments = _segments()
+    if not segments or segments[-1][1] != "jsonl":
+        base = (_last_lsn(segments) + 1) if segments else 0
+        return base, base, 0
+    base = segments[-1][0]
+    index = _read_index(base, "jsonl")
+    if not index:
+        return base, base, 0
+    first_lsn, offset = index[-1]
+    with open(_path(base, "jsonl"), "rb") as f:
+        f.seek(offset)
+        in_block = sum(1 for line in f if _decode(line))
+    return base, first_lsn + in_block, in_block
+
+
+def _last_lsn(segments) -> int:
+    base, ext = segments[-1]
+    last = base - 1
+    for records in _blocks(base, ext):
+        if records:
+            last = records[-1]["lsn"]
+    return last
+
+
+def append(case: dict) -> int:
+    """Append one analysis result. Returns its lsn."""
+    return append_many([case])[0]
+
+
+def append_many(cases: List[dict]) -> List[int]:
+    """Append analysis results in order with a single fsync per segment. Returns their lsns."""
+    lsns = []
+    with _writer_lock():
+        base, lsn, in_block = _tail_state()
+        pending = iter(cases)
+        case = next(pending, None)
+        while case is not None:
+            path = _path(base, "jsonl")
+            if os.path.exists(path) and os.path.getsize(path) >= SEGMENT_MAX_BYTES:
+                base, in_block = lsn, 0  # roll over to a new segment
+                path = _path(base, "jsonl")
+
+            index = []
+            with open(path, "ab+") as f:
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")  # seal a torn line left by a crash
+                while case is not None and f.tell() < SEGMENT_MAX_BYTES:
+                    if in_block == 0 or in_block >= BLOCK_RECORDS:
+                        index.append(f"{lsn} {f.tell()}\n")
+                        in_block = 0
+                    line = json.dumps({"lsn": lsn, "file_id": case.get("file_id"), "case": case}, ensure_ascii=False)
+                    f.write(line.encode("utf-8") + b"\n")
+                    lsns.append(lsn)
+                    lsn, in_block = lsn + 1, in_block + 1
+                    case = next(pending, None)
+                f.flush()
+                os.fsync(f.fileno())
+            if index:
+                with open(_index_path(base, "jsonl"), "a", encoding="utf-8") as idx:
+                    idx.writelines(index)
+    return lsns
+
+
+# -------------------------------------------------------
+# 🔍 Reads
+# -------------------------------------------------------
+def scan(from_lsn: int = 0) -> Iterator[dict]:
+    """Every record with lsn ≥ from_lsn, in log order ({"lsn", "file_id", "case"})."""
+    segments = _segments()
+    for i, (base, ext) in enumerate(segments):
+        if i + 1 < len(segments) and segments[i + 1][0] <= from_lsn:
+            continue
+        try:
+            blocks = _blocks(base, ext, from_lsn)
+            first = next(blocks, [])
+        except FileNotFoundError:
+            # Compacted underneath us: read the segment in its new form.
+            blocks = _blocks(base, "jz", from_lsn)
+            first = next(blocks, [])
+        yield from first
+        for records in blocks:
+            yield from records
+
+
+def read(lsn: int) -> Optional[dict]:
+    """One record by lsn: a sparse-index seek plus a scan of a single block."""
+    segments = _segments()
+    pos = bisect.bisect_right([base for base, _ in segments], lsn) - 1
+    if pos < 0:
+        return None
+    base, ext = segments[pos]
+    # Starting the block walk at lsn makes _blocks skip straight to the one block holding it.
+    for records in _blocks(base, ext, lsn):
+        for record in records:
+            if record["lsn"] == lsn:
+                return record
+        break
+    return None
+
+
+def latest_cases(from_lsn: int = 0) -> Iterator[Tuple[int, dict]]:
+    """(lsn, case) for the newest record of each file since from_lsn, in log order."""
+    newest = {}
+    for record in scan(from_lsn):
+        if record.get("file_id"):
+            newest[record["file_id"]] = record["lsn"]
+    for record in scan(from_lsn):
+        if newest.get(record.get("file_id")) == record["lsn"]:
+            yield record["lsn"], record["case"]
+
+
+def is_empty() -> bool:
+    return not _segments()
+
+
+def stats() -> dict:
+    segments = _segments()
+    sizes = {
+        f"segment-{base:012d}.{ext}": os.path.getsize(_path(base, ext))
+        for base, ext in segments if os.path.exists(_path(base, ext))
+    }
+    return {"segments": len(segments), "compacted": sum(ext == "jz" for _, ext in segments), "bytes": sizes}
+
+
+# -------------------------------------------------------
+# 🗜️ Compaction
+# -------------------------------------------------------
+def compact() -> int:
+    """
+    Rewrite closed raw segments as block-compressed ones, dropping records that a
+    later analysis of the same file supersedes. Returns the number of segments compacted.
+    Every worker runs a compactor; an exclusive lock lets only one of them work at a time.
+    """
+    with open(os.path.join(KNOWLEDGE_DIR, ".compact.lock"), "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return 0  # another worker is on it
+        return _compact_closed()
+
+
+def _compact_closed() -> int:
+    segments = _segments()
+    closed = [(base, ext) for base, ext in segments[:-1] if ext == "jsonl"]
+    if not closed:
+        return 0
+
+    newest = {}
+    for record in scan():
+        if record.get("file_id"):
+            newest[record["file_id"]] = record["lsn"]
+
+    for base, _ in closed:
+        kept = [
+            r for records in _blocks(base, "jsonl") for r in records
+            if newest.get(r.get("file_id"), r["lsn"]) == r["lsn"]
+        ]
+        tmp_data, tmp_idx = _path(base, "jz.tmp"), _path(base, "jzidx.tmp")
+        with open(tmp_data, "wb") as data, open(tmp_idx, "w", encoding="utf-8") as idx:
+            for i in range(0, len(kept), BLOCK_RECORDS):
+                block = kept[i:i + BLOCK_RECORDS]
+                idx.write(f"{block[0]['lsn']} {data.tell()}\n")
+                lines = b"".join(json.dumps(r, ensure_ascii=False).encode("utf-8") + b"\n" for r in block)
+                data.write(zlib.compress(lines, 6))
+            data.flush()
+            os.fsync(data.fileno())
+
+        # Index first, then data: once the .jz is visible its index is already complete.
+        with _writer_lock():
+            os.replace(tmp_idx, _path(base, "jzidx"))
+            os.replace(tmp_data, _path(base, "jz"))
+            os.remove(_path(base, "jsonl"))
+            os.remove(_path(base, "idx"))
+    return len(closed)
+
+
+def start_compactor():
+    """Background thread that compacts closed segments periodically."""
+    def loop():
+        stop = threading.Event()
+        while not stop.wait(COMPACT_INTERVAL_SEC):
+            try:
+                compacted = compact()
+                if compacted:
+                    print(f"🗜️ Compacted {compacted} knowledge segment(s)")
+            except Exception as e:
+                print(f"⚠️ Knowledge compaction failed: {e}")
+
+    threading.Thread(target=loop, name="knowledge-compactor", daemon=True).start()
@@ -0,0 +1,155 @@
+"""
+🧬 Near-Duplicate Scam Text Detection
+MinHash signatures over shingled OCR text, bucketed with banded LSH so that
+re-used scam templates (same wording, different phone numbers or amounts)
+are found with a handful of indexed bucket lookups instead of a corpus scan.
+"""
+
+import os
+import re
+import hashlib
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.intel_store import get_intel_db, ensure_schema, create_schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS minhash_signatures (
+    file_id    TEXT PRIMARY KEY,
+    signature  BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band     INTEGER NOT NULL,
+    bucket   INTEGER NOT NULL,
+    file_id  TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, file_id)
+);
+CREATE INDEX IF NOT EXISTS idx_lsh_buckets_file ON lsh_buckets(file_id);
+"""
+ensure_schema("near_duplicates", SCHEMA)
+
+# 20 bands × 6 rows: pairs above ~0.6 Jaccard collide in at least one band with high probability.
+NUM_BANDS = 20
+ROWS_PER_BAND = 6
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+SHINGLE_SIZE = 3
+
+# Chance a pair at Jaccard s shares a band is 1 - (1 - s^6)^20: ~8% at 0.4, 27% at 0.5,
+# 62% at 0.6, 92% at 0.7. Below MIN_THRESHOLD the index would miss most matches.
+MIN_THRESHOLD = 0.5
+DEFAULT_THRESHOLD = max(float(os.getenv("NEAR_DUP_THRESHOLD", "0.6")), MIN_THRESHOLD)
+# Fold near-duplicate texts into the same campaign cluster as shared entities do.
+FOLD_INTO_CLUSTERS = os.getenv("CLUSTER_FOLD_NEAR_DUPLICATES", "0") == "1"
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(1337)  # fixed seed: signatures must be comparable across restarts
+_PERM_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+
+_DIGITS_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+# -------------------------------------------------------
+# ✂️ Shingling & Signatures
+# -------------------------------------------------------
+def shingles(text: str) -> set:
+    """Word n-grams with digit runs masked, so edited numbers don't break the match."""
+    words = _WORD_RE.findall(_DIGITS_RE.sub("0", (text or "").lower()))
+    if not words:
+        return set()
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM-wide MinHash signature (uint32), or None for empty text."""
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest(), "little") for g in grams),
+        dtype=np.uint64,
+        count=len(grams),
+    ) % _PRIME
+    # (a·x + b) mod p for every permutation × shingle, then the column-wise minimum.
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def _band_buckets(signature: np.ndarray) -> List[tuple]:
+    rows = signature.reshape(NUM_BANDS, ROWS_PER_BAND)
+    return [
+        (band, int.from_bytes(hashlib.blake2b(rows[band].tobytes(), digest_size=7).digest(), "little"))
+        for band in range(NUM_BANDS)
+    ]
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the underlying shingle sets."""
+    return float(np.mean(sig_a == sig_b))
+
+
+# -------------------------------------------------------
+# ✍️ Indexing
+# -------------------------------------------------------
+def _candidates(conn, file_id: str, buckets: List[tuple]) -> set:
+    found = set()
+    for band, bucket in buckets:
+        for r in conn.execute("SELECT file_id FROM lsh_buckets WHERE band = ? AND bucket = ?", (band, bucket)):
+            if r["file_id"] != file_id:
+                found.add(r["file_id"])
+    return found
+
+
+def _matches(conn, file_id: str, signature: np.ndarray, threshold: float) -> List[dict]:
+    matches = []
+    for other in _candidates(conn, file_id, _band_buckets(signature)):
+        row = conn.execute("SELECT signature FROM minhash_signatures WHERE file_id = ?", (other,)).fetchone()
+        if not row:
+            continue
+        score = similarity(signature, np.frombuffer(row["signature"], dtype=np.uint32))
+        if score >= threshold:
+            matches.append({"file_id": other, "similarity": round(score, 3)})
+    return sorted(matches, key=lambda m: m["similarity"], reverse=True)
+
+
+def index_case(conn, seq: int, case: dict) -> List[dict]:
+    """Add a case's text to the LSH index. Returns near-duplicates above the default threshold."""
+    file_id = case["file_id"]
+    conn.execute("DELETE FROM lsh_buckets WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM minhash_signatures WHERE file_id = ?", (file_id,))
+
+    signature = minhash(case.get("raw_text", ""))
+    if signature is None:
+        return []
+
+    matches = _matches(conn, file_id, signature, DEFAULT_THRESHOLD)
+    conn.execute("INSERT INTO minhash_signatures (file_id, signature) VALUES (?, ?)", (file_id, signature.tobytes()))
+    conn.executemany(
+        "INSERT OR IGNORE INTO lsh_buckets (band, bucket, file_id) VALUES (?, ?, ?)",
+        [(band, bucket, file_id) for band, bucket in _band_buckets(signature)],
+    )
+    return matches
+
+
+def reset(conn):
+    conn.execute("DROP TABLE IF EXISTS minhash_signatures")
+    conn.execute("DROP TABLE IF EXISTS lsh_buckets")
+    create_schema(conn, SCHEMA)
+
+
+# -------------------------------------------------------
+# 🔍 Queries
+# -------------------------------------------------------
+def near_duplicates(file_id: str, threshold: float = DEFAULT_THRESHOLD, limit: int = 20) -> Optional[List[dict]]:
+    """Indexed cases whose text is a near-duplicate of `file_id` (None if it isn't indexed)."""
+    threshold = max(threshold, MIN_THRESHOLD)
+    with get_intel_db() as conn:
+        row = conn.execute("SELECT signature FROM minhash_signatures WHERE file_id = ?", (file_id,)).fetchone()
+        if not row:
+            return None
+        signature = np.frombuffer(row["signature"], dtype=np.uint32)
+        return _matches(conn, file_id, signature, threshold)[:limit]
@@ -0,0 +1,125 @@
+"""
+⚖️ Corpus Risk Rescoring
+Re-runs risk fusion over every stored case with the current reputation ledger,
+IOC snapshot and weights, a chunk at a time through assess_risk_batch. Each
+case's keyword/tone/sentiment factors come from its cached risk factors, so no
+document goes back through the NLP stack.
+
+A dry run reports what would change. apply=True saves each changed case through
+the normal write path (a new knowledge-store record, the JSON cache and the
+indexes, without live alerts), so replays and index rebuilds keep the new score;
+it records the run in the chain log and tells every worker's case table to
+reload. A case's own contribution to the reputation ledger is left out of its
+prior. Cases settled by the analysis cascade carry a heuristic score, not a
+fused one, and are left as is.
+"""
+
+import time
+import heapq
+import threading
+from datetime import datetime
+from collections import Counter
+
+from app.pipelines.risk_assessor import assess_risk_batch
+from app.services import knowledge_store, event_bus
+from app.services.intel_store import get_intel_db
+from app.services.case_store import INTEL_CHANNEL, save_cases
+from app.services.chainlog import chain_log
+
+CHUNK_CASES = 50_000
+TEXT_FACTORS = ("keyword_toxicity", "tone_score", "sentiment_neutrality")
+
+_running = threading.Lock()
+
+
+class RescoreRunning(RuntimeError):
+    """Raised when a rescoring run is already in progress in this worker."""
+
+
+def _cached_factors(case: dict):
+    factors = case.get("risk", {}).get("factors") or {}
+    return factors if all(k in factors for k in TEXT_FACTORS) else None
+
+
+def _score_chunk(cases: list, stats: Counter, transitions: Counter, movers: list, top: int, apply: bool):
+    results = assess_risk_batch(
+        [c.get("raw_text") or "" for c in cases],
+        [c.get("entities") or [] for c in cases],
+        [c.get("scam_class") or {} for c in cases],
+        [c.get("osint_hits") or [] for c in cases],
+        [_cached_factors(c) for c in cases],
+        details=False,
+        file_ids=[c.get("file_id") for c in cases],
+    )
+    rescored_at = datetime.now().isoformat()
+    updates = []
+    for case, new in zip(cases, results):
+        old = case.get("risk", {})
+        old_score = old.get("score") or 0.0
+        delta = round(new["score"] - old_score, 3)
+        stats["cases"] += 1
+        stats["text_factors_reused"] += _cached_factors(case) is not None
+        if delta:
+            stats["score_changed"] += 1
+        if new["risk_level"] != old.get("risk_level"):
+            stats["level_changed"] += 1
+            transitions[f"{old.get('risk_level', 'N/A')} → {new['risk_level']}"] += 1
+        item = (abs(delta), case.get("file_id"), old_score, new["score"], new["risk_level"])
+        if delta and (len(movers) < top or item > movers[0]):
+            (heapq.heappushpop if len(movers) >= top else heapq.heappush)(movers, item)
+        if delta or new["risk_level"] != old.get("risk_level"):
+            risk = {
+                **old,
+                "score": new["score"],
+                "risk_level": new["risk_level"],
+                "rationale": new["rationale"],
+                "factors": {**old.get("factors", {}), **new["factors"]},
+                "rescored_at": rescored_at,
+            }
+            updates.append({**case, "risk": risk})
+
+    if apply and updates:
+        save_cases(updates, live=False)
+
+
+def rescore_corpus(apply: bool = False, top: int = 20) -> dict:
+    """Rescore every stored case (newest analysis per file). Raises RescoreRunning if one is active."""
+    if not _running.acquire(blocking=False):
+        raise RescoreRunning("A risk rescoring run is already in progress")
+    try:
+        started = time.time()
+        stats, transitions, movers, chunk = Counter(), Counter(), [], []
+        for _, case in knowledge_store.latest_cases():
+            if case.get("tiered"):
+                stats["tiered_skipped"] += 1
+                continue
+            chunk.append(case)
+            if len(chunk) >= CHUNK_CASES:
+                _score_chunk(chunk, stats, transitions, movers, top, apply)
+                chunk = []
+        if chunk:
+            _score_chunk(chunk, stats, transitions, movers, top, apply)
+
+        summary = {
+            "applied": apply,
+            "cases": stats["cases"],
+            "score_changed": stats["score_changed"],
+            "level_changed": stats["level_changed"],
+            "text_factors_reused": stats["text_factors_reused"],
+            "tiered_skipped": stats["tiered_skipped"],
+            "elapsed_sec": round(time.time() - started, 2),
+        }
+        if apply and stats["cases"]:
+            with get_intel_db() as conn:
+                event_bus.publish(conn, INTEL_CHANNEL, "cases_rescored", summary)
+            chain_log(action="RISK_RESCORE", actor="system", target="case-corpus", meta=summary)
+        return {
+            **summary,
+            "level_transitions": dict(transitions.most_common()),
+            "top_movers": [
+                {"file_id": f, "old_score": o, "new_score": n, "risk_level": lvl, "delta": round(n - o, 3)}
+                for _, f, o, n, lvl in sorted(movers, reverse=True)
+            ],
+        }
+    finally:
+        _running.release()
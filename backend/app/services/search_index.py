@@ -0,0 +1,171 @@
+"""
+🔎 Full-Text Case Search
+SQLite FTS5 index over OCR text and entity values with BM25 ranking,
+phrase/prefix queries, metadata filters and keyset (cursor) pagination.
+"""
+
+import re
+import json
+import base64
+from typing import Optional
+
+from app.services.intel_store import get_intel_db, ensure_schema
+
+ensure_schema("search_index", """
+CREATE VIRTUAL TABLE IF NOT EXISTS case_fts USING fts5(
+    raw_text,
+    entities,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+""")
+
+# Entity matches count double: a hit on a UPI handle beats a passing mention in the text.
+BM25_WEIGHTS = (1.0, 2.0)
+MAX_PAGE_SIZE = 500
+
+_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+# -------------------------------------------------------
+# ✍️ Indexing
+# -------------------------------------------------------
+def index_case(conn, seq: int, case: dict):
+    """(Re)index one case; rowid is the case's seq in the `cases` table."""
+    entities = " ".join(e.get("value", "") for e in case.get("entities", []) if e.get("value"))
+    conn.execute("DELETE FROM case_fts WHERE rowid = ?", (seq,))
+    conn.execute(
+        "INSERT INTO case_fts (rowid, raw_text, entities) VALUES (?, ?, ?)",
+        (seq, case.get("raw_text") or "", entities),
+    )
+
+
+def reset(conn):
+    conn.execute("DELETE FROM case_fts")
+
+
+# -------------------------------------------------------
+# 🧠 Query Parsing
+# -------------------------------------------------------
+def build_match_query(q: str) -> str:
+    """
+    Translate user input into a safe FTS5 expression.
+    `"exact phrase"` → phrase query, `term*` → prefix query, everything else is AND-ed.
+    Each term is quoted so punctuation like `fakebank.xyz` or `a@b` never breaks the parser.
+    """
+    parts = []
+    for phrase, word in _TOKEN_RE.findall(q or ""):
+        if phrase:
+            text = phrase.replace('"', "").strip()
+            if text:
+                parts.append(f'"{text}"')
+            continue
+        prefix = word.endswith("*")
+        text = word.rstrip("*").replace('"', "").strip()
+        if not text:
+            continue
+        parts.append(f'"{text}"*' if prefix else f'"{text}"')
+    return " ".join(parts)
+
+
+def encode_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if isinstance(values, list) and len(values) == 2:
+            return values
+    except Exception:
+        pass
+    raise ValueError("Invalid cursor")
+
+
+# -------------------------------------------------------
+# 🔍 Search
+# -------------------------------------------------------
+def search(
+    q: str = "",
+    category: Optional[str] = None,
+    min_risk: Optional[float] = None,
+    max_risk: Optional[float] = None,
+    date_from: Optional[float] = None,
+    date_to: Optional[float] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    Ranked search over indexed cases. With an empty query, cases are listed newest first.
+    Returns one page plus `next_cursor` (None on the last page).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    match = build_match_query(q)
+
+    filters, params = [], []
+    if category:
+        filters.append("c.category = ? COLLATE NOCASE")
+        params.append(category)
+    if min_risk is not None:
+        filters.append("c.risk_score >= ?")
+        params.append(min_risk)
+    if max_risk is not None:
+        filters.append("c.risk_score <= ?")
+        params.append(max_risk)
+    if date_from is not None:
+        filters.append("c.analyzed_ts >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        filters.append("c.analyzed_ts <= ?")
+        params.append(date_to)
+
+    if match:
+        # bm25() is lower-is-better, so pages walk (rank ASC, seq ASC).
+        inner = f"""
+            SELECT c.seq, c.file_id, c.category, c.risk_score, c.risk_level, c.analyzed_at,
+                   bm25(case_fts, {BM25_WEIGHTS[0]}, {BM25_WEIGHTS[1]}) AS sort_key,
+                   snippet(case_fts, 0, '[', ']', '…', 12) AS snippet
+            FROM case_fts JOIN cases c ON c.seq = case_fts.rowid
+            WHERE case_fts MATCH ? {''.join(' AND ' + f for f in filters)}
+        """
+        params = [match] + params
+        order, cmp = "sort_key ASC, seq ASC", ">"
+    else:
+        inner = f"""
+            SELECT c.seq, c.file_id, c.category, c.risk_score, c.risk_level, c.analyzed_at,
+                   c.analyzed_ts AS sort_key, NULL AS snippet
+            FROM cases c
+            {'WHERE ' + ' AND '.join(filters) if filters else ''}
+        """
+        order, cmp = "sort_key DESC, seq DESC", "<"
+
+    sql = f"SELECT * FROM ({inner})"
+    if cursor:
+        sort_key, seq = decode_cursor(cursor)
+        sql += f" WHERE (sort_key, seq) {cmp} (?, ?)"
+        params += [sort_key, seq]
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(limit + 1)
+
+    with get_intel_db() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor([last["sort_key"], last["seq"]])
+
+    results = []
+    for r in page:
+        item = {
+            "file_id": r["file_id"],
+            "scam_class": {"category": r["category"] or "Unknown"},
+            "risk": {"score": r["risk_score"] or 0.0, "risk_level": r["risk_level"] or "N/A"},
+            "analyzed_at": r["analyzed_at"],
+        }
+        if match:
+            item["rank"] = round(-r["sort_key"], 4)
+            item["snippet"] = r["snippet"]
+        results.append(item)
+
+    return {"query": q, "match": match, "count": len(results), "next_cursor": next_cursor, "cases": results}
@@ -0,0 +1,222 @@
+"""
+📦 Resumable Upload Sessions
+Large evidence files are sent as fixed-size chunks that can arrive in any
+order, in parallel, and be retried individually. Each chunk is checked
+against the SHA-256 the client sends with it before it is accepted.
+
+A session is a directory under app/data/upload_sessions/<id>/ holding the
+(sparse) data file, an immutable session.json and one marker file per
+received chunk, so concurrent requests across workers never rewrite shared
+state. The whole-file SHA-256 is advanced chunk by chunk as the contiguous
+prefix grows; finalize only reads back chunks this process hasn't hashed
+yet (none, when chunks arrive in order) and files the result in the blob store.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import shutil
+import hashlib
+import threading
+from typing import Optional
+
+from app.services.blob_store import adopt
+
+SESSION_DIR = "app/data/upload_sessions"
+os.makedirs(SESSION_DIR, exist_ok=True)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("UPLOAD_MAX_MB", "2048")) * 1024 * 1024
+SESSION_TTL_SEC = 24 * 3600
+
+_SESSION_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class SessionError(ValueError):
+    """Raised for chunks or sessions that fail validation."""
+
+
+# -------------------------------------------------------
+# 🧮 Incremental Whole-File Hash
+# -------------------------------------------------------
+class _Frontier:
+    """SHA-256 over the contiguous prefix of chunks seen so far."""
+
+    def __init__(self):
+        self.sha = hashlib.sha256()
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+
+_frontiers = {}
+_frontiers_lock = threading.Lock()
+
+
+def _frontier(session_id: str) -> _Frontier:
+    with _frontiers_lock:
+        return _frontiers.setdefault(session_id, _Frontier())
+
+
+def _advance(session_id: str, session: dict, index: int = -1, data: bytes = b""):
+    """Feed `data` (chunk `index`) if it is next, then any later chunks already on disk."""
+    frontier = _frontier(session_id)
+    with frontier.lock:
+        if index == frontier.next_index:
+            frontier.sha.update(data)
+            frontier.next_index += 1
+        with open(_path(session_id, "data"), "rb") as f:
+            while frontier.next_index < session["chunk_count"] and os.path.exists(_marker(session_id, frontier.next_index)):
+                f.seek(frontier.next_index * session["chunk_size"])
+                frontier.sha.update(f.read(_chunk_length(session, frontier.next_index)))
+                frontier.next_index += 1
+        return frontier
+
+
+# -------------------------------------------------------
+# 🗂️ Session Files
+# -------------------------------------------------------
+def _path(session_id: str, name: str = "") -> str:
+    if not _SESSION_ID.fullmatch(session_id):
+        raise SessionError("Invalid session id")
+    return os.path.join(SESSION_DIR, session_id, name)
+
+
+def _marker(session_id: str, index: int) -> str:
+    return _path(session_id, os.path.join("chunks", f"{index:08d}"))
+
+
+def _chunk_length(session: dict, index: int) -> int:
+    return min(session["chunk_size"], session["size"] - index * session["chunk_size"])
+
+
+def _load(session_id: str) -> Optional[dict]:
+    try:
+        with open(_path(session_id, "session.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _received(session_id: str) -> set:
+    try:
+        return {int(name) for name in os.listdir(_path(session_id, "chunks"))}
+    except FileNotFoundError:
+        return set()
+
+
+def _discard(session_id: str):
+    shutil.rmtree(_path(session_id), ignore_errors=True)
+    with _frontiers_lock:
+        _frontiers.pop(session_id, None)
+
+
+def purge_expired() -> int:
+    """Drop sessions untouched for SESSION_TTL_SEC."""
+    purged = 0
+    cutoff = time.time() - SESSION_TTL_SEC
+    for session_id in os.listdir(SESSION_DIR):
+        if _SESSION_ID.fullmatch(session_id) and os.path.getmtime(os.path.join(SESSION_DIR, session_id)) < cutoff:
+            _discard(session_id)
+            purged += 1
+    return purged
+
+
+# -------------------------------------------------------
+# 🚀 Protocol
+# -------------------------------------------------------
+def create_session(filename: str, size: int, chunk_size: int = DEFAULT_CHUNK_SIZE, sha256: Optional[str] = None) -> dict:
+    if not 0 < size <= MAX_UPLOAD_BYTES:
+        raise SessionError(f"File size must be between 1 byte and {MAX_UPLOAD_BYTES} bytes")
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise SessionError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes")
+    purge_expired()
+
+    session_id = uuid.uuid4().hex
+    session = {
+        "session_id": session_id,
+        "filename": filename,
+        "size": size,
+        "chunk_size": chunk_size,
+        "chunk_count": -(-size // chunk_size),
+        "sha256": sha256.lower() if sha256 else None,
+        "created_at": time.time(),
+    }
+    os.makedirs(_path(session_id, "chunks"))
+    with open(_path(session_id, "data"), "wb") as f:
+        f.truncate(size)  # sparse: chunks land at their offsets in any order
+    with open(_path(session_id, "session.json"), "w", encoding="utf-8") as f:
+        json.dump(session, f)
+    return session_status(session_id)
+
+
+def session_status(session_id: str) -> Optional[dict]:
+    session = _load(session_id)
+    if not session:
+        return None
+    received = _received(session_id)
+    return {
+        **session,
+        "received": len(received),
+        "missing_offsets": [i * session["chunk_size"] for i in range(session["chunk_count"]) if i not in received],
+    }
+
+
+def write_chunk(session_id: str, offset: int, data: bytes, chunk_sha256: str) -> Optional[dict]:
+    """Store one chunk after checking its hash. Re-sending an accepted chunk is a no-op."""
+    session = _load(session_id)
+    if not session:
+        return None
+    if offset < 0 or offset % session["chunk_size"] or offset >= session["size"]:
+        raise SessionError(f"Offset must be a multiple of {session['chunk_size']} below {session['size']}")
+    index = offset // session["chunk_size"]
+    if len(data) != _chunk_length(session, index):
+        raise SessionError(f"Chunk at offset {offset} must be {_chunk_length(session, index)} bytes, got {len(data)}")
+    digest = hashlib.sha256(data).hexdigest()
+    if digest != (chunk_sha256 or "").lower():
+        raise SessionError(f"Chunk at offset {offset} failed its SHA-256 check")
+
+    marker = _marker(session_id, index)
+    if not os.path.exists(marker):
+        fd = os.open(_path(session_id, "data"), os.O_WRONLY)
+        try:
+            os.pwrite(fd, data, offset)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        # Marker only after the bytes are durable: a listed chunk is always on disk.
+        with open(marker, "w", encoding="utf-8") as f:
+            f.write(digest)
+        os.utime(_path(session_id))
+        _advance(session_id, session, index, data)
+    return {"offset": offset, "sha256": digest, "received": len(_received(session_id)), "chunk_count": session["chunk_count"]}
+
+
+def finalize(session_id: str) -> Optional[dict]:
+    """Verify the assembled file and move it into the blob store. Returns the blob record plus filename."""
+    session = _load(session_id)
+    if not session:
+        return None
+    with open(_path(session_id, "session.json"), "r") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # one finalize per session across workers
+        if not os.path.exists(_path(session_id, "data")):
+            return None
+        missing = session["chunk_count"] - len(_received(session_id))
+        if missing:
+            raise SessionError(f"{missing} chunk(s) still missing")
+
+        frontier = _advance(session_id, session)
+        sha256 = frontier.sha.hexdigest()
+        if session["sha256"] and session["sha256"] != sha256:
+            _discard(session_id)
+            raise SessionError("Assembled file does not match the declared SHA-256; session discarded")
+
+        with open(_path(session_id, "data"), "rb+") as f:
+            os.fsync(f.fileno())
+        blob = adopt(_path(session_id, "data"), sha256, session["size"])
+    _discard(session_id)
+    return {**blob, "filename": session["filename"], "chunk_count": session["chunk_count"]}
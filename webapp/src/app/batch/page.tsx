@@ -1,7 +1,7 @@
 "use client";
 
-import { useState } from "react";
-import { batchAnalyze, generateUnifiedReport, openPdfBlob } from "@/lib/api";
+import { useEffect, useState } from "react";
+import { batchAnalyze, generateUnifiedReport, openPdfBlob, subscribeBatch } from "@/lib/api";
 import { useSatyaSetuAIStore } from "@/lib/store";
 
 export default function BatchPage() {
@@ -9,6 +9,26 @@ export default function BatchPage() {
   const [files, setFiles] = useState<FileList | null>(null);
   const [batchId, setBatchId] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState({ done: 0, failed: 0 });
+  const [complete, setComplete] = useState<any>(null);
+
+  // The batch is analyzed in the background; the report exists only after batch_complete.
+  useEffect(() => {
+    if (!batchId) return;
+    setProgress({ done: 0, failed: 0 });
+    setComplete(null);
+    return subscribeBatch(batchId, {
+      file_done: () => setProgress((p) => ({ ...p, done: p.done + 1 })),
+      file_failed: () => setProgress((p) => ({ ...p, failed: p.failed + 1 })),
+      batch_complete: (summary) => {
+        setComplete(summary);
+        setProgress({ done: summary.done ?? 0, failed: summary.failed ?? 0 });
+        setNotification(
+          summary.status === "complete" ? `Batch ${batchId} complete ✅` : `Batch ${batchId} failed`
+        );
+      },
+    });
+  }, [batchId, setNotification]);
 
   async function handleBatchAnalyze() {
     if (!files) return alert("Please select files first.");
@@ -65,15 +85,18 @@ export default function BatchPage() {
       {batchId && (
         <button
           onClick={handleDownloadUnified}
-          className="bg-green-600 text-white px-4 py-2 rounded hover:opacity-90"
+          disabled={loading || complete?.status !== "complete"}
+          className="bg-green-600 text-white px-4 py-2 rounded hover:opacity-90 disabled:opacity-50"
         >
-          Download Unified Report
+          {complete ? "Download Unified Report" : "Analyzing batch..."}
         </button>
       )}
 
       {batchId && (
         <p className="mt-4 text-sm text-gray-600">
-          Current Batch ID: <b>{batchId}</b>
+          Current Batch ID: <b>{batchId}</b> · {progress.done} done
+          {progress.failed > 0 && `, ${progress.failed} failed`}
+          {complete && ` · ${complete.status}`}
         </p>
       )}
     </main>
@@ -3,7 +3,7 @@
 import { useEffect, useState } from "react";
 import { motion } from "framer-motion";
 import Link from "next/link";
-import { searchCases } from "@/lib/api";
+import { getIntelSnapshot, searchCases, subscribeIntel } from "@/lib/api";
 import { Search, FileText, AlertCircle, CheckCircle, Clock } from "lucide-react";
 
 interface CaseItem {
@@ -23,9 +23,24 @@ export default function CasesPage() {
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState("");
   const [filteredCases, setFilteredCases] = useState<CaseItem[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
+  // Load the list, then apply cases analyzed from then on as they are pushed.
   useEffect(() => {
-    loadCases();
+    let cancelled = false;
+    let unsubscribe = () => {};
+    loadCases().then((since) => {
+      if (cancelled || since === null) return;
+      unsubscribe = subscribeIntel(since, {
+        case_summary: (c: CaseItem) =>
+          setCases((prev) => [c, ...prev.filter((p) => p.file_id !== c.file_id)]),
+      });
+    });
+    return () => {
+      cancelled = true;
+      unsubscribe();
+    };
   }, []);
 
   useEffect(() => {
@@ -44,13 +59,23 @@ export default function CasesPage() {
     }
   }, [searchQuery, cases]);
 
-  const loadCases = async () => {
+  // Returns the event id the list is current as of (null if live updates are unavailable).
+  const loadCases = async (): Promise<number | null> => {
     setLoading(true);
+    let since: number | null = null;
+    try {
+      // Read the event id first: events after it are replayed, and overlap is harmless.
+      since = (await getIntelSnapshot()).last_event_id ?? null;
+    } catch (error) {
+      console.warn("⚠️ Live case updates unavailable:", error);
+    }
     try {
       const data = await searchCases("");
-      if (Array.isArray(data)) {
-        setCases(data);
-        setFilteredCases(data);
+      const list = Array.isArray(data) ? data : data?.cases;
+      setNextCursor(data?.next_cursor ?? null);
+      if (Array.isArray(list)) {
+        setCases(list);
+        setFilteredCases(list);
       } else {
         setCases([]);
         setFilteredCases([]);
@@ -62,6 +87,25 @@ export default function CasesPage() {
     } finally {
       setLoading(false);
     }
+    return since;
+  };
+
+  // Next page of the newest-first listing, skipping cases already pushed live.
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await searchCases("", nextCursor);
+      setCases((prev) => {
+        const seen = new Set(prev.map((c) => c.file_id));
+        return [...prev, ...(data?.cases ?? []).filter((c: CaseItem) => !seen.has(c.file_id))];
+      });
+      setNextCursor(data?.next_cursor ?? null);
+    } catch (error) {
+      console.error("Failed to load more cases:", error);
+    } finally {
+      setLoadingMore(false);
+    }
   };
 
   const getRiskColor = (level: string) => {
@@ -134,7 +178,10 @@ export default function CasesPage() {
           >
             <div className="bg-white rounded-lg shadow p-4 text-center">
               <p className="text-sm text-gray-600">Total Cases</p>
-              <p className="text-3xl font-bold text-gray-900">{cases.length}</p>
+              <p className="text-3xl font-bold text-gray-900">
+                {cases.length}
+                {nextCursor ? "+" : ""}
+              </p>
             </div>
             <div className="bg-red-50 rounded-lg shadow p-4 text-center">
               <p className="text-sm text-gray-600">High Risk</p>
@@ -244,6 +291,19 @@ export default function CasesPage() {
             ))}
           </motion.div>
         )}
+
+        {/* Load More */}
+        {!loading && nextCursor && (
+          <div className="text-center mt-8">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="bg-cyan-600 hover:bg-cyan-700 text-white px-6 py-3 rounded-lg font-medium transition disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              {loadingMore ? "Loading..." : "Load more cases"}
+            </button>
+          </div>
+        )}
       </div>
     </main>
   );
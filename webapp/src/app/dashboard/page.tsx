@@ -4,7 +4,7 @@ import { useEffect, useState } from "react";
 import ChartCard from "@/components/ChartCard";
 import CaseTable from "@/components/CaseTable";
 import RiskMeter from "@/components/RiskMeter";
-import { getTopEntities, getAllCases } from "@/lib/api";
+import { getTopEntities, getRecentCases, getCaseAggregate } from "@/lib/api";
 import { useSatyaSetuAIStore } from "@/lib/store";
 import { Activity, ShieldAlert, TrendingUp, Database } from "lucide-react";
 import {
@@ -28,6 +28,7 @@ export default function DashboardPage() {
   const { setNotification, setLoading, isLoading } = useSatyaSetuAIStore();
   const [topEntities, setTopEntities] = useState<any[]>([]);
   const [recentCases, setRecentCases] = useState<any[]>([]);
+  const [totalCases, setTotalCases] = useState<number>(0);
   const [avgRisk, setAvgRisk] = useState<number>(0);
   const [categoryData, setCategoryData] = useState<
     { name: string; value: number }[]
@@ -42,30 +43,16 @@ export default function DashboardPage() {
         const entityRes = await getTopEntities();
         setTopEntities(entityRes);
 
-        const caseRes = await getAllCases();
-        setRecentCases(caseRes);
-
-        if (caseRes.length > 0) {
-          const avg =
-            caseRes.reduce(
-              (a: number, b: any) =>
-                a + (b.risk?.score ?? b.risk_score ?? 0),
-              0
-            ) / caseRes.length;
-          setAvgRisk(avg);
-
-          const categories: Record<string, number> = {};
-          for (const c of caseRes) {
-            const cat =
-              c.scam_class?.category || c.category || "Unknown";
-            categories[cat] = (categories[cat] || 0) + 1;
-          }
+        setRecentCases(await getRecentCases(8));
 
+        // Totals come from the server-side aggregate, not from downloading every case.
+        const agg = await getCaseAggregate("category");
+        const rows: { key: string; count: number; avg_risk: number }[] = agg.rows ?? [];
+        setTotalCases(agg.cases ?? 0);
+        if (agg.cases > 0) {
+          setAvgRisk(rows.reduce((a, r) => a + r.avg_risk * r.count, 0) / agg.cases);
           setCategoryData(
-            Object.entries(categories).map(([name, value]) => ({
-              name,
-              value,
-            }))
+            rows.map((r) => ({ name: r.key || "Unknown", value: r.count }))
           );
         }
         setNotification("Dashboard loaded successfully ✅");
@@ -102,7 +89,7 @@ export default function DashboardPage() {
             {[
               {
                 title: "Total Cases",
-                value: recentCases.length,
+                value: totalCases,
                 icon: <Database className="w-5 h-5 text-cyan-500" />,
               },
               {
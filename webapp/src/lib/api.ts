@@ -151,6 +151,23 @@ export async function batchAnalyze(files: File[]) {
   return res.data;
 }
 
+// Live per-file progress for a batch started with batchAnalyze (replays from the start)
+export function subscribeBatch(
+  batch_id: string,
+  handlers: {
+    file_done?: (r: any) => void;
+    file_failed?: (r: any) => void;
+    batch_complete?: (s: any) => void;
+  }
+) {
+  const source = new EventSource(`${BASE_URL}/batch-analyze/${batch_id}/events`);
+  for (const [type, handler] of Object.entries(handlers)) {
+    if (handler) source.addEventListener(type, (e) => handler(JSON.parse((e as MessageEvent).data)));
+  }
+  source.addEventListener("batch_complete", () => source.close());
+  return () => source.close();
+}
+
 export async function generateUnifiedReport(batch_id: string) {
   const form = new FormData();
   form.append("batch_id", batch_id);
@@ -160,9 +177,17 @@ export async function generateUnifiedReport(batch_id: string) {
 }
 
 
-// 6️⃣ Search Cases
-export async function searchCases(query: string) {
-  const res = await api.get(`/cases/search?q=${encodeURIComponent(query)}`);
+// 6️⃣ Search Cases (one page; pass the previous page's next_cursor for the next one)
+export async function searchCases(query: string, cursor: string | null = null, limit = 50) {
+  const params = new URLSearchParams({ q: query, limit: String(limit) });
+  if (cursor) params.set("cursor", cursor);
+  const res = await api.get(`/cases/search?${params}`);
+  return res.data;
+}
+
+// 7️⃣ Case Count & Average Risk per Category (computed server-side over every case)
+export async function getCaseAggregate(by = "category", limit = 1000) {
+  const res = await api.get(`/cases/aggregate?by=${by}&limit=${limit}`);
   return res.data;
 }
 
@@ -218,12 +243,9 @@ export async function getCaseFromCache(file_id: string) {
   }
 }
 
-export async function getAllCases() {
+export async function getRecentCases(limit = 50) {
   try {
-    const res = await api.get("/cases/search?q=");
-    if (Array.isArray(res.data)) return res.data;
-    if (res.data?.cases) return res.data.cases;
-    return res.data ? [res.data] : [];
+    return (await searchCases("", null, limit)).cases ?? [];
   } catch (err) {
     console.warn("⚠️ Could not fetch case list:", err);
     return [];
@@ -248,6 +270,27 @@ export async function getEntityProfile(entity: string) {
   return res.data;
 }
 
+// 📡 Live threat-hub feed: load the snapshot once, then apply pushed deltas.
+export async function getIntelSnapshot() {
+  const res = await api.get("/intel/snapshot");
+  return res.data;
+}
+
+export function subscribeIntel(
+  since: number,
+  handlers: {
+    case_summary?: (c: any) => void;
+    entity_delta?: (d: any) => void;
+    cluster_merge?: (m: any) => void;
+  }
+) {
+  const source = new EventSource(`${BASE_URL}/intel/stream?since=${since}`);
+  for (const [type, handler] of Object.entries(handlers)) {
+    if (handler) source.addEventListener(type, (e) => handler(JSON.parse((e as MessageEvent).data)));
+  }
+  return () => source.close();
+}
+
 
 // ===================================================================
 // 🚨 FRAUD PREDICTION ENDPOINTS